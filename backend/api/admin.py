@@ -5,6 +5,7 @@
 
 import asyncio
 from fastapi import APIRouter, Header, HTTPException, BackgroundTasks, Query
+from fastapi.responses import PlainTextResponse
 from typing import Optional
 
 try:
@@ -13,12 +14,16 @@ try:
     from services.ai_service import get_ai_service
     from database import get_db
     from api.responses import ApiResponse, success_response, error_response
+    from utils.admission import get_admission_controller
+    from utils.sampling_profiler import get_sampling_profiler
 except (ImportError, ValueError):
     from backend.config import get_settings
     from backend.services.snapshot import get_snapshot_service
     from backend.services.ai_service import get_ai_service
     from backend.database import get_db
     from backend.api.responses import ApiResponse, success_response, error_response
+    from backend.utils.admission import get_admission_controller
+    from backend.utils.sampling_profiler import get_sampling_profiler
 
 router = APIRouter(prefix="/admin")
 
@@ -100,11 +105,8 @@ async def update_fund_list(
         from ..services.data_fetcher import get_data_fetcher
         fetcher = get_data_fetcher()
         
-        # 强制刷新
-        fetcher._fund_list_cache = None
-        fetcher._fund_list_cache_time = None
-        
-        candidates = fetcher.filter_candidate_funds()
+        # 强制刷新（忽略内存与持久化缓存）
+        candidates = fetcher.filter_candidate_funds(force_refresh=True)
         
         # 统计主题分布
         theme_stats = {}
@@ -333,13 +335,9 @@ async def clear_cache(
         if cache_type == 'expired':
             cleared_count = db.clear_expired_cache()
         elif cache_type == 'ai':
-            with db.get_cursor() as cursor:
-                cursor.execute("DELETE FROM ai_cache")
-                cleared_count = cursor.rowcount
+            cleared_count = db.clear_ai_cache()
         elif cache_type == 'all':
-            with db.get_cursor() as cursor:
-                cursor.execute("DELETE FROM ai_cache")
-                cleared_count = cursor.rowcount
+            cleared_count = db.clear_ai_cache()
             # 清理数据获取器缓存
             from ..services.data_fetcher import get_data_fetcher
             fetcher = get_data_fetcher()
@@ -358,6 +356,107 @@ async def clear_cache(
         }
 
 
+@router.get("/db/stats")
+async def get_db_stats(x_admin_token: Optional[str] = Header(None)):
+    """
+    数据库查询统计
+    
+    按 Database 方法返回语句次数、行数与 p50/p95/p99 延迟，以及最近的慢查询（含执行计划）、响应缓存命中情况
+    """
+    verify_admin_token(x_admin_token)
+    db = get_db()
+    return success_response(data={**db.profiler.snapshot(), 'response_cache': db.response_cache.stats()})
+
+
+@router.get("/admission")
+async def get_admission_stats(x_admin_token: Optional[str] = Header(None)):
+    """准入控制统计：各通道 / 路由的并发、排队、放行与拒绝次数"""
+    verify_admin_token(x_admin_token)
+    return success_response(data=get_admission_controller().stats())
+
+
+@router.post("/db/profiling")
+async def set_db_profiling(
+    x_admin_token: Optional[str] = Header(None),
+    enabled: bool = Query(..., description="是否开启查询剖析"),
+    slow_ms: Optional[float] = Query(None, ge=0, description="慢查询阈值（毫秒）"),
+    reset: bool = Query(False, description="是否清空已有统计")
+):
+    """开关查询剖析（仅影响之后借出的游标）"""
+    verify_admin_token(x_admin_token)
+    profiler = get_db().profiler
+    profiler.enabled = enabled
+    if slow_ms is not None:
+        profiler.slow_ms = slow_ms
+    if reset:
+        profiler.reset()
+    return success_response(
+        message=f"查询剖析已{'开启' if enabled else '关闭'}",
+        data={'enabled': profiler.enabled, 'slow_ms': profiler.slow_ms}
+    )
+
+
+@router.post("/profile")
+async def start_profile(
+    x_admin_token: Optional[str] = Header(None),
+    seconds: float = Query(30, gt=0, description="采样时长（秒）"),
+    route: Optional[str] = Query(None, description="只在路径以此开头的请求处理期间采样，如 /api/v1/portfolio/backtest"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="采样间隔（毫秒）"),
+    include_idle: bool = Query(False, description="是否计入空闲等待的线程")
+):
+    """
+    开启采样剖析
+
+    覆盖事件循环主线程与任务池/执行器线程，结束后通过 GET /admin/profile/{id} 下载折叠栈
+    """
+    verify_admin_token(x_admin_token)
+    max_seconds = get_settings().PROFILE_MAX_SECONDS
+    if seconds > max_seconds:
+        return error_response(error=f'采样时长不能超过 {max_seconds} 秒')
+    try:
+        session = get_sampling_profiler().start(seconds, interval_ms / 1000, route or None, include_idle)
+    except RuntimeError as e:
+        return error_response(error=str(e))
+    return success_response(message=f"采样剖析已开启，{seconds:g} 秒后结束", data=session.info())
+
+
+@router.get("/profile")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """最近的剖析会话"""
+    verify_admin_token(x_admin_token)
+    return success_response(data=get_sampling_profiler().sessions())
+
+
+@router.get("/profile/{profile_id}")
+async def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    下载折叠栈（flamegraph.pl / speedscope 可直接读取）
+
+    会话仍在运行时返回已采集的部分，X-Profile-Status 头标明状态
+    """
+    verify_admin_token(x_admin_token)
+    session = get_sampling_profiler().get(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="剖析会话不存在或已过期")
+    return PlainTextResponse(
+        session.collapsed(),
+        headers={
+            'Content-Disposition': f'attachment; filename="profile-{profile_id}.collapsed"',
+            'X-Profile-Status': session.status
+        }
+    )
+
+
+@router.post("/profile/{profile_id}/stop")
+async def stop_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """提前结束剖析会话"""
+    verify_admin_token(x_admin_token)
+    session = get_sampling_profiler().stop(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="剖析会话不存在或已过期")
+    return success_response(message="剖析会话已结束", data=session.info())
+
+
 @router.delete("/snapshot/{snapshot_id}")
 async def delete_snapshot(
     snapshot_id: int,
@@ -383,6 +482,9 @@ async def delete_snapshot(
             # 删除关联的指标
             cursor.execute("DELETE FROM fund_metrics WHERE snapshot_id = ?", (snapshot_id,))
             metrics_deleted = cursor.rowcount
+            cursor.execute("DELETE FROM fund_metric_themes WHERE snapshot_id = ?", (snapshot_id,))
+            cursor.execute("DELETE FROM fund_metric_ranks WHERE snapshot_id = ?", (snapshot_id,))
+            cursor.execute("DELETE FROM fund_metric_history WHERE snapshot_id = ?", (snapshot_id,))
             
             # 删除快照
             cursor.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
@@ -392,7 +494,10 @@ async def delete_snapshot(
                     'success': False,
                     'error': f'快照 {snapshot_id} 不存在'
                 }
-        
+
+        # 推荐回顾等接口依赖历史快照
+        db.response_cache.invalidate()
+
         return {
             'success': True,
             'message': f'已删除快照 {snapshot_id}',
@@ -7,22 +7,25 @@ from fastapi import APIRouter, Query, HTTPException, Request
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 import json
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 import logging
+import numpy as np
+import pandas as pd
 logger = logging.getLogger(__name__)
 
 try:
     from services.snapshot import get_snapshot_service
     from services.ai_service import get_ai_service
     # from services.vector_service import get_vector_service
-    from services.data_fetcher import get_data_fetcher
+    from services.data_fetcher import get_data_fetcher, nav_df_to_records
     from services.news_service import get_news_service
     # from services.prediction_service import get_trend_predictor
     from services.backtest_service import get_backtest_service
     from services.macro_service import get_macro_service
     from services.sector_service import get_sector_service
     # from services.watchlist_service import get_watchlist_service
-    from database import get_db
+    from database import get_db, get_async_db
     from services.fee_service import get_fee_service
     from services.health_service import get_health_service
     from services.style_service import get_style_service
@@ -35,16 +38,22 @@ try:
     from services.action_service import get_action_service
     from services.dca_service import get_dca_service
     from services.portfolio_builder import get_portfolio_builder
-    from api.responses import ApiResponse, success_response, error_response
+    from services.nav_panel import get_nav_panel, load_nav_frame
+    from services.search_index import get_fund_search_index
+    from services.valuation_stream import get_valuation_hub
+    from services.job_runner import get_job_runner, JobQueueFull, PRIORITY_LOW
+    from services.fund_batch_service import get_fund_batch_service, FACETS as FUND_BATCH_FACETS
+    from config import get_settings
+    from api.responses import ApiResponse, success_response, error_response, snapshot_cached, fast_json, sse_event, sse_response, admission, too_busy_response
 except (ImportError, ValueError):
     from backend.services.snapshot import get_snapshot_service
     from backend.services.ai_service import get_ai_service
-    from backend.services.data_fetcher import get_data_fetcher
+    from backend.services.data_fetcher import get_data_fetcher, nav_df_to_records
     from backend.services.news_service import get_news_service
     from backend.services.backtest_service import get_backtest_service
     from backend.services.macro_service import get_macro_service
     from backend.services.sector_service import get_sector_service
-    from backend.database import get_db
+    from backend.database import get_db, get_async_db
     from backend.services.fee_service import get_fee_service
     from backend.services.health_service import get_health_service
     from backend.services.style_service import get_style_service
@@ -57,7 +66,13 @@ except (ImportError, ValueError):
     from backend.services.action_service import get_action_service
     from backend.services.dca_service import get_dca_service
     from backend.services.portfolio_builder import get_portfolio_builder
-    from backend.api.responses import ApiResponse, success_response, error_response
+    from backend.services.nav_panel import get_nav_panel, load_nav_frame
+    from backend.services.search_index import get_fund_search_index
+    from backend.services.valuation_stream import get_valuation_hub
+    from backend.services.job_runner import get_job_runner, JobQueueFull, PRIORITY_LOW
+    from backend.services.fund_batch_service import get_fund_batch_service, FACETS as FUND_BATCH_FACETS
+    from backend.config import get_settings
+    from backend.api.responses import ApiResponse, success_response, error_response, snapshot_cached, fast_json, sse_event, sse_response, admission, too_busy_response
 import logging
 import time
 
@@ -71,6 +86,11 @@ class SearchDeepRequest(BaseModel):
 class CompareRequest(BaseModel):
     codes: List[str]
 
+class FundBatchRequest(BaseModel):
+    codes: List[str]
+    facets: List[str] = ['fund', 'metrics']
+    nav_points: int = 30
+
 class AIChatQueryRequest(BaseModel):
     query: str
     history: Optional[List[Dict[str, str]]] = []
@@ -112,6 +132,8 @@ class PortfolioBuildRequest(BaseModel):
 
 
 @router.get("/recommend")
+@admission('snapshot')
+@snapshot_cached
 async def get_recommendations(
     theme: Optional[str] = Query(None, description="主题筛选: 科技/消费/医药/新能源/金融/制造/红利"),
     category: Optional[str] = Query(None, description="分类: TOP10/高Alpha/长线/短线/防守")
@@ -145,20 +167,37 @@ _hotspots_cache = {
     'updated_at': None
 }
 
+async def _ensure_search_index():
+    """全市场基金列表每小时刷新一次，刷新后重建搜索索引（拼音只在构建时计算）"""
+    import akshare as ak
+    import time
+    
+    now = time.time()
+    if _online_fund_cache['data'] is None or (now - _online_fund_cache['last_updated'] > 3600):
+        logger.info("在线获取全市场基金列表用于搜索...")
+        _online_fund_cache['data'] = await asyncio.to_thread(ak.fund_name_em)
+        _online_fund_cache['last_updated'] = now
+    
+    index = get_fund_search_index()
+    if not index.is_built_from(_online_fund_cache['data']):
+        await asyncio.to_thread(index.build_from_df, _online_fund_cache['data'])
+    return index
+
+
 @router.get("/search")
 async def search_funds(q: str, limit: int = 10):
     """
     搜索基金（名称或代码），支持数据库外实时检索
     """
     try:
-        db = get_db()
+        db = get_async_db()
         q = q.strip()
         if not q:
             return success_response(data={'results': [], 'total': 0})
             
         # 1. 6位数字精确匹配代码
         if q.isdigit() and len(q) == 6:
-            fund = db.get_fund(q)
+            fund = await db.get_fund(q)
             if fund:
                 return success_response(data={
                     'results': [{**fund, 'is_online': False}],
@@ -167,25 +206,11 @@ async def search_funds(q: str, limit: int = 10):
             
             # 本地未找到，尝试在线查找
             try:
-                import akshare as ak
-                import time
-                
-                # 使用缓存或获取新数据
-                now = time.time()
-                if _online_fund_cache['data'] is None or (now - _online_fund_cache['last_updated'] > 3600):
-                    _online_fund_cache['data'] = ak.fund_name_em()
-                    _online_fund_cache['last_updated'] = now
-                
-                all_funds_df = _online_fund_cache['data']
-                fund_row = all_funds_df[all_funds_df['基金代码'] == q]
-                if not fund_row.empty:
+                index = await _ensure_search_index()
+                fund = index.get(q)
+                if fund:
                     return success_response(data={
-                        'results': [{
-                            'code': q,
-                            'name': fund_row.iloc[0]['基金简称'],
-                            'fund_type': fund_row.iloc[0]['基金类型'],
-                            'is_online': True
-                        }],
+                        'results': [{**fund, 'is_online': True}],
                         'total': 1
                     })
             except Exception as e:
@@ -195,98 +220,30 @@ async def search_funds(q: str, limit: int = 10):
         
         # 2. 模糊搜索名称
         # 优先在本地寻找
-        results = db.search_funds(q, limit=limit)
+        results = await db.search_funds(q, limit=limit)
         for r in results:
             r['is_online'] = False
             
-        # 3. 如果本地结果较少，尝试在线搜索（合并结果）
+        # 3. 如果本地结果较少，尝试在线搜索（合并结果，走预构建的搜索索引）
         try:
-            import akshare as ak
-            import time
-            
-            now = time.time()
-            if _online_fund_cache['data'] is None or (now - _online_fund_cache['last_updated'] > 3600):
-                logger.info("在线获取全市场基金列表用于搜索...")
-                _online_fund_cache['data'] = ak.fund_name_em()
-                _online_fund_cache['last_updated'] = now
-            
-            all_funds_df = _online_fund_cache['data']
+            index = await _ensure_search_index()
+            exclude = {r['code'] for r in results}
+            need = max(limit * 2 - len(results), 0)
             
             # 判断是否为拼音查询（纯英文字母）
             is_pinyin_query = q.isalpha() and all(c.isascii() for c in q)
             
-            if is_pinyin_query:
-                # 使用拼音匹配
-                try:
-                    try:
-                        from ..utils.pinyin import pinyin_match, rank_pinyin_match
-                    except (ImportError, ValueError):
-                        from utils.pinyin import pinyin_match, rank_pinyin_match
-                    
-                    matched_funds = []
-                    for _, row in all_funds_df.iterrows():
-                        name = row['基金简称']
-                        rank = rank_pinyin_match(name, q)
-                        if rank > 0:
-                            matched_funds.append({
-                                'code': str(row['基金代码']).zfill(6),
-                                'name': name,
-                                'fund_type': row['基金类型'],
-                                'is_online': True,
-                                '_rank': rank
-                            })
-                    
-                    # 按匹配度排序
-                    matched_funds.sort(key=lambda x: x['_rank'], reverse=True)
-                    
-                    for fund in matched_funds[:limit * 2]:
-                        code = fund['code']
-                        if any(r['code'] == code for r in results):
-                            continue
-                        del fund['_rank']
-                        results.append(fund)
-                        if len(results) >= limit * 2:
-                            break
-                except ImportError:
-                    logger.warning("拼音模块导入失败，使用普通搜索")
-                    # 回退到普通搜索
-                    mask = all_funds_df['基金简称'].str.contains(q, na=False, case=False)
-                    online_matches = all_funds_df[mask].head(limit * 2)
-                    for _, row in online_matches.iterrows():
-                        code = str(row['基金代码']).zfill(6)
-                        if any(r['code'] == code for r in results):
-                            continue
-                        results.append({
-                            'code': code,
-                            'name': row['基金简称'],
-                            'fund_type': row['基金类型'],
-                            'is_online': True
-                        })
-                        if len(results) >= limit * 2:
-                            break
+            if is_pinyin_query and index.has_pinyin:
+                matched = index.search_pinyin(q, need, exclude=exclude)
             else:
+                if is_pinyin_query:
+                    logger.warning("拼音模块不可用，使用普通搜索")
                 # 普通中文/数字搜索
-                mask = (
-                    all_funds_df['基金简称'].str.contains(q, na=False) |
-                    all_funds_df['基金代码'].str.contains(q, na=False)
-                )
-                online_matches = all_funds_df[mask].head(limit * 2)
-                
-                for _, row in online_matches.iterrows():
-                    code = str(row['基金代码']).zfill(6)
-                    # 避免与本地结果重复
-                    if any(r['code'] == code for r in results):
-                        continue
-                        
-                    results.append({
-                        'code': code,
-                        'name': row['基金简称'],
-                        'fund_type': row['基金类型'],
-                        'is_online': True
-                    })
-                    
-                    if len(results) >= limit * 2:
-                        break
+                matched = index.search_text(q, need, exclude=exclude)
+            
+            for fund in matched:
+                fund['is_online'] = True
+                results.append(fund)
         except Exception as online_err:
             logger.warning(f"在线名称搜索失败: {online_err}")
 
@@ -294,10 +251,10 @@ async def search_funds(q: str, limit: int = 10):
         try:
             # 获取结果中所有基金的评分
             codes = [r['code'] for r in results]
-            snapshot = db.get_latest_snapshot()
+            snapshot = await db.get_latest_snapshot()
             if snapshot and codes:
                 # 批量获取本地数据库中的指标（含评分）
-                db_funds = db.get_funds_by_codes(snapshot['id'], codes)
+                db_funds = await db.get_funds_by_codes(snapshot['id'], codes)
                 score_map = {f['code']: f.get('score', 0) for f in db_funds}
                 
                 # 注入评分
@@ -481,9 +438,9 @@ async def get_fund_info(code: str):
     """
     try:
         code = str(code).zfill(6)
-        db = get_db()
+        db = get_async_db()
         
-        fund = db.get_fund(code)
+        fund = await db.get_fund(code)
         if not fund:
             return {
                 'success': False,
@@ -491,10 +448,10 @@ async def get_fund_info(code: str):
             }
         
         # 获取最新快照中的指标
-        snapshot = db.get_latest_snapshot()
+        snapshot = await db.get_latest_snapshot()
         metrics = None
         if snapshot:
-            metrics = db.get_fund_metrics(snapshot['id'], code)
+            metrics = await db.get_fund_metrics(snapshot['id'], code)
         
         return {
             'success': True,
@@ -518,10 +475,10 @@ async def get_update_status():
     """
     try:
         service = get_snapshot_service()
-        db = get_db()
+        db = get_async_db()
         
         progress = service.get_progress()
-        latest_snapshot = db.get_latest_snapshot()
+        latest_snapshot = await db.get_latest_snapshot()
         
         response = {
             'is_updating': service.is_updating(),
@@ -548,6 +505,36 @@ async def get_update_status():
         }
 
 
+@router.get("/update-status/stream")
+async def stream_update_status(request: Request):
+    """
+    快照进度推送（Server-Sent Events）
+
+    连接后立即收到当前进度，之后由快照任务的进度回调直接推送 progress 事件
+    （阶段、计数、百分比、吞吐 funds_per_second、剩余时间 eta_seconds），取代轮询 /update-status。
+    """
+    service = get_snapshot_service()
+    queue = service.progress_events.subscribe()
+
+    async def events():
+        try:
+            yield b'retry: 5000\n\n'
+            yield sse_event('progress', service.get_progress())
+            while True:
+                try:
+                    progress = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b': keepalive\n\n'
+                    continue
+                yield sse_event('progress', progress)
+        finally:
+            service.progress_events.unsubscribe(queue)
+
+    return sse_response(events())
+
+
 @router.get("/models")
 async def get_models():
     """
@@ -602,9 +589,9 @@ async def health_check():
     健康检查
     """
     try:
-        db = get_db()
-        snapshot = db.get_latest_snapshot()
-        fund_count = db.get_fund_count()
+        db = get_async_db()
+        snapshot = await db.get_latest_snapshot()
+        fund_count = await db.get_fund_count()
         
         # 检查AI服务
         ai_status = 'not_configured'
@@ -636,8 +623,8 @@ async def get_latest_snapshot():
     获取最新快照信息
     """
     try:
-        db = get_db()
-        snapshot = db.get_latest_snapshot()
+        db = get_async_db()
+        snapshot = await db.get_latest_snapshot()
         
         if not snapshot:
             return {
@@ -658,14 +645,16 @@ async def get_latest_snapshot():
 
 
 @router.get("/themes")
+@admission('snapshot')
+@snapshot_cached
 async def get_available_themes():
     """
     获取可用的主题列表（动态从数据库获取统计，但保留全量分类）
     """
     try:
-        db = get_db()
+        db = get_async_db()
         # 从数据库获取有数据的统计
-        db_themes = db.get_all_themes()
+        db_themes = await db.get_all_themes()
         db_theme_map = {t['name']: t['count'] for t in db_themes}
         
         # 主题图标映射
@@ -747,6 +736,8 @@ async def get_available_themes():
 
 
 @router.get("/sectors/list")
+@admission('snapshot')
+@snapshot_cached
 async def get_sectors():
     """
     获取可用板块列表
@@ -779,6 +770,7 @@ async def get_sectors():
 
 
 @router.get("/sectors/{sector}/metrics")
+@admission('upstream', route='sector_metrics')
 async def get_sector_metrics(sector: str):
     """
     获取板块指标及情绪分析
@@ -791,8 +783,11 @@ async def get_sector_metrics(sector: str):
         if not service:
             return {'success': False, 'error': '板块服务未初始化'}
         
-        # 获取基础指标
-        result = service.get_sector_metrics(sector)
+        # 获取基础指标（可能在线回退获取行情，交给任务池执行）
+        try:
+            result = await _run_job('sector_metrics', service.get_sector_metrics, sector)
+        except JobQueueFull as e:
+            return too_busy_response(str(e))
         
         # 获取市场情绪 (Async)
         try:
@@ -880,21 +875,27 @@ async def get_fund_smart_dca(code: str):
         return {'success': False, 'error': str(e)}
 
 @router.post("/fund/{code}/simulate-dca")
+@admission('upstream', route='simulate_dca')
 async def simulate_fund_dca(code: str, params: Dict[str, Any]):
-    """定投模拟分析"""
+    """定投模拟分析（可能在线获取净值，交给任务池执行）"""
     try:
-        service = get_investment_service()
-        fetcher = get_data_fetcher()
-        nav_df = fetcher.get_fund_nav(code)
-        return service.simulate_dca(
-            nav_df, 
-            base_amount=params.get('base_amount', 1000),
-            frequency=params.get('frequency', 'weekly'),
-            start_date=params.get('start_date')
-        )
+        return await _run_job('simulate_dca', _simulate_fund_dca, code, params)
+    except JobQueueFull as e:
+        return too_busy_response(str(e))
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
+
+def _simulate_fund_dca(code: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    service = get_investment_service()
+    nav_df = load_nav_frame(code, get_data_fetcher())
+    return service.simulate_dca(
+        nav_df, 
+        base_amount=params.get('base_amount', 1000),
+        frequency=params.get('frequency', 'weekly'),
+        start_date=params.get('start_date')
+    )
+
 @router.post("/portfolio/performance")
 async def get_portfolio_performance(holdings: List[Dict[str, Any]]):
     """获取持仓组合性能分析"""
@@ -905,6 +906,7 @@ async def get_portfolio_performance(holdings: List[Dict[str, Any]]):
         return {'success': False, 'error': str(e)}
 
 @router.get("/recommendations/history")
+@admission('upstream')
 async def get_recommendation_history(limit: int = 10):
     """获取历史推荐回顾"""
     try:
@@ -956,11 +958,11 @@ async def get_watchlist():
     获取自选基金列表（包含最新指标）
     """
     try:
-        db = get_db()
-        watchlist = db.get_watchlist()
+        db = get_async_db()
+        watchlist = await db.get_watchlist()
         
         # 获取最新快照
-        snapshot = db.get_latest_snapshot()
+        snapshot = await db.get_latest_snapshot()
         
         # 为每个自选基金获取最新指标
         result = []
@@ -975,7 +977,7 @@ async def get_watchlist():
             
             # 尝试获取快照中的指标
             if snapshot:
-                metrics = db.get_fund_metrics(snapshot['id'], code)
+                metrics = await db.get_fund_metrics(snapshot['id'], code)
                 if metrics:
                     fund_data.update({
                         'score': metrics.get('score'),
@@ -1002,13 +1004,27 @@ async def get_watchlist():
 
 # ==================== 基金对比接口 ====================
 
+def _compare_funds(code_list: List[str]) -> List[Dict]:
+    """逐只分析（在任务池中执行）"""
+    service = get_snapshot_service()
+    results = []
+    for code in code_list:
+        analysis = service.analyze_single_fund(code)
+        if analysis.get('status') == 'success':
+            results.append(analysis)
+    return results
+
+
 @router.post("/compare")
-async def compare_funds(request: CompareRequest):
+@admission('upstream')
+async def compare_funds(
+    request: CompareRequest,
+    async_mode: bool = Query(False, description="是否后台执行并立即返回 job_id")
+):
     """
     多基金对比分析 (POST)
     """
     try:
-        db = get_db()
         code_list = [c.strip().zfill(6) for c in request.codes if c.strip()]
         
         if len(code_list) < 2:
@@ -1017,21 +1033,53 @@ async def compare_funds(request: CompareRequest):
         if len(code_list) > 10: # 放宽限制到10只
             return error_response(error='最多支持10只基金对比')
         
-        snapshot = db.get_latest_snapshot()
-        service = get_snapshot_service()
-        
-        results = []
-        for code in code_list:
-            analysis = service.analyze_single_fund(code)
-            if analysis.get('status') == 'success':
-                results.append(analysis)
-        
+        results = await _run_job('compare', _compare_funds, code_list,
+                                 async_mode=async_mode, params={'codes': code_list})
+        if async_mode:
+            return results
         return success_response(data=results)
+    except JobQueueFull as e:
+        return too_busy_response(str(e))
     except Exception as e:
         logger.error(f"Compare failed: {e}")
         return error_response(error=str(e))
 
 
+@router.post("/funds/batch")
+@admission('upstream', route='funds_batch')
+@fast_json
+async def get_funds_batch(request: FundBatchRequest):
+    """
+    批量获取基金详情（取代对比、自选视图中按基金逐个请求 /analyze、/fund、/fees、/health、/style）
+
+    facets 可选：fund（基础信息）、metrics（快照指标）、nav（最近 nav_points 条净值）、health（健康度）、
+    valuation（实时估值）、style（风格分析）、fees（费率）、manager（基金经理）。
+    本地数据按维度各一次批量查询，上游数据在一个有界线程池中并行获取。
+    """
+    try:
+        code_list = list(dict.fromkeys(c.strip().zfill(6) for c in request.codes if c.strip()))
+        if not code_list:
+            return error_response(error='请提供基金代码')
+
+        max_codes = get_settings().FUNDS_BATCH_MAX_CODES
+        if len(code_list) > max_codes:
+            return error_response(error=f'单次最多支持 {max_codes} 只基金')
+
+        unknown = [f for f in request.facets if f not in FUND_BATCH_FACETS]
+        if unknown:
+            return error_response(error=f"不支持的维度: {', '.join(unknown)}（可选: {', '.join(FUND_BATCH_FACETS)}）")
+
+        nav_points = max(1, min(request.nav_points, 250))
+        data = await _run_job('funds_batch', get_fund_batch_service().get_batch,
+                              code_list, request.facets, nav_points)
+        return success_response(data=data)
+    except JobQueueFull as e:
+        return too_busy_response(str(e))
+    except Exception as e:
+        logger.error(f"Funds batch failed: {e}")
+        return error_response(error=str(e))
+
+
 # ==================== 每日操作接口 ====================
 
 @router.get("/daily-actions")
@@ -1052,8 +1100,8 @@ async def get_daily_actions(limit: int = 10):
 async def get_dca_plans():
     """获取所有定投计划"""
     try:
-        db = get_db()
-        plans = db.get_dca_plans()
+        db = get_async_db()
+        plans = await db.get_dca_plans()
         return success_response(data=plans)
     except Exception as e:
         return error_response(error=str(e))
@@ -1062,8 +1110,8 @@ async def get_dca_plans():
 async def add_dca_plan(plan: DcaPlanRequest):
     """添加或更新定投计划"""
     try:
-        db = get_db()
-        success = db.add_dca_plan(
+        db = get_async_db()
+        success = await db.add_dca_plan(
             fund_code=plan.fund_code,
             fund_name=plan.fund_name,
             base_amount=plan.base_amount,
@@ -1084,8 +1132,8 @@ async def add_dca_plan(plan: DcaPlanRequest):
 async def get_portfolio_holding():
     """获取当前持仓"""
     try:
-        db = get_db()
-        holdings = db.get_holding_portfolio()
+        db = get_async_db()
+        holdings = await db.get_holding_portfolio()
         return success_response(data=holdings)
     except Exception as e:
         return error_response(error=str(e))
@@ -1100,7 +1148,7 @@ async def buy_fund(
 ):
     """买入基金 - 支持 Body 或 Query Params (兼容前端)"""
     try:
-        db = get_db()
+        db = get_async_db()
         # 优先使用 query params (如前端 app.js:865 所示)
         f_code = code or (req.fund_code if req else None)
         f_shares = shares or (req.shares if req else None)
@@ -1110,7 +1158,7 @@ async def buy_fund(
         if not f_code or f_shares is None:
             return error_response(error="缺少必要参数")
             
-        success = db.add_portfolio_position(
+        success = await db.add_portfolio_position(
             fund_code=f_code,
             fund_name=f_name,
             shares=f_shares,
@@ -1128,7 +1176,7 @@ async def buy_fund(
                         tag = 'large_position'
                     elif total_cost < 1000:
                         tag = 'small_test'
-                db.add_behavior_tag(
+                await db.add_behavior_tag(
                     event_type='manual_buy',
                     tag=tag,
                     fund_code=f_code
@@ -1148,14 +1196,14 @@ async def sell_fund(
 ):
     """卖出基金 - 支持 Body 或 Query Params"""
     try:
-        db = get_db()
+        db = get_async_db()
         p_id = position_id or (req.position_id if req else None)
         s_price = sell_price or (req.sell_price if req else 0)
         
         if p_id is None:
             return error_response(error="缺少持仓ID")
             
-        success = db.sell_portfolio_position(
+        success = await db.sell_portfolio_position(
             position_id=p_id,
             sell_price=s_price,
             sell_date=datetime.now().strftime('%Y-%m-%d')
@@ -1163,7 +1211,7 @@ async def sell_fund(
         if success:
             # P2: Write behavior tag for sell action
             try:
-                positions = db.get_portfolio(status='sold')
+                positions = await db.get_portfolio(status='sold')
                 pos = next((p for p in positions if p['id'] == p_id), None)
                 if pos:
                     profit_rate = ((s_price / pos['cost_price']) - 1) * 100 if pos.get('cost_price') and s_price else 0
@@ -1175,7 +1223,7 @@ async def sell_fund(
                         tag = 'take_profit'
                     else:
                         tag = 'normal_sell'
-                    db.add_behavior_tag(
+                    await db.add_behavior_tag(
                         event_type='manual_sell',
                         tag=tag,
                         fund_code=pos.get('fund_code', '')
@@ -1204,8 +1252,8 @@ async def build_portfolio_plan(req: PortfolioBuildRequest):
 async def get_notifications():
     """获取未读通知"""
     try:
-        db = get_db()
-        notifs = db.get_unread_notifications()
+        db = get_async_db()
+        notifs = await db.get_unread_notifications()
         return success_response(data=notifs)
     except Exception as e:
         return error_response(error=str(e))
@@ -1214,8 +1262,8 @@ async def get_notifications():
 async def mark_notification_read(id: int):
     """标记通知为已读"""
     try:
-        db = get_db()
-        db.mark_notification_read(id)
+        db = get_async_db()
+        await db.mark_notification_read(id)
         return success_response(message="已标记为已读")
     except Exception as e:
         return error_response(error=str(e))
@@ -1227,8 +1275,8 @@ async def mark_notification_read(id: int):
 async def get_watchlist_realtime():
     """获取带实时估值的自选列表"""
     try:
-        db = get_db()
-        watchlist = db.get_watchlist()
+        db = get_async_db()
+        watchlist = await db.get_watchlist()
         if not watchlist:
             return success_response(data=[])
             
@@ -1251,6 +1299,46 @@ async def get_watchlist_realtime():
     except Exception as e:
         return error_response(error=str(e))
 
+@router.get("/valuations/stream")
+async def stream_valuations(
+    request: Request,
+    codes: Optional[str] = Query(None, description="逗号分隔的基金代码，默认为自选 + 持仓")
+):
+    """
+    实时估值推送（Server-Sent Events）
+
+    连接后先收到 snapshot 事件（全部关注基金的当前估值），之后每个刷新周期只推送发生变化的 delta 事件；
+    所有连接共用同一个后台刷新任务，上游估值接口每个周期只调用一次。
+    """
+    if codes:
+        code_list = [c.strip().zfill(6) for c in codes.split(',') if c.strip()]
+    else:
+        db = get_async_db()
+        watchlist = await db.get_watchlist()
+        holdings = await db.get_portfolio()
+        code_list = [item['fund_code'] for item in watchlist] + [item['fund_code'] for item in holdings]
+    code_list = list(dict.fromkeys(code_list))[:get_settings().VALUATION_STREAM_MAX_CODES]
+
+    hub = get_valuation_hub()
+    sub = hub.subscribe(code_list)
+
+    async def events():
+        try:
+            yield b'retry: 5000\n\n'
+            while True:
+                try:
+                    event, items = await asyncio.wait_for(sub.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b': keepalive\n\n'
+                    continue
+                yield sse_event(event, items)
+        finally:
+            hub.unsubscribe(sub)
+
+    return sse_response(events())
+
 @router.get("/market/hotspots")
 async def get_market_hotspots():
     """获取市场热点聚合"""
@@ -1266,38 +1354,109 @@ async def get_market_hotspots():
 async def get_hot_sectors():
     """热门板块"""
     try:
-        db = get_db()
-        themes = db.get_all_themes()
+        db = get_async_db()
+        themes = await db.get_all_themes()
         return success_response(data=themes[:10])
     except Exception as e:
         return error_response(error=str(e))
 
 @router.get("/rankings")
-async def get_rankings(sort_by: str = 'score', limit: int = 50):
-    """多维排行"""
+@admission('snapshot')
+@snapshot_cached
+async def get_rankings(sort_by: str = 'score', limit: int = 50, cursor: int = 0):
+    """多维排行（cursor 为上一页最后一条的 rank_position）"""
     try:
-        db = get_db()
-        snapshot = db.get_latest_snapshot()
+        db = get_async_db()
+        snapshot = await db.get_latest_snapshot()
         if not snapshot:
             return error_response(error="暂无数据")
-        rankings = db.get_ranking(snapshot_id=snapshot['id'], sort_by=sort_by, limit=limit)
-        return success_response(data=rankings)
+        rankings = await db.get_ranking(snapshot_id=snapshot['id'], sort_by=sort_by, limit=limit, after=cursor)
+        next_cursor = rankings[-1]['rank_position'] if len(rankings) == limit else None
+        return success_response(data=rankings, meta={'next_cursor': next_cursor})
+    except Exception as e:
+        return error_response(error=str(e))
+
+
+
+@router.get("/rankings/changes")
+@admission('snapshot')
+async def get_rank_changes(
+    from_date: str = Query(..., description="起始日期 YYYY-MM-DD（取不晚于该日的最近快照）"),
+    to_date: Optional[str] = Query(None, description="结束日期，默认今天"),
+    limit: int = Query(100, ge=1, le=5000, description="返回数量")
+):
+    """全市场评分名次变化（两个快照日期之间）"""
+    try:
+        db = get_async_db()
+        to_date = to_date or datetime.now().strftime('%Y-%m-%d')
+        result = await db.get_rank_changes(from_date, to_date, limit=limit)
+        return success_response(data=result)
+    except Exception as e:
+        return error_response(error=str(e))
+
+
+@router.get("/fund/{code}/trajectory")
+@admission('snapshot')
+async def get_fund_trajectory(code: str, limit: int = Query(30, ge=2, le=365, description="快照数量")):
+    """单只基金跨快照的评分/名次/关键指标走势"""
+    try:
+        db = get_async_db()
+        code = code.strip().zfill(6)
+        points = await db.get_metric_trajectory(code, limit=limit)
+        return success_response(data={'code': code, 'points': points})
     except Exception as e:
         return error_response(error=str(e))
 
 
 # ==================== 管理员与其它 ====================
 
+async def _run_job(kind: str, func, *args, async_mode: bool = False, pool: str = 'default', params: Dict = None):
+    """
+    在后台任务池中执行耗时工作
+
+    async_mode=True 时登记任务并立即返回 job_id（结果通过 GET /jobs/{job_id} 查询）；
+    否则等待任务池执行完成并返回结果本身，事件循环不被阻塞。
+    """
+    runner = get_job_runner()
+    if async_mode:
+        job_id, _ = runner.submit(kind, func, args, pool=pool, params=params)
+        return success_response(
+            message=f'任务已提交，请通过 GET /api/v1/jobs/{job_id} 查询结果',
+            data={'job_id': job_id, 'status': 'queued'}
+        )
+    return await runner.run(kind, func, args, pool=pool)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询后台任务状态与结果（status: queued / running / success / failed）"""
+    job = await get_async_db().get_job(job_id)
+    if not job:
+        return error_response(error=f'任务 {job_id} 不存在')
+    return success_response(data=job)
+
+
+@router.get("/jobs")
+async def list_jobs(
+    status: Optional[str] = Query(None, description="按状态筛选: queued/running/success/failed"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """最近的后台任务及各任务池负载"""
+    jobs = await get_async_db().get_jobs(status=status, limit=limit)
+    return success_response(data=jobs, meta={'pools': get_job_runner().stats()})
+
+
 @router.post("/admin/build-static")
 async def admin_build_static():
     """管理员：重新构建全量数据快照"""
     try:
         service = get_snapshot_service()
-        # 异步启动，不阻断请求
-        import threading
-        thread = threading.Thread(target=service.create_full_snapshot)
-        thread.start()
-        return success_response(message="后台更新任务已启动")
+        if service.is_updating():
+            return error_response(error='更新任务正在进行中，请等待完成')
+        # 交给快照任务池（串行执行），进度见 /update-status/stream
+        job_id, _ = get_job_runner().submit('build_static', service.create_full_snapshot,
+                                            pool='snapshot', priority=PRIORITY_LOW)
+        return success_response(message="后台更新任务已启动", data={'job_id': job_id, 'status': 'queued'})
     except Exception as e:
         return error_response(error=str(e))
 
@@ -1317,7 +1476,42 @@ async def diagnose_pro(req: PortfolioDiagnoseRequest):
 
 # ==================== 净值历史接口 ====================
 
+async def _load_nav_series(code: str, start=None, end=None):
+    """
+    获取基金净值序列 (dates datetime64[D], navs float64)，按日期升序且已去除缺失值
+    依次尝试：共享净值面板 -> 本地列式存储 -> 在线拉取（并写入本地）
+    """
+    panel = get_nav_panel()
+    # 面板未覆盖请求区间（起点晚一周以上）或数据不够新时，回退到完整历史
+    series = panel.get_series(code, start, end) if panel.covers(code, start, end) else None
+    if series is not None and len(series[0]):
+        dates, navs = series
+    else:
+        db = get_async_db()
+        arrays = await db.get_nav_range(code, start, end, as_numpy=True)
+        if arrays is None:
+            nav_df = await asyncio.to_thread(get_data_fetcher().get_fund_nav, code)
+            if nav_df is None or nav_df.empty:
+                return None
+            # 写入交给后台线程，本次直接使用在线数据
+            db.sync.enqueue_nav_history(code, nav_df_to_records(nav_df))
+            nav_df = nav_df.sort_values('date')
+            if start is not None:
+                nav_df = nav_df[nav_df['date'] >= pd.Timestamp(start)]
+            if end is not None:
+                nav_df = nav_df[nav_df['date'] <= pd.Timestamp(end)]
+            arrays = (
+                nav_df['date'].to_numpy().astype('datetime64[D]'),
+                pd.to_numeric(nav_df['nav'], errors='coerce').to_numpy(dtype=np.float64)
+            )
+        dates, navs = arrays[0], arrays[1]
+    
+    mask = ~np.isnan(navs)
+    return dates[mask], navs[mask].astype(np.float64)
+
+
 @router.get("/fund/{code}/nav-history")
+@fast_json
 async def get_nav_history(
     code: str,
     days: int = Query(60, ge=7, le=365, description="获取天数")
@@ -1326,11 +1520,32 @@ async def get_nav_history(
     获取基金净值历史（用于走势图）
     """
     try:
-        db = get_db()
+        db = get_async_db()
         code = code.strip().zfill(6)
         
-        # 先检查本地缓存
-        cached = db.get_nav_history(code, days)
+        # 优先读取共享净值面板（零拷贝切片）
+        panel = get_nav_panel()
+        series = panel.get_series(code) if panel.covers(code) else None
+        if series is not None:
+            dates, navs = series
+            valid = np.flatnonzero(~np.isnan(navs))[-days:]
+            if len(valid) >= days * 0.8:
+                accs = panel.get_series(code, field='acc_nav')[1][valid]
+                return {
+                    'success': True,
+                    'data': {
+                        'code': code,
+                        'nav_history': [
+                            {'date': str(d), 'nav': v, 'acc_nav': None if np.isnan(a) else a}
+                            for d, v, a in zip(dates[valid], np.round(navs[valid], 4).tolist(),
+                                               np.round(accs, 4).tolist())
+                        ],
+                        'source': 'panel'
+                    }
+                }
+        
+        # 再检查本地缓存
+        cached = await db.get_nav_history(code, days)
         
         # 如果缓存数据足够，直接返回
         if len(cached) >= days * 0.8:  # 80%的数据就认为足够
@@ -1353,16 +1568,9 @@ async def get_nav_history(
             nav_df = fetcher.get_fund_nav(code)
             
             if nav_df is not None and not nav_df.empty:
-                # 保存到缓存
-                nav_data = []
-                for _, row in nav_df.iterrows():
-                    nav_data.append({
-                        'date': row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else str(row['date']),
-                        'nav': float(row['nav']) if row['nav'] else None,
-                        'acc_nav': float(row.get('acc_nav', row['nav'])) if row.get('acc_nav') else None
-                    })
-                
-                db.save_nav_history(code, nav_data)
+                # 后台写入缓存，不阻塞响应
+                nav_data = nav_df_to_records(nav_df.sort_values('date'))
+                db.sync.enqueue_nav_history(code, nav_data)
                 
                 # 返回最近N天
                 recent = nav_data[-days:] if len(nav_data) > days else nav_data
@@ -1401,9 +1609,9 @@ async def check_in_watchlist(code: str):
     检查基金是否在自选中
     """
     try:
-        db = get_db()
+        db = get_async_db()
         code = code.strip().zfill(6)
-        in_watchlist = db.is_in_watchlist(code)
+        in_watchlist = await db.is_in_watchlist(code)
         
         return {
             'success': True,
@@ -1422,6 +1630,7 @@ async def check_in_watchlist(code: str):
 # ==================== 涨幅榜接口 ====================
 
 @router.get("/top-gainers")
+@fast_json
 async def get_top_gainers(
     period: str = Query('1w', description="涨幅周期: yesterday/today_estimate/1w/1m/3m/6m/1y"),
     limit: int = Query(20, ge=5, le=50, description="返回数量")
@@ -1435,7 +1644,7 @@ async def get_top_gainers(
     - 1w/1m/3m/6m/1y: 历史周期涨幅（从快照缓存获取）
     """
     try:
-        db = get_db()
+        db = get_async_db()
         
         # 昨日涨幅 - 全市场实时排行榜 (Existing code logic)
         if period == 'yesterday':
@@ -1531,9 +1740,9 @@ async def get_top_gainers(
             
             if not gains_data:
                 # 如果全市场API失败，回退到数据库
-                snapshot = db.get_latest_snapshot()
+                snapshot = await db.get_latest_snapshot()
                 if snapshot:
-                    db_funds = db.get_top_gainers(snapshot['id'], period=period, limit=limit)
+                    db_funds = await db.get_top_gainers(snapshot['id'], period=period, limit=limit)
                     period_field = {
                         '1w': 'return_1w', '1m': 'return_1m', '3m': 'return_3m',
                         '6m': 'return_6m', '1y': 'return_1y'
@@ -1589,14 +1798,16 @@ async def get_portfolio():
     获取持仓列表 (兼容 /portfolio 和 /portfolio/performance)
     """
     try:
-        db = get_db()
-        positions = db.get_portfolio(status='holding')
-        summary = db.get_portfolio_summary()
+        db = get_async_db()
+        positions = await db.get_portfolio(status='holding')
+        summary = await db.get_portfolio_summary()
         
         # 获取每个持仓的当前净值
         enriched_positions = []
         total_value = 0
         total_profit = 0
+        # 一次批量读取全部持仓的最新净值
+        latest_navs = await db.get_nav_tails([pos['fund_code'] for pos in positions], 1)
         
         for pos in positions:
             current_nav = None
@@ -1604,7 +1815,7 @@ async def get_portfolio():
             profit_rate = 0
             
             # 尝试获取当前净值
-            nav_history = db.get_nav_history(pos['fund_code'], days=1)
+            nav_history = latest_navs.get(pos['fund_code'])
             if nav_history:
                 current_nav = nav_history[0].get('nav')
             
@@ -1707,8 +1918,8 @@ async def diagnose_portfolio(user_id: str = 'default'):
     持仓诊断 - AI分析风险与机会
     """
     try:
-        db = get_db()
-        portfolio = db.get_portfolio(user_id=user_id, status='holding')
+        db = get_async_db()
+        portfolio = await db.get_portfolio(user_id=user_id, status='holding')
         
         if not portfolio:
             return {
@@ -1840,12 +2051,12 @@ async def buy_fund(
     模拟买入基金
     """
     try:
-        db = get_db()
+        db = get_async_db()
         service = get_snapshot_service()
         code = code.strip().zfill(6)
         
         # 获取当前净值作为成本价
-        nav_history = db.get_nav_history(code, days=1)
+        nav_history = (await db.get_nav_tails([code], 1)).get(code)
         if nav_history:
             cost_price = nav_history[0].get('nav')
         else:
@@ -1866,12 +2077,12 @@ async def buy_fund(
             }
         
         # 获取基金名称
-        fund_info = db.get_fund(code)
+        fund_info = await db.get_fund(code)
         fund_name = fund_info.get('name', '') if fund_info else f'基金{code}'
         
         buy_date = datetime.datetime.now().strftime('%Y-%m-%d')
         
-        success = db.add_portfolio_position(
+        success = await db.add_portfolio_position(
             fund_code=code,
             fund_name=fund_name,
             shares=shares,
@@ -1913,12 +2124,12 @@ async def sell_fund(
     模拟卖出基金
     """
     try:
-        db = get_db()
+        db = get_async_db()
         
         sell_date = datetime.datetime.now().strftime('%Y-%m-%d')
         
         # 获取持仓信息以获取当前净值
-        positions = db.get_portfolio()
+        positions = await db.get_portfolio()
         position = next((p for p in positions if p['id'] == position_id), None)
         
         if not position:
@@ -1928,10 +2139,10 @@ async def sell_fund(
             }
         
         # 获取当前净值
-        nav_history = db.get_nav_history(position['fund_code'], days=1)
+        nav_history = (await db.get_nav_tails([position['fund_code']], 1)).get(position['fund_code'])
         sell_price = nav_history[0].get('nav') if nav_history else position['cost_price']
         
-        success = db.sell_portfolio_position(
+        success = await db.sell_portfolio_position(
             position_id=position_id,
             sell_price=sell_price,
             sell_date=sell_date
@@ -1968,8 +2179,8 @@ async def sell_fund(
 async def get_portfolio_performance():
     """获取所有持仓的实时表现汇总"""
     try:
-        db = get_db()
-        positions = db.get_portfolio()
+        db = get_async_db()
+        positions = await db.get_portfolio()
         if not positions:
             return {"success": True, "summary": {"total_value": 0, "total_profit": 0}, "items": []}
             
@@ -2030,17 +2241,33 @@ async def fund_comparison(request: CompareRequest):
         return {'status': 'error', 'message': str(e)}
 
 @router.post("/v1/ai/chat/query")
-async def ai_chat_selection(request: AIChatQueryRequest):
+@admission('upstream')
+async def ai_chat_selection(
+    request: AIChatQueryRequest,
+    async_mode: bool = Query(False, description="是否后台执行并立即返回 job_id")
+):
     """
     对话式选基核心接口 (Phase 4)
     """
+    try:
+        return await _run_job('ai_chat_query', _ai_chat_selection, request.query,
+                              async_mode=async_mode, params={'query': request.query})
+    except JobQueueFull as e:
+        return too_busy_response(str(e))
+    except Exception as e:
+        logger.error(f"AI Chat query failed: {e}")
+        return {'status': 'error', 'message': str(e)}
+
+
+async def _ai_chat_selection(query: str) -> Dict[str, Any]:
+    """语义解析 + 高级筛选（在任务池中执行）"""
     try:
         ai = get_ai_service()
         ss = get_snapshot_service()
         
         # 1. 语义解析
-        extraction = await ai.translate_semantic_query(request.query)
-        interpretation = extraction.get('interpretation', f"正在为您搜索 {request.query} 相关基金...")
+        extraction = await ai.translate_semantic_query(query)
+        interpretation = extraction.get('interpretation', f"正在为您搜索 {query} 相关基金...")
         
         # 2. 执行高级筛选
         filters = {}
@@ -2087,13 +2314,13 @@ async def portfolio_diagnose_pro(request: PortfolioDiagnoseRequest):
         if not portfolio:
             return {'status': 'error', 'message': '组合为空'}
             
-        db = get_db()
+        db = get_async_db()
         allocation = {'equity': 0, 'bond': 0, 'cash': 0}
         total_weight = sum(p.get('weight', 0) for p in portfolio)
         
         # 1. 资产配置估算 (基于基金类型)
         for p in portfolio:
-            fund = db.get_fund(p['code'])
+            fund = await db.get_fund(p['code'])
             weight = p.get('weight', 0) / total_weight if total_weight > 0 else 0
             
             ftype = fund.get('fund_type', '') if fund else ''
@@ -2180,12 +2407,13 @@ async def predict_fund_trend(code: str):
             from services.prediction_service import get_trend_predictor
             from services.news_service import get_news_service
         
-        db = get_db()
+        db = get_async_db()
         predictor = get_trend_predictor()
         news_service = get_news_service()
         
-        # 获取历史净值数据
-        nav_history = db.get_nav_history(code, days=90)
+        # 获取近 90 个交易日净值（按日期区间读取，约 130 个自然日）
+        range_start = (datetime.now() - timedelta(days=130)).strftime('%Y-%m-%d')
+        nav_history = (await db.get_nav_range(code, start=range_start))[-90:]
         
         # 如果数据不足（少于20个交易日），尝试在线获取
         if not nav_history or len(nav_history) < 20:
@@ -2200,19 +2428,10 @@ async def predict_fund_trend(code: str):
                 nav_df = fetcher.get_fund_nav(code)
                 
                 if nav_df is not None and not nav_df.empty:
-                    # 保存到缓存
-                    nav_data = []
-                    for _, row in nav_df.iterrows():
-                        nav_data.append({
-                            'date': row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else str(row['date']),
-                            'nav': float(row['nav']) if row['nav'] else None,
-                            'acc_nav': float(row.get('acc_nav', row['nav'])) if row.get('acc_nav') else None
-                        })
-                    
-                    db.save_nav_history(code, nav_data)
-                    
-                    # 重新获取
-                    nav_history = db.get_nav_history(code, days=90)
+                    # 后台写入缓存，本次直接使用在线数据（按日期倒序，与缓存一致）
+                    nav_data = nav_df_to_records(nav_df.sort_values('date'))
+                    db.sync.enqueue_nav_history(code, nav_data)
+                    nav_history = [r for r in nav_data if r['date'] >= range_start][-90:]
             except Exception as e:
                 logger.error(f"在线补充数据失败: {e}")
 
@@ -2222,9 +2441,8 @@ async def predict_fund_trend(code: str):
                 'error': '无法获取历史净值数据(本地不足且在线获取失败)'
             }
         
-        # 转换为DataFrame
-        import pandas as pd
-        df = pd.DataFrame(nav_history)
+        # 转换为DataFrame（保持最新日期在前）
+        df = pd.DataFrame(nav_history[::-1])
         df['nav'] = pd.to_numeric(df['nav'], errors='coerce')
         df = df.dropna(subset=['nav'])
         
@@ -2235,7 +2453,7 @@ async def predict_fund_trend(code: str):
         prediction = predictor.predict_trend(df, news_sentiment)
         
         # 获取基金基本信息
-        fund_info = db.get_fund(code)
+        fund_info = await db.get_fund(code)
         
         return {
             'success': True,
@@ -2409,6 +2627,8 @@ async def update_kb(token: str = Query(..., description="管理员令牌"), keyw
 # ==================== 业绩走势图接口 ====================
 
 @router.get("/fund/{code}/performance-chart")
+@admission('upstream')
+@fast_json
 async def get_fund_performance_chart(
     code: str,
     period: str = Query('1y', description="周期: 1m/3m/6m/1y/3y"),
@@ -2420,41 +2640,38 @@ async def get_fund_performance_chart(
     参考天天基金APP的业绩走势图功能
     """
     try:
-        db = get_db()
+        db = get_async_db()
         fetcher = get_data_fetcher()
         
         # 解析周期
         period_days = {'1m': 30, '3m': 90, '6m': 180, '1y': 365, '3y': 1095}.get(period, 365)
         
         # 1. 获取基金净值历史
-        fund = db.get_fund(code)
+        fund = await db.get_fund(code)
         if not fund:
             return {'success': False, 'error': f'未找到基金 {code}'}
         
-        nav_history = db.get_nav_history(code, days=period_days)
-        if not nav_history or len(nav_history) < 5:
+        start_date = (datetime.now() - timedelta(days=period_days)).strftime('%Y%m%d')
+        series = await _load_nav_series(code, start=start_date)
+        if series is None or len(series[0]) < 5:
             return {'success': False, 'error': '净值数据不足'}
         
         # 2. 获取基准指数数据
-        import pandas as pd
-        start_date = (datetime.datetime.now() - datetime.timedelta(days=period_days)).strftime('%Y%m%d')
-        benchmark_df = fetcher.get_benchmark_data(benchmark, start_date)
+        benchmark_df = await asyncio.to_thread(fetcher.get_benchmark_data, benchmark, start_date)
         
         # 3. 计算累计收益率序列
-        fund_dates = [h['date'] for h in nav_history]
-        fund_navs = [h['nav'] for h in nav_history]
-        first_nav = fund_navs[0]
-        fund_returns = [(nav / first_nav - 1) * 100 for nav in fund_navs]
+        dates, navs = series
+        fund_dates = [str(d) for d in dates]
+        cum_returns = (navs / navs[0] - 1) * 100
+        fund_returns = np.round(cum_returns, 2).tolist()
         
-        # 基准收益率
+        # 基准收益率（整列计算，避免逐行 iterrows）
         benchmark_returns = []
         if benchmark_df is not None and len(benchmark_df) > 0:
-            first_close = benchmark_df['close'].iloc[0]
-            for _, row in benchmark_df.iterrows():
-                benchmark_returns.append({
-                    'date': row['date'].strftime('%Y-%m-%d'),
-                    'return': round((row['close'] / first_close - 1) * 100, 2)
-                })
+            closes = benchmark_df['close'].to_numpy(dtype=float)
+            bench_values = np.round((closes / closes[0] - 1) * 100, 2).tolist()
+            bench_dates = pd.to_datetime(benchmark_df['date']).dt.strftime('%Y-%m-%d').tolist()
+            benchmark_returns = [{'date': d, 'return': r} for d, r in zip(bench_dates, bench_values)]
         
         # 4. 获取同类平均（简化实现：使用该基金主题下其他基金的平均值）
         # 这里返回空数组，后续可扩展
@@ -2467,16 +2684,13 @@ async def get_fund_performance_chart(
                 'fund_name': fund.get('name', code),
                 'period': period,
                 'benchmark': benchmark,
-                'fund_returns': [
-                    {'date': fund_dates[i], 'return': round(fund_returns[i], 2)}
-                    for i in range(len(fund_dates))
-                ],
+                'fund_returns': [{'date': d, 'return': r} for d, r in zip(fund_dates, fund_returns)],
                 'benchmark_returns': benchmark_returns,
                 'category_avg': category_avg,
                 'summary': {
                     'fund_total_return': round(fund_returns[-1], 2) if fund_returns else 0,
                     'benchmark_total_return': benchmark_returns[-1]['return'] if benchmark_returns else 0,
-                    'excess_return': round(fund_returns[-1] - (benchmark_returns[-1]['return'] if benchmark_returns else 0), 2) if fund_returns else 0
+                    'excess_return': round(float(cum_returns[-1]) - (benchmark_returns[-1]['return'] if benchmark_returns else 0), 2) if fund_returns else 0
                 }
             }
         }
@@ -2493,8 +2707,8 @@ async def get_fund_period_returns(code: str):
     参考天天基金APP的业绩表现表格
     """
     try:
-        db = get_db()
-        fund = db.get_fund(code)
+        db = get_async_db()
+        fund = await db.get_fund(code)
         if not fund:
             return {'success': False, 'error': f'未找到基金 {code}'}
         
@@ -2562,8 +2776,8 @@ async def get_fund_manager_info(code: str):
     参考天天基金APP的基金经理展示
     """
     try:
-        db = get_db()
-        fund = db.get_fund(code)
+        db = get_async_db()
+        fund = await db.get_fund(code)
         if not fund:
             return {'success': False, 'error': f'未找到基金 {code}'}
         
@@ -2746,15 +2960,18 @@ async def get_recommendations_v1(
         return {"status": "error", "message": str(e)}
 
 @router.get("/v1/rankings")
+@admission('snapshot')
+@snapshot_cached
 async def get_rankings_v1(
     sort_by: str = Query("score", description="排序字段: score/return_1y /sharpe/alpha/max_drawdown"),
     theme: Optional[str] = Query(None, description="主题筛选"),
-    limit: int = Query(20, description="返回数量")
+    limit: int = Query(20, description="返回数量"),
+    cursor: int = Query(0, description="分页游标（上一页返回的 next_cursor）")
 ):
     """v1 多维排行接口"""
     try:
         service = get_snapshot_service()
-        return service.get_ranking_list(sort_by=sort_by, limit=limit, theme=theme)
+        return service.get_ranking_list(sort_by=sort_by, limit=limit, theme=theme, cursor=cursor)
     except Exception as e:
         logger.error(f"获取排行榜失败: {e}")
         return {"status": "error", "message": str(e)}
@@ -2917,13 +3134,13 @@ async def diagnose_fund_api(code: str):
     获取基金健康度诊断报告
     """
     try:
-        db = get_db()
+        db = get_async_db()
         # 获取最新快照中的指标
-        snapshot = db.get_latest_snapshot()
+        snapshot = await db.get_latest_snapshot()
         if not snapshot:
             return error_response(error="暂无快照数据，请先执行全量更新")
             
-        metrics = db.get_fund_metrics(snapshot['id'], code)
+        metrics = await db.get_fund_metrics(snapshot['id'], code)
         if not metrics:
             return error_response(error=f"未找到基金 {code} 的指标数据")
             
@@ -2960,8 +3177,7 @@ async def get_smart_dca_advice(code: str, amount: float = Query(1000, descriptio
     获取基于均线偏离度的智能定投建议
     """
     try:
-        fetcher = get_data_fetcher()
-        nav_df = fetcher.get_fund_nav(code)
+        nav_df = load_nav_frame(code, get_data_fetcher())
         
         if nav_df is None or nav_df.empty:
             return error_response(error=f"无法获取基金 {code} 的净值数据")
@@ -3004,14 +3220,24 @@ async def get_big_money_flow_api(limit: int = Query(20, ge=5, le=100)):
 # ==================== 专业量化接口 ====================
 
 @router.post("/portfolio/backtest")
-async def run_portfolio_backtest(portfolio: List[Dict[str, Any]]):
+@admission('upstream', route='backtest')
+@fast_json
+async def run_portfolio_backtest(
+    portfolio: List[Dict[str, Any]],
+    async_mode: bool = Query(False, description="是否后台执行并立即返回 job_id")
+):
     """
-    运行投资组合回测
+    运行投资组合回测（在 heavy 任务池中执行）
     """
     try:
         service = get_backtest_service()
-        result = await service.run_backtest(portfolio)
+        result = await _run_job('backtest', service.run_backtest, portfolio,
+                                async_mode=async_mode, pool='heavy', params={'portfolio': portfolio})
+        if async_mode:
+            return result
         return success_response(data=result)
+    except JobQueueFull as e:
+        return too_busy_response(str(e))
     except Exception as e:
         logger.error(f"Backtest failed: {e}")
         return error_response(error=str(e))
@@ -3068,8 +3294,8 @@ async def get_watchlist_realtime():
     获取自选列表及实时估值数据
     """
     try:
-        db = get_db()
-        items = db.get_watchlist()
+        db = get_async_db()
+        items = await db.get_watchlist()
         if not items:
             return success_response(data=[])
             
@@ -3106,8 +3332,8 @@ async def get_watchlist_realtime():
 async def add_to_watchlist(req: WatchlistAddRequest):
     """添加自选"""
     try:
-        db = get_db()
-        db.add_to_watchlist(req.code, req.name)
+        db = get_async_db()
+        await db.add_to_watchlist(req.code, req.name)
         return success_response(message='已加入自选')
     except Exception as e:
         logger.error(f"Add watchlist failed: {e}")
@@ -3117,8 +3343,8 @@ async def add_to_watchlist(req: WatchlistAddRequest):
 async def remove_from_watchlist(req: WatchlistRemoveRequest):
     """移除自选"""
     try:
-        db = get_db()
-        db.remove_from_watchlist(req.code)
+        db = get_async_db()
+        await db.remove_from_watchlist(req.code)
         return success_response(message='已移除')
     except Exception as e:
         logger.error(f"Remove watchlist failed: {e}")
@@ -3155,8 +3381,8 @@ async def build_portfolio(amount: float = Query(..., gt=0), risk_level: str = 'm
 async def get_dca_plans():
     """获取定投计划列表"""
     try:
-        db = get_db()
-        return {"success": True, "data": db.get_dca_plans()}
+        db = get_async_db()
+        return {"success": True, "data": await db.get_dca_plans()}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -3164,8 +3390,8 @@ async def get_dca_plans():
 async def add_dca_plan(plan: Dict[str, Any]):
     """添加或修改定投计划"""
     try:
-        db = get_db()
-        success = db.add_dca_plan(
+        db = get_async_db()
+        success = await db.add_dca_plan(
             fund_code=plan['fund_code'],
             fund_name=plan.get('fund_name'),
             base_amount=plan['base_amount'],
@@ -3181,8 +3407,8 @@ async def add_dca_plan(plan: Dict[str, Any]):
 async def update_dca_status(plan_id: int, is_active: bool):
     """更新定投计划状态 (暂停/启动)"""
     try:
-        db = get_db()
-        success = db.update_dca_status(plan_id, 1 if is_active else 0)
+        db = get_async_db()
+        success = await db.update_dca_status(plan_id, 1 if is_active else 0)
         return {"success": success}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -3191,8 +3417,8 @@ async def update_dca_status(plan_id: int, is_active: bool):
 async def get_notifications():
     """获取未读通知"""
     try:
-        db = get_db()
-        return {"success": True, "data": db.get_unread_notifications()}
+        db = get_async_db()
+        return {"success": True, "data": await db.get_unread_notifications()}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -3200,8 +3426,8 @@ async def get_notifications():
 async def mark_notification_read(notif_id: int):
     """标记通知为已读"""
     try:
-        db = get_db()
-        db.mark_notification_read(notif_id)
+        db = get_async_db()
+        await db.mark_notification_read(notif_id)
         return {"success": True}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -3218,8 +3444,8 @@ class OnboardingRequest(BaseModel):
 async def get_user_profile(user_id: str = 'default'):
     """获取用户档案（含新手引导状态）"""
     try:
-        db = get_db()
-        profile = db.get_user_profile(user_id)
+        db = get_async_db()
+        profile = await db.get_user_profile(user_id)
         return {"success": True, "data": profile}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -3228,8 +3454,8 @@ async def get_user_profile(user_id: str = 'default'):
 async def save_onboarding(req: OnboardingRequest):
     """保存新手引导结果"""
     try:
-        db = get_db()
-        db.save_user_profile(
+        db = get_async_db()
+        await db.save_user_profile(
             risk_level=req.risk_level,
             budget=req.budget,
             onboarding_complete=1,
@@ -3246,16 +3472,19 @@ async def save_onboarding(req: OnboardingRequest):
 async def get_dashboard():
     """聚合仪表盘首页数据"""
     try:
-        db = get_db()
+        db = get_async_db()
         
         # 1. 持仓汇总
-        positions = db.get_portfolio(status='holding')
+        positions = await db.get_portfolio(status='holding')
         total_value = 0
         total_cost = 0
         today_pnl = 0
         
+        # 一次查询取出全部持仓的最近两条净值
+        nav_tails = await db.get_nav_tails([pos['fund_code'] for pos in positions], n=2)
+        
         for pos in positions:
-            nav_history = db.get_nav_history(pos['fund_code'], days=2)
+            nav_history = nav_tails.get(pos['fund_code'], [])
             current_nav = nav_history[0].get('nav') if nav_history else None
             prev_nav = nav_history[1].get('nav') if len(nav_history) > 1 else current_nav
             
@@ -3287,10 +3516,10 @@ async def get_dashboard():
             daily_actions = []
         
         # 3. 未读通知数
-        notifs = db.get_unread_notifications()
+        notifs = await db.get_unread_notifications()
         
         # 4. 市场温度 (简版)
-        market_temp = _calculate_market_temperature(db)
+        market_temp = await db.run(_calculate_market_temperature, db.sync)
         
         return {
             "success": True,
@@ -3375,8 +3604,8 @@ def _calculate_market_temperature(db):
 async def get_proactive_messages():
     """获取 AI 行为教练主动消息"""
     try:
-        db = get_db()
-        messages = db.get_unread_ai_messages()
+        db = get_async_db()
+        messages = await db.get_unread_ai_messages()
         return {"success": True, "data": messages}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -3385,8 +3614,8 @@ async def get_proactive_messages():
 async def mark_proactive_read():
     """标记所有 AI 主动消息为已读"""
     try:
-        db = get_db()
-        db.mark_ai_messages_read()
+        db = get_async_db()
+        await db.mark_ai_messages_read()
         return {"success": True}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -3467,8 +3696,8 @@ async def recovery_calculator(req: RecoveryCalcRequest):
 async def get_dca_growth(plan_id: int):
     """获取定投计划的成长数据（累计投入 vs 当前市值）"""
     try:
-        db = get_db()
-        records = db.get_dca_records(plan_id=plan_id, limit=500)
+        db = get_async_db()
+        records = await db.get_dca_records(plan_id=plan_id, limit=500)
         
         if not records:
             return {"success": True, "data": {"points": [], "message": "暂无执行记录"}}
@@ -3476,32 +3705,43 @@ async def get_dca_growth(plan_id: int):
         # 按时间正序
         records.reverse()
         
+        # 一次区间查询取出首次执行以来的净值，用于按日估值
+        fund_code = records[-1].get('fund_code')
+        first_date = (records[0].get('execute_date') or '').split('T')[0]
+        nav_range = None
+        if fund_code:
+            nav_range = await db.get_nav_range(fund_code, start=first_date or None, as_numpy=True)
+        
         cumulative_invested = 0
         cumulative_shares = 0
         points = []
         
         for rec in records:
+            date_str = rec.get('execute_date', '').split('T')[0] if rec.get('execute_date') else ''
             cumulative_invested += rec.get('amount', 0)
             cumulative_shares += rec.get('shares', 0) or (rec.get('amount', 0) / rec.get('nav', 1) if rec.get('nav') else 0)
             current_nav = rec.get('nav', 1)
+            if nav_range is not None and date_str:
+                # 取执行日当天或之前最近的净值
+                idx = int(np.searchsorted(nav_range[0], np.datetime64(date_str, 'D'), side='right')) - 1
+                if idx >= 0 and not np.isnan(nav_range[1][idx]):
+                    current_nav = float(nav_range[1][idx])
             market_value = cumulative_shares * current_nav
             
             points.append({
-                "date": rec.get('execute_date', '').split('T')[0] if rec.get('execute_date') else '',
+                "date": date_str,
                 "invested": round(cumulative_invested, 2),
                 "market_value": round(market_value, 2),
                 "profit": round(market_value - cumulative_invested, 2)
             })
         
-        # Get latest NAV for final market value update
-        if records and records[-1].get('fund_code'):
-            latest_nav = db.get_nav_history(records[-1]['fund_code'], days=1)
-            if latest_nav and latest_nav[0].get('nav'):
-                final_nav = latest_nav[0]['nav']
-                final_value = cumulative_shares * final_nav
-                if points:
-                    points[-1]['market_value'] = round(final_value, 2)
-                    points[-1]['profit'] = round(final_value - cumulative_invested, 2)
+        # 以最新净值更新最终市值
+        if nav_range is not None:
+            valid = np.flatnonzero(~np.isnan(nav_range[1]))
+            if len(valid) and points:
+                final_value = cumulative_shares * float(nav_range[1][valid[-1]])
+                points[-1]['market_value'] = round(final_value, 2)
+                points[-1]['profit'] = round(final_value - cumulative_invested, 2)
         
         return {
             "success": True,
@@ -3526,15 +3766,15 @@ async def get_dca_growth(plan_id: int):
 async def get_fund_alternatives(code: str):
     """获取同类基金替换建议"""
     try:
-        db = get_db()
+        db = get_async_db()
         code = code.strip().zfill(6)
         
-        snapshot = db.get_latest_snapshot()
+        snapshot = await db.get_latest_snapshot()
         if not snapshot:
             return {"success": False, "error": "暂无快照数据"}
         
         # 获取当前基金的指标
-        current = db.get_fund_metrics(snapshot['id'], code)
+        current = await db.get_fund_metrics(snapshot['id'], code)
         if not current:
             return {"success": False, "error": f"未找到基金 {code} 的指标"}
         
@@ -3546,12 +3786,12 @@ async def get_fund_alternatives(code: str):
         candidates = []
         if current_themes and isinstance(current_themes, list) and current_themes:
             for theme in current_themes[:2]:
-                theme_funds = db.get_funds_by_theme(snapshot['id'], theme, limit=50)
+                theme_funds = await db.get_funds_by_theme(snapshot['id'], theme, limit=50)
                 candidates.extend(theme_funds)
         
         if not candidates:
             # Fallback: 取评分最高的基金
-            candidates = db.get_recommendations(snapshot['id'], limit=50)
+            candidates = await db.get_recommendations(snapshot['id'], limit=50)
         
         # 过滤：不包含自身，且评分更高或回撤更小
         alternatives = []
@@ -3607,18 +3847,19 @@ async def get_fund_alternatives(code: str):
 async def get_monthly_report(month: str = None):
     """生成月度投资体检报告"""
     try:
-        db = get_db()
+        db = get_async_db()
         if not month:
             from datetime import datetime
             month = datetime.now().strftime('%Y-%m')
         
         # 持仓数据
-        positions = db.get_portfolio(status='holding')
+        positions = await db.get_portfolio(status='holding')
         total_value = 0
         total_cost = 0
+        latest_navs = await db.get_nav_tails([pos['fund_code'] for pos in positions], 1)
         
         for pos in positions:
-            nav = db.get_nav_history(pos['fund_code'], days=1)
+            nav = latest_navs.get(pos['fund_code'])
             current_nav = nav[0].get('nav') if nav else pos.get('cost_price', 0)
             if current_nav:
                 total_value += pos['shares'] * current_nav
@@ -3627,14 +3868,14 @@ async def get_monthly_report(month: str = None):
         monthly_return = round((total_value / total_cost - 1) * 100, 2) if total_cost > 0 else 0
         
         # DCA 执行统计
-        dca_records = db.get_dca_records(limit=100)
+        dca_records = await db.get_dca_records(limit=100)
         month_dca = [r for r in dca_records if r.get('execute_date', '').startswith(month)]
         
         # 行为标签统计
-        tags = db.get_behavior_tags(days=30)
+        tags = await db.get_behavior_tags(days=30)
         
         # 市场温度
-        market_temp = _calculate_market_temperature(db)
+        market_temp = await db.run(_calculate_market_temperature, db.sync)
         
         report = {
             "month": month,
@@ -3672,46 +3913,20 @@ async def what_if_simulator(
 ):
     """如果当初买了XX基金，现在值多少"""
     try:
-        db = get_db()
+        db = get_async_db()
         code = code.strip().zfill(6)
         
-        # 获取历史净值
-        nav_list = db.get_nav_history(code, days=365*3, limit=1000)
-        
-        if not nav_list:
-            # 尝试在线获取
-            fetcher = get_data_fetcher()
-            nav_df = fetcher.get_fund_nav(code)
-            if nav_df is not None and not nav_df.empty:
-                nav_data = []
-                for _, row in nav_df.iterrows():
-                    nav_data.append({
-                        'date': row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else str(row['date']),
-                        'nav': float(row['nav']) if row['nav'] else None,
-                        'acc_nav': float(row.get('acc_nav', row['nav'])) if row.get('acc_nav') else None
-                    })
-                db.save_nav_history(code, nav_data)
-                nav_list = db.get_nav_history(code, days=365*3, limit=1000)
-        
-        if not nav_list:
+        # 获取起始日期以来的净值序列
+        series = await _load_nav_series(code, start=start_date)
+        if series is None or not len(series[0]):
             return {"success": False, "error": "无法获取净值数据"}
+        dates, navs = series
         
-        # 按日期正序排列
-        nav_list.sort(key=lambda x: x.get('date', ''))
-        
-        # 找到起始日期附近的净值
-        start_nav = None
-        start_idx = 0
-        for i, n in enumerate(nav_list):
-            if n.get('date', '') >= start_date:
-                start_nav = n.get('nav')
-                start_idx = i
-                break
-        
+        start_nav = float(navs[0])
         if not start_nav:
             return {"success": False, "error": f"在 {start_date} 附近未找到净值数据"}
         
-        latest_nav = nav_list[-1].get('nav')
+        latest_nav = float(navs[-1])
         if not latest_nav:
             return {"success": False, "error": "无法获取最新净值"}
         
@@ -3722,34 +3937,32 @@ async def what_if_simulator(
         profit_rate = (latest_nav / start_nav - 1) * 100
         
         # 比较基准：余额宝（3.5%年化简单计算）
-        from datetime import datetime
+        end_date = str(dates[-1])
         start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(nav_list[-1].get('date'), '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
         years = (end_dt - start_dt).days / 365.0
         money_market_value = amount * ((1 + 0.02) ** years)  # 2% 年化
         
         # 生成走势曲线 (抽样)
-        step = max(1, (len(nav_list) - start_idx) // 50)
+        step = max(1, len(navs) // 50)
         chart = []
-        for i in range(start_idx, len(nav_list), step):
-            n = nav_list[i]
-            days_elapsed = i - start_idx
-            mm_value = amount * ((1 + 0.02 / 250) ** days_elapsed)
+        for i in range(0, len(navs), step):
+            mm_value = amount * ((1 + 0.02 / 250) ** i)
             chart.append({
-                "date": n.get('date'),
-                "fund_value": round(shares * n.get('nav', start_nav), 2),
+                "date": str(dates[i]),
+                "fund_value": round(shares * float(navs[i]), 2),
                 "money_market": round(mm_value, 2)
             })
         # 确保最后一个点
-        if chart and chart[-1]['date'] != nav_list[-1].get('date'):
+        if chart and chart[-1]['date'] != end_date:
             chart.append({
-                "date": nav_list[-1].get('date'),
+                "date": end_date,
                 "fund_value": round(current_value, 2),
                 "money_market": round(money_market_value, 2)
             })
         
         # 基金名称
-        fund = db.get_fund(code)
+        fund = await db.get_fund(code)
         fund_name = fund.get('name', code) if fund else code
         
         return {
@@ -3758,7 +3971,7 @@ async def what_if_simulator(
                 "fund_code": code,
                 "fund_name": fund_name,
                 "start_date": start_date,
-                "end_date": nav_list[-1].get('date'),
+                "end_date": end_date,
                 "amount": amount,
                 "start_nav": round(start_nav, 4),
                 "latest_nav": round(latest_nav, 4),
@@ -3782,8 +3995,8 @@ async def what_if_simulator(
 async def get_behavior_profile(user_id: str = 'default'):
     """获取投资者行为画像雷达图数据"""
     try:
-        db = get_db()
-        tags = db.get_behavior_tags(user_id=user_id, days=180)
+        db = get_async_db()
+        tags = await db.get_behavior_tags(user_id=user_id, days=180)
         
         # 统计各维度
         tag_counts = {t['tag']: t['count'] for t in tags}
@@ -3796,7 +4009,7 @@ async def get_behavior_profile(user_id: str = 'default'):
         panic_sells = tag_counts.get('恐慌卖出', 0)
         volatility_tolerance = max(5 - panic_sells * 2, 0)
         # 分散度 = 根据持仓数量
-        positions = db.get_portfolio(user_id=user_id, status='holding')
+        positions = await db.get_portfolio(user_id=user_id, status='holding')
         diversification = min(len(positions) / 3, 5) if positions else 1
         # 持有耐心 = 根据平均持有天数（简化）
         patience = min(tag_counts.get('长期持有', 0) + 2, 5)
@@ -3852,11 +4065,13 @@ async def get_behavior_profile(user_id: str = 'default'):
 # ==================== Feature 11: 市场温度计 ====================
 
 @router.get("/market/temperature")
+@admission('snapshot')
+@snapshot_cached
 async def get_market_temperature():
     """获取市场温度计"""
     try:
-        db = get_db()
-        result = _calculate_market_temperature(db)
+        db = get_async_db()
+        result = await db.run(_calculate_market_temperature, db.sync)
         return {"success": True, "data": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
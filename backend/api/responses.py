@@ -1,6 +1,23 @@
 # backend/api/responses.py
+import functools
+import inspect
 from typing import Any, Optional, Generic, TypeVar, List, Dict
 from pydantic import BaseModel
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    from config import get_settings
+    from database import get_async_db
+    from utils.response_cache import etag_matches
+    from utils.json_codec import dumps_json
+    from utils.admission import AdmissionRejected, get_admission_controller
+except (ImportError, ValueError):
+    from backend.config import get_settings
+    from backend.database import get_async_db
+    from backend.utils.response_cache import etag_matches
+    from backend.utils.json_codec import dumps_json
+    from backend.utils.admission import AdmissionRejected, get_admission_controller
 
 DataT = TypeVar("DataT")
 
@@ -22,3 +39,128 @@ def success_response(data: Any = None, message: str = None, meta: Dict[str, Any]
 
 def error_response(error: str, message: str = None) -> ApiResponse:
     return ApiResponse(success=False, error=error, message=message)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    大数据量接口使用的 JSON 响应（直接返回实例，跳过 FastAPI 默认的 jsonable_encoder 逐层复制；
+    orjson 原生支持 numpy 数组/标量）
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def fast_json(endpoint):
+    """把接口返回值包装为 FastJSONResponse（放在 @router.get 之下；已是 Response 的原样返回）"""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        return FastJSONResponse(result)
+
+    return wrapper
+
+
+def too_busy_response(error: str, retry_after: int = 5) -> JSONResponse:
+    """429：服务繁忙，附带 Retry-After"""
+    return JSONResponse(
+        status_code=429,
+        content={'success': False, 'error': error, 'retry_after': retry_after},
+        headers={'Retry-After': str(retry_after)}
+    )
+
+
+def admission(lane: str, route: str = None):
+    """
+    准入控制装饰器（放在 @router.xxx 之下）
+
+    lane: 'snapshot'（基于快照的本地读取）或 'upstream'（需要访问上游数据源）；
+    route: 可选的路由限额名（见 Settings.ADMISSION_ROUTE_LIMITS）。
+    并发与排队均已满或等待超时时返回 429 + Retry-After。
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            if not get_settings().ADMISSION_ENABLED:
+                return await endpoint(*args, **kwargs)
+            try:
+                async with get_admission_controller().admit(lane, route):
+                    return await endpoint(*args, **kwargs)
+            except AdmissionRejected as e:
+                return too_busy_response(str(e), e.retry_after)
+        return wrapper
+    return decorator
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """编码一条 Server-Sent Events 消息"""
+    return b'event: ' + event.encode('utf-8') + b'\ndata: ' + dumps_json(data) + b'\n\n'
+
+
+def sse_response(events) -> StreamingResponse:
+    """以 text/event-stream 返回异步生成器产出的消息（禁用缓存与反向代理缓冲）"""
+    return StreamingResponse(events, media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def _is_cacheable(result: Any) -> bool:
+    """失败结果不缓存（兼容 success=False 与 status='error' 两种写法）"""
+    if isinstance(result, dict):
+        return result.get('success') is not False and result.get('status') != 'error'
+    return getattr(result, 'success', None) is not False
+
+
+def snapshot_cached(endpoint):
+    """
+    快照派生接口的响应缓存装饰器（放在 @router.get 之下）
+
+    按 (路径, 查询参数) 缓存序列化后的响应体，库中快照版本变化（任一 worker 完成或删除快照）时失效；
+    响应携带 ETag / Cache-Control，If-None-Match 命中时返回 304。
+    """
+    signature = inspect.signature(endpoint)
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, _cache_request: Request, **kwargs):
+        settings = get_settings()
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return await endpoint(*args, **kwargs)
+
+        db = get_async_db()
+        cache = db.sync.response_cache
+        # 每次请求读库校验版本：快照可能由其他 worker 完成或删除
+        latest_id, count = await db.get_snapshot_version()
+        version = f'{latest_id}.{count}'
+        generation = cache.sync(version)
+
+        request = _cache_request
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        entry = cache.get(key)
+        if entry is None:
+            result = await endpoint(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+            body = dumps_json(result)
+            if not _is_cacheable(result):
+                return Response(body, media_type='application/json')
+            entry = cache.put(key, body, generation, version)
+
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': f'public, max-age={settings.RESPONSE_CACHE_MAX_AGE}',
+            'X-Snapshot-Version': str(latest_id)
+        }
+        if etag_matches(request.headers.get('if-none-match'), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type='application/json', headers=headers)
+
+    # 向 FastAPI 声明额外的 Request 参数，其余参数保持原样
+    wrapper.__signature__ = signature.replace(parameters=[
+        *signature.parameters.values(),
+        inspect.Parameter('_cache_request', inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+    ])
+    return wrapper
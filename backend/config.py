@@ -4,7 +4,7 @@
 """
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -19,6 +19,12 @@ class Settings(BaseSettings):
     
     # === 数据库 ===
     DATABASE_PATH: str = "data/fund_advisor.db"
+    DB_READ_POOL_SIZE: int = 8  # 只读连接池上限
+    DB_CACHE_SIZE_MB: int = 64  # 每个连接的页缓存
+    DB_MMAP_SIZE_MB: int = 256  # 内存映射读取上限
+    NAV_PANEL_PATH: str = "data/nav_panel.npy"  # 共享净值面板：索引为同名 .json，矩阵为 nav_panel.<代次>.npy
+    DB_PROFILE_ENABLED: bool = False  # 查询剖析（按方法统计延迟/行数并记录慢查询），也可在管理接口开关
+    DB_SLOW_QUERY_MS: float = 200.0  # 慢查询阈值（毫秒），超过时记录 EXPLAIN QUERY PLAN
     
     # === AI 服务 ===
     AI_API_KEY: Optional[str] = None
@@ -27,6 +33,10 @@ class Settings(BaseSettings):
     AI_FALLBACK_MODELS: List[str] = ["gpt-3.5-turbo"]
     AI_TIMEOUT: int = 30
     AI_MAX_RETRIES: int = 2
+    AI_CACHE_L1_SIZE: int = 512  # 进程内 AI 缓存条目上限（LRU）
+    AI_CACHE_L1_TTL: int = 3600  # 进程内条目最长保留秒数
+    AI_CACHE_NEGATIVE_TTL: int = 60  # “无缓存”结果在内存中记忆的秒数
+    AI_CACHE_MAX_ROWS: int = 5000  # ai_cache 表行数上限，定时清理时淘汰最旧条目
     
     # === 安全 ===
     ADMIN_TOKEN: Optional[str] = None
@@ -45,16 +55,45 @@ class Settings(BaseSettings):
     
     # === 计算参数 ===
     DEFAULT_BENCHMARK: str = "000300"  # 沪深300
+    BENCHMARK_INDICES: List[str] = ["000300", "000905", "000852"]  # 持久化并每日增量刷新的基准指数
+    BENCHMARK_HISTORY_DAYS: int = 365 * 5  # 基准指数首次回填的历史天数
+    BENCHMARK_RETRY_SECONDS: int = 600  # 基准指数拉取失败后，请求路径上暂停重试的时间
     MIN_DATA_DAYS: int = 60  # 最少数据天数
     RISK_FREE_RATE: float = 0.025  # 无风险利率
     
     # === 缓存 ===
     AI_CACHE_HOURS: int = 24
     QUERY_CACHE_SECONDS: int = 300
-    
+    RESPONSE_CACHE_ENABLED: bool = True  # 快照派生接口的响应缓存（按快照版本失效）
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512  # 缓存的响应条数上限（LRU）
+    RESPONSE_CACHE_MAX_AGE: int = 60  # 下发给客户端的 Cache-Control max-age（秒）
+
     # === 性能优化 ===
     ENABLE_CONCURRENT_FETCH: bool = True
     MAX_CONCURRENT_WORKERS: int = 8
+    VALUATION_STREAM_INTERVAL: int = 30  # 实时估值推送的刷新间隔（秒），所有订阅者共用一次上游刷新
+    VALUATION_STREAM_MAX_CODES: int = 200  # 单个订阅最多关注的基金数
+    FUNDS_BATCH_MAX_CODES: int = 50  # 批量详情接口单次最多的基金数
+    JOB_WORKERS_DEFAULT: int = 4  # 后台任务 default 池（对比、板块、AI 选基等）的并发数
+    JOB_WORKERS_HEAVY: int = 2  # heavy 池（回测等）的并发数
+    JOB_QUEUE_LIMIT: int = 100  # 每个任务池排队上限，超过后拒绝提交
+    JOB_RETENTION_DAYS: int = 7  # 已完成任务记录的保留天数
+    ADMISSION_ENABLED: bool = True  # 准入控制：并发/排队超限时返回 429
+    ADMISSION_SNAPSHOT_CONCURRENCY: int = 32  # 快照读取通道的并发数
+    ADMISSION_SNAPSHOT_QUEUE: int = 256  # 快照读取通道的排队上限
+    ADMISSION_UPSTREAM_CONCURRENCY: int = 6  # 上游数据通道的并发数
+    ADMISSION_UPSTREAM_QUEUE: int = 24  # 上游数据通道的排队上限
+    ADMISSION_ROUTE_LIMITS: Dict[str, List[int]] = {  # 单个路由的 [并发数, 排队上限]
+        'backtest': [2, 4],
+        'simulate_dca': [2, 6],
+        'sector_metrics': [3, 6],
+        'funds_batch': [4, 8]
+    }
+    ADMISSION_MAX_WAIT: float = 15.0  # 排队等待超时（秒），超时同样返回 429
+
+    # === 监控 ===
+    METRICS_ENABLED: bool = True  # 请求/上游/缓存/快照指标，以 Prometheus 文本格式暴露在 /metrics
+    PROFILE_MAX_SECONDS: int = 300  # 单次采样剖析的最长时长（秒）
     
     class Config:
         env_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
@@ -7,15 +7,46 @@ import sqlite3
 import json
 import logging
 import threading
+import queue
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from contextlib import contextmanager
 
+import numpy as np
+
 from .config import get_settings, ensure_data_dir
+from .utils.nav_codec import encode_nav_columns, decode_nav_columns
+from .utils.helpers import as_day
+from .utils.metric_row import wrap_rows
+from .utils.cache import CacheManager
+from .utils.query_profiler import QueryProfiler
+from .utils.response_cache import SnapshotResponseCache
 
 logger = logging.getLogger(__name__)
 
+# AI 缓存 L1 中表示“库中无此条目”的占位值
+_CACHE_MISS = object()
+
+
+# 列表查询读取的指标列（不含体积较大的 raw_metrics）
+METRIC_LIST_COLUMNS = (
+    'id', 'snapshot_id', 'code', 'name', 'score', 'labels', 'reasons', 'themes',
+    'latest_nav', 'nav_date', 'alpha', 'beta', 'sharpe', 'annual_return', 'volatility',
+    'max_drawdown', 'current_drawdown', 'win_rate', 'profit_loss_ratio',
+    'return_1w', 'return_1m', 'return_3m', 'return_6m', 'return_1y', 'return_1d',
+    'data_days', 'created_at'
+)
+
+
+def _metric_columns(alias: str = None) -> str:
+    """生成 SELECT 列清单，可带表别名"""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + col for col in METRIC_LIST_COLUMNS)
+
 
 class Database:
     """线程安全的数据库单例"""
@@ -38,35 +69,128 @@ class Database:
         ensure_data_dir()
         settings = get_settings()
         self.db_path = settings.DATABASE_PATH
+        self._cache_size_kb = settings.DB_CACHE_SIZE_MB * 1024
+        self._mmap_size = settings.DB_MMAP_SIZE_MB * 1024 * 1024
         self._local = threading.local()
+        
+        # 查询剖析（默认关闭，开启后包装借出的游标）
+        self.profiler = QueryProfiler(settings.DB_PROFILE_ENABLED, settings.DB_SLOW_QUERY_MS)
+        self.profiler.bind(__file__)
+        
+        # AI 缓存进程内 L1（LRU），热点条目不再访问数据库
+        self._ai_l1 = CacheManager(expire=settings.AI_CACHE_L1_TTL, max_items=settings.AI_CACHE_L1_SIZE, name='ai_l1')
+        self._ai_negative_ttl = settings.AI_CACHE_NEGATIVE_TTL
+        self._ai_max_rows = settings.AI_CACHE_MAX_ROWS
+        
+        # 快照派生接口的响应缓存，快照完成/删除时失效
+        self.response_cache = SnapshotResponseCache(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
+        
+        # 单写者：全局唯一写连接，写操作串行执行
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        
+        # 只读连接池：按需创建，最多 DB_READ_POOL_SIZE 个
+        self._read_pool_size = max(1, settings.DB_READ_POOL_SIZE)
+        self._read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+        
+        # 后台写线程：大批量净值等非关键写入移出请求路径
+        self._bg_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        
         self._check_migrations()
         self._initialized = True
         logger.info(f"数据库初始化完成: {self.db_path}")
     
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """创建连接并应用性能相关 PRAGMA"""
+        if readonly:
+            uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30.0)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{self._cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size={self._mmap_size}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
     def _get_connection(self) -> sqlite3.Connection:
-        """获取当前线程的数据库连接"""
-        if not hasattr(self._local, 'connection') or self._local.connection is None:
-            self._local.connection = sqlite3.connect(
-                self.db_path,
-                check_same_thread=False,
-                timeout=30.0
-            )
-            self._local.connection.row_factory = sqlite3.Row
-        return self._local.connection
+        """获取全局写连接"""
+        if self._write_conn is None:
+            with self._write_lock:
+                if self._write_conn is None:
+                    self._write_conn = self._connect()
+        return self._write_conn
     
     @contextmanager
     def get_cursor(self):
-        """获取数据库游标的上下文管理器"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        """获取写游标的上下文管理器（单写者串行，块结束时提交）"""
+        with self._write_lock:
+            conn = self._get_connection()
+            cursor = self.profiler.wrap(conn.cursor())
+            self._local.write_depth = getattr(self._local, 'write_depth', 0) + 1
+            try:
+                yield cursor
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                self._local.write_depth -= 1
+                cursor.close()
+    
+    @contextmanager
+    def get_read_cursor(self):
+        """
+        获取只读游标的上下文管理器
+        从只读连接池借用连接，WAL 模式下不受写事务阻塞；
+        当前线程处于写块内时复用写连接，保证能读到未提交的修改
+        """
+        if getattr(self._local, 'write_depth', 0) > 0:
+            with self.get_cursor() as cursor:
+                yield cursor
+            return
+        
+        # 同一线程嵌套读取时复用已借出的连接，避免池耗尽死锁
+        conn = getattr(self._local, 'read_conn', None)
+        owner = conn is None
+        if owner:
+            conn = self._acquire_reader()
+            self._local.read_conn = conn
+        cursor = self.profiler.wrap(conn.cursor())
         try:
             yield cursor
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
         finally:
             cursor.close()
+            if owner:
+                self._local.read_conn = None
+                self._read_pool.put(conn)
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """从连接池借出只读连接，池满时等待归还"""
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            create = self._reader_count < self._read_pool_size
+            if create:
+                self._reader_count += 1
+        if create:
+            try:
+                return self._connect(readonly=True)
+            except Exception:
+                with self._pool_lock:
+                    self._reader_count -= 1
+                raise
+        
+        try:
+            return self._read_pool.get(timeout=30.0)
+        except queue.Empty:
+            raise sqlite3.OperationalError("只读连接池已耗尽，等待超时")
     
     def _check_migrations(self):
         """检查并执行数据库迁移"""
@@ -74,6 +198,9 @@ class Database:
         cursor = conn.cursor()
         
         try:
+            # 0. 启用 WAL：读写互不阻塞（设置持久化在数据库文件中）
+            cursor.execute("PRAGMA journal_mode=WAL")
+            
             # 1. 初始化表
             self._init_tables(cursor)
             
@@ -87,12 +214,29 @@ class Database:
             migrations = [
                 (1, "初始版本", None),
                 (2, "用户画像扩展: 新手引导与行为标签", None),  # 新表在 _init_tables 中创建
+                (3, "候选基金列表持久化", None),
+                (4, "基准指数历史持久化", None),
+                (5, "主题关联表回填", """
+                    INSERT OR IGNORE INTO fund_metric_themes (snapshot_id, theme, code, score)
+                    SELECT m.snapshot_id, j.value, m.code, m.score
+                    FROM fund_metrics m, json_each(m.themes) j
+                    WHERE json_valid(m.themes) AND j.value IS NOT NULL AND j.value != ''
+                """),
+                (6, "净值历史迁移至列式存储", self._migrate_nav_history_to_store),
+                (7, "榜单名次物化回填", self._backfill_rankings),
+                (8, "跨快照指标历史回填", self._backfill_metric_history),
+                (9, "后台任务表", None),  # 新表在 _init_tables 中创建
+                (10, "后台任务归属进程", "ALTER TABLE jobs ADD COLUMN owner_pid INTEGER"),
+                (11, "删除已迁移的逐日净值表", "DROP TABLE IF EXISTS nav_history"),  # 索引随表删除
             ]
             
+            vacuum_needed = False
             for version, description, sql in migrations:
                 if version > current_version:
                     logger.info(f"正在执行数据库迁移 v{version}: {description}")
-                    if sql:
+                    if callable(sql):
+                        vacuum_needed = bool(sql(cursor)) or vacuum_needed
+                    elif sql:
                         cursor.execute(sql)
                     
                     # 更新版本号
@@ -101,6 +245,10 @@ class Database:
                         cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
                     conn.commit()
             
+            if vacuum_needed:
+                logger.info("正在压缩数据库文件...")
+                conn.execute("VACUUM")
+            
             logger.info("数据库迁移检查完成")
             
         except Exception as e:
@@ -208,6 +356,24 @@ class Database:
             )
         """)
         
+        # 后台任务表（任务状态与结果持久化，重启后仍可查询）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                pool TEXT NOT NULL,
+                priority INTEGER DEFAULT 5,
+                status TEXT DEFAULT 'queued',
+                params TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                started_at TEXT,
+                finished_at TEXT
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        
         # 自选基金表 (新增)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS watchlist (
@@ -221,19 +387,6 @@ class Database:
             )
         """)
         
-        # 净值历史缓存表 (新增)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS nav_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fund_code TEXT NOT NULL,
-                nav_date TEXT NOT NULL,
-                nav REAL,
-                acc_nav REAL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(fund_code, nav_date)
-            )
-        """)
-        
         # 持仓模拟表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS portfolio (
@@ -369,19 +522,121 @@ class Database:
             )
         """)
         
+        # 候选基金缓存表（按筛选模式保存，source_hash 为全市场基金列表哈希）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS candidate_funds (
+                mode TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                fund_count INTEGER DEFAULT 0,
+                candidates TEXT NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # 基准指数日线表（每日增量追加）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS index_history (
+                symbol TEXT NOT NULL,
+                trade_date TEXT NOT NULL,
+                close REAL NOT NULL,
+                PRIMARY KEY (symbol, trade_date)
+            )
+        """)
+        
+        # 指标-主题关联表（快照时展开 fund_metrics.themes，供主题筛选走索引）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fund_metric_themes (
+                snapshot_id INTEGER NOT NULL,
+                theme TEXT NOT NULL,
+                code TEXT NOT NULL,
+                score REAL,
+                PRIMARY KEY (snapshot_id, theme, code)
+            )
+        """)
+        
+        # 榜单名次物化表（快照完成时按每个排序字段预先排好名次，榜单按名次区间读取）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fund_metric_ranks (
+                snapshot_id INTEGER NOT NULL,
+                sort_key TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                PRIMARY KEY (snapshot_id, sort_key, position)
+            ) WITHOUT ROWID
+        """)
+        
+        # 跨快照指标历史（每个快照日期每只基金一行，供走势与名次变化查询）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fund_metric_history (
+                code TEXT NOT NULL,
+                snapshot_date TEXT NOT NULL,
+                snapshot_id INTEGER NOT NULL,
+                name TEXT,
+                score REAL,
+                rank INTEGER,
+                latest_nav REAL,
+                sharpe REAL,
+                alpha REAL,
+                max_drawdown REAL,
+                volatility REAL,
+                return_1y REAL,
+                labels TEXT,
+                PRIMARY KEY (code, snapshot_date)
+            ) WITHOUT ROWID
+        """)
+        
+        # 净值列式存储表（每只基金一行，日期/净值列压缩为一个二进制块）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS nav_store (
+                fund_code TEXT PRIMARY KEY,
+                start_date TEXT,
+                end_date TEXT,
+                points INTEGER DEFAULT 0,
+                latest_nav REAL,
+                data BLOB NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
         # 创建索引
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_snapshot ON fund_metrics(snapshot_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_code ON fund_metrics(code)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_score ON fund_metrics(score DESC)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_date ON snapshots(snapshot_date DESC)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_key ON ai_cache(cache_key)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_expires ON ai_cache(expires_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_watchlist_user ON watchlist(user_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_nav_history_code ON nav_history(fund_code, nav_date DESC)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_user ON portfolio(user_id, status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_rec_history_date ON recommendation_history(recommend_date DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_metric_themes_score ON fund_metric_themes(snapshot_id, theme, score DESC, code)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_metric_history_date ON fund_metric_history(snapshot_date, rank)")
         
         logger.info("数据库基础表初始化完成")
     
+    def _migrate_nav_history_to_store(self, cursor) -> bool:
+        """将逐日行存储的 nav_history 转换为 nav_store 列式块，返回是否有数据被迁移"""
+        # 新建的数据库没有 nav_history 表（v11 起不再创建）
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nav_history'")
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute("SELECT DISTINCT fund_code FROM nav_history")
+        codes = [row[0] for row in cursor.fetchall()]
+        for code in codes:
+            cursor.execute("""
+                SELECT nav_date, nav, acc_nav FROM nav_history
+                WHERE fund_code = ? ORDER BY nav_date ASC
+            """, (code,))
+            rows = cursor.fetchall()
+            columns = self._nav_rows_to_columns([
+                {'date': r[0], 'nav': r[1], 'acc_nav': r[2]} for r in rows
+            ])
+            if columns is not None:
+                self._write_nav_store(cursor, code, *columns)
+        if codes:
+            cursor.execute("DELETE FROM nav_history")
+            logger.info(f"已迁移 {len(codes)} 只基金的净值历史至列式存储")
+        return bool(codes)
+    
     # ==================== 基金操作 ====================
     
     def upsert_fund(self, code: str, name: str, fund_type: str = None, themes: List[str] = None):
@@ -401,7 +656,7 @@ class Database:
     
     def get_fund(self, code: str) -> Optional[Dict]:
         """获取基金信息"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("SELECT * FROM funds WHERE code = ?", (code,))
             row = cursor.fetchone()
             if row:
@@ -414,9 +669,19 @@ class Database:
                 return result
         return None
     
+    def get_funds_batch(self, codes: List[str]) -> Dict[str, Dict]:
+        """一次 IN 查询批量获取多只基金的基础信息，返回 {code: fund}"""
+        codes = list(dict.fromkeys(codes))
+        if not codes:
+            return {}
+        placeholders = ','.join(['?'] * len(codes))
+        with self.get_read_cursor() as cursor:
+            cursor.execute(f"SELECT * FROM funds WHERE code IN ({placeholders})", codes)
+            return {row['code']: row for row in wrap_rows(cursor, json_fields=('themes',))}
+    
     def search_funds(self, keyword: str, limit: int = 20) -> List[Dict]:
         """搜索基金"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             # 代码精确匹配优先，然后名称模糊匹配
             cursor.execute("""
                 SELECT f.*, fm.return_1y, fm.score 
@@ -447,13 +712,13 @@ class Database:
     
     def get_fund_count(self) -> int:
         """获取基金总数"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("SELECT COUNT(*) FROM funds")
             return cursor.fetchone()[0]
     
     def get_all_themes(self, snapshot_id: int = None) -> List[Dict]:
         """获取所有唯一的基金主题及其统计"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             # 如果没有指定snapshot_id，使用最新的
             if snapshot_id is None:
                 snapshot = self.get_latest_snapshot()
@@ -461,52 +726,116 @@ class Database:
                     return []
                 snapshot_id = snapshot['id']
             
-            # 获取所有基金的themes字段
             cursor.execute("""
-                SELECT themes, COUNT(*) as count 
-                FROM fund_metrics 
-                WHERE snapshot_id = ? AND themes IS NOT NULL AND themes != '[]'
-                GROUP BY themes
+                SELECT theme, COUNT(*) as count
+                FROM fund_metric_themes
+                WHERE snapshot_id = ?
+                GROUP BY theme
+                ORDER BY count DESC
             """, (snapshot_id,))
-            
-            # 解析并统计主题
-            theme_counts = {}
-            for row in cursor.fetchall():
-                themes_str = row[0]
-                count = row[1]
-                try:
-                    themes = json.loads(themes_str) if themes_str else []
-                    for theme in themes:
-                        if theme:
-                            theme_counts[theme] = theme_counts.get(theme, 0) + count
-                except:
-                    pass
-            
-            # 按数量排序
-            sorted_themes = sorted(theme_counts.items(), key=lambda x: -x[1])
-            return [{'name': t[0], 'count': t[1]} for t in sorted_themes]
+            return [{'name': row[0], 'count': row[1]} for row in cursor.fetchall()]
     
     def get_funds_by_theme(self, snapshot_id: int, theme: str, limit: int = 100) -> List[Dict]:
-        """获取指定主题的基金列表"""
+        """获取指定主题的基金列表（主题匹配规则见 _theme_condition）"""
+        with self.get_read_cursor() as cursor:
+            return self._query_theme_funds(cursor, snapshot_id, theme, limit)
+    
+    def _theme_condition(self, cursor, snapshot_id: int, theme: str) -> tuple:
+        """
+        主题筛选规则（推荐、主题、榜单统一）：
+        快照中存在该主题名时精确匹配 fund_metric_themes，走 (snapshot_id, theme) 索引；
+        否则视为非标准主题名，按子串兼容匹配。返回 (运算符, 参数)
+        """
+        cursor.execute(
+            "SELECT 1 FROM fund_metric_themes WHERE snapshot_id = ? AND theme = ? LIMIT 1",
+            (snapshot_id, theme)
+        )
+        if cursor.fetchone():
+            return '=', theme
+        return 'LIKE', f'%{theme}%'
+    
+    def _query_theme_funds(self, cursor, snapshot_id: int, theme: str, limit: int) -> List[Dict]:
+        """按主题取评分最高的基金"""
+        op, value = self._theme_condition(cursor, snapshot_id, theme)
+        if op == '=':
+            cursor.execute(f"""
+                SELECT {_metric_columns('m')} FROM fund_metric_themes t
+                JOIN fund_metrics m ON m.snapshot_id = t.snapshot_id AND m.code = t.code
+                WHERE t.snapshot_id = ? AND t.theme = ?
+                ORDER BY t.score DESC
+                LIMIT ?
+            """, (snapshot_id, value, limit))
+        else:
+            # 子串可能匹配同一基金的多个主题，用 IN 子查询去重
+            cursor.execute(f"""
+                SELECT {_metric_columns('m')} FROM fund_metrics m
+                WHERE m.snapshot_id = ? AND m.code IN (
+                    SELECT code FROM fund_metric_themes WHERE snapshot_id = ? AND theme LIKE ?
+                )
+                ORDER BY m.score DESC
+                LIMIT ?
+            """, (snapshot_id, snapshot_id, value, limit))
+        return wrap_rows(cursor)
+    
+    # ==================== 候选基金缓存 ====================
+    
+    def get_candidate_funds(self, mode: str, source_hash: str) -> Optional[List[Dict]]:
+        """获取持久化的候选基金列表，基金池哈希不一致时返回 None"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("""
+                SELECT candidates FROM candidate_funds
+                WHERE mode = ? AND source_hash = ?
+            """, (mode, source_hash))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            try:
+                return json.loads(row[0])
+            except Exception:
+                return None
+    
+    def save_candidate_funds(self, mode: str, source_hash: str, candidates: List[Dict]):
+        """保存候选基金列表及对应的基金池哈希"""
         with self.get_cursor() as cursor:
             cursor.execute("""
-                SELECT * FROM fund_metrics 
-                WHERE snapshot_id = ? AND themes LIKE ?
-                ORDER BY score DESC
-                LIMIT ?
-            """, (snapshot_id, f'%"{theme}"%', limit))
-            
-            results = []
-            for row in cursor.fetchall():
-                item = dict(row)
-                for field in ['labels', 'reasons', 'themes']:
-                    if item.get(field):
-                        try:
-                            item[field] = json.loads(item[field])
-                        except:
-                            item[field] = []
-                results.append(item)
-            return results
+                INSERT INTO candidate_funds (mode, source_hash, fund_count, candidates, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(mode) DO UPDATE SET
+                    source_hash = excluded.source_hash,
+                    fund_count = excluded.fund_count,
+                    candidates = excluded.candidates,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (mode, source_hash, len(candidates), json.dumps(candidates, ensure_ascii=False)))
+    
+    # ==================== 基准指数历史 ====================
+    
+    def get_index_history(self, symbol: str) -> List[tuple]:
+        """获取指数全部日线，按日期升序返回 [(trade_date, close)]"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("""
+                SELECT trade_date, close FROM index_history
+                WHERE symbol = ?
+                ORDER BY trade_date ASC
+            """, (symbol,))
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+    
+    def get_index_last_date(self, symbol: str) -> Optional[str]:
+        """获取指数已持久化的最新交易日"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("SELECT MAX(trade_date) FROM index_history WHERE symbol = ?", (symbol,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def append_index_history(self, symbol: str, rows: List[tuple]) -> int:
+        """批量追加指数日线 [(trade_date, close)]，已存在的日期忽略"""
+        if not rows:
+            return 0
+        with self.get_cursor() as cursor:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO index_history (symbol, trade_date, close)
+                VALUES (?, ?, ?)
+            """, [(symbol, d, c) for d, c in rows])
+            return cursor.rowcount
     
     # ==================== 快照操作 ====================
     
@@ -520,17 +849,29 @@ class Database:
             return cursor.lastrowid
     
     def complete_snapshot(self, snapshot_id: int, qualified_funds: int, status: str = 'success'):
-        """完成快照"""
+        """完成快照（成功时在同一事务内物化各排序字段的名次并写入指标历史，提交后使响应缓存失效）"""
         with self.get_cursor() as cursor:
+            if status == 'success':
+                self._materialize_rankings(cursor, snapshot_id)
+                self._record_metric_history(cursor, snapshot_id)
             cursor.execute("""
                 UPDATE snapshots 
                 SET qualified_funds = ?, status = ?, completed_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             """, (qualified_funds, status, snapshot_id))
+        if status == 'success':
+            self.response_cache.invalidate()
+    
+    def get_snapshot_version(self) -> Tuple[int, int]:
+        """快照版本：(最大成功快照 id, 成功快照数)，供跨进程的响应缓存校验（无快照时为 (0, 0)）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("SELECT MAX(id), COUNT(*) FROM snapshots WHERE status = 'success'")
+            latest_id, count = cursor.fetchone()
+            return latest_id or 0, count
     
     def get_latest_snapshot(self) -> Optional[Dict]:
         """获取最新成功的快照"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM snapshots 
                 WHERE status = 'success'
@@ -542,7 +883,7 @@ class Database:
 
     def get_successful_snapshots(self, limit: int = 10) -> List[Dict]:
         """获取最近成功的快照列表"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM snapshots 
                 WHERE status = 'success'
@@ -553,7 +894,7 @@ class Database:
     
     def get_running_snapshot(self) -> Optional[Dict]:
         """获取正在运行的快照"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM snapshots 
                 WHERE status = 'running'
@@ -628,10 +969,19 @@ class Database:
                 metrics.get('data_days'),
                 json.dumps(metrics, ensure_ascii=False)
             ))
+            
+            # 同步主题关联表
+            cursor.execute("DELETE FROM fund_metric_themes WHERE snapshot_id = ? AND code = ?", (snapshot_id, code))
+            themes = {t for t in (metrics.get('themes') or []) if t}
+            if themes:
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO fund_metric_themes (snapshot_id, theme, code, score)
+                    VALUES (?, ?, ?, ?)
+                """, [(snapshot_id, t, code, metrics.get('score')) for t in themes])
     
     def get_fund_metrics(self, snapshot_id: int, code: str) -> Optional[Dict]:
         """获取基金指标"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM fund_metrics 
                 WHERE snapshot_id = ? AND code = ?
@@ -649,83 +999,195 @@ class Database:
                 return result
         return None
     
+    def get_fund_metrics_batch(self, snapshot_id: int, codes: List[str]) -> Dict[str, Dict]:
+        """一次 IN 查询批量获取多只基金的指标，返回 {code: metrics}"""
+        codes = list(dict.fromkeys(codes))
+        if not codes:
+            return {}
+        placeholders = ','.join(['?'] * len(codes))
+        with self.get_read_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {_metric_columns()} FROM fund_metrics
+                WHERE snapshot_id = ? AND code IN ({placeholders})
+            """, (snapshot_id, *codes))
+            return {row['code']: row for row in wrap_rows(cursor)}
+    
     def get_recommendations(self, snapshot_id: int, theme: str = None, limit: int = 100) -> List[Dict]:
         """获取推荐列表"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             if theme and theme != 'all':
-                cursor.execute("""
-                    SELECT * FROM fund_metrics 
-                    WHERE snapshot_id = ? AND themes LIKE ?
-                    ORDER BY score DESC
-                    LIMIT ?
-                """, (snapshot_id, f'%"{theme}"%', limit))
+                return self._query_theme_funds(cursor, snapshot_id, theme, limit)
             else:
-                cursor.execute("""
-                    SELECT * FROM fund_metrics 
+                cursor.execute(f"""
+                    SELECT {_metric_columns()} FROM fund_metrics 
                     WHERE snapshot_id = ?
                     ORDER BY score DESC
                     LIMIT ?
                 """, (snapshot_id, limit))
             
-            results = []
-            for row in cursor.fetchall():
-                item = dict(row)
-                # 解析 JSON 字段
-                for field in ['labels', 'reasons', 'themes']:
-                    if item.get(field):
-                        try:
-                            item[field] = json.loads(item[field])
-                        except:
-                            item[field] = []
-                results.append(item)
-            return results
+            return wrap_rows(cursor)
+    
+    # 榜单排序字段及方向（回撤、波动率、Beta 越小越好）
+    RANKING_SORT_FIELDS = {
+        'score': 'DESC', 'return_1y': 'DESC', 'return_6m': 'DESC', 'return_3m': 'DESC',
+        'return_1m': 'DESC', 'return_1w': 'DESC', 'return_1d': 'DESC',
+        'sharpe': 'DESC', 'alpha': 'DESC',
+        'beta': 'ASC', 'volatility': 'ASC', 'max_drawdown': 'ASC'
+    }
+    
+    def _materialize_rankings(self, cursor, snapshot_id: int) -> int:
+        """为快照的每个排序字段写入名次（空值排在最后，同值按代码排序）"""
+        cursor.execute("DELETE FROM fund_metric_ranks WHERE snapshot_id = ?", (snapshot_id,))
+        total = 0
+        for field, order in self.RANKING_SORT_FIELDS.items():
+            cursor.execute(f"""
+                INSERT INTO fund_metric_ranks (snapshot_id, sort_key, position, code)
+                SELECT snapshot_id, ?, ROW_NUMBER() OVER (ORDER BY {field} IS NULL, {field} {order}, code), code
+                FROM fund_metrics WHERE snapshot_id = ?
+            """, (field, snapshot_id))
+            total += cursor.rowcount
+        return total
+    
+    def _backfill_rankings(self, cursor) -> bool:
+        """迁移：为已有的成功快照补齐名次"""
+        cursor.execute("SELECT id FROM snapshots WHERE status = 'success'")
+        for row in cursor.fetchall():
+            self._materialize_rankings(cursor, row[0])
+        return False
+    
+    # ==================== 跨快照指标历史 ====================
     
-    def get_ranking(self, snapshot_id: int, sort_by: str = 'score', limit: int = 20, theme: str = None) -> List[Dict]:
-        """多维榜单查询"""
-        valid_sort_fields = {
-            'score', 'return_1y', 'return_6m', 'return_3m', 'return_1m', 'return_1w', 'return_1d',
-            'sharpe', 'alpha', 'beta', 'volatility', 'max_drawdown'
+    def _record_metric_history(self, cursor, snapshot_id: int):
+        """将快照指标写入历史表（同一日期的旧快照记录被替换），名次取自物化的评分名次"""
+        cursor.execute("SELECT snapshot_date FROM snapshots WHERE id = ?", (snapshot_id,))
+        row = cursor.fetchone()
+        if not row:
+            return
+        cursor.execute(
+            "DELETE FROM fund_metric_history WHERE snapshot_date = ? AND snapshot_id != ?",
+            (row[0], snapshot_id)
+        )
+        cursor.execute("""
+            INSERT OR REPLACE INTO fund_metric_history (
+                code, snapshot_date, snapshot_id, name, score, rank, latest_nav,
+                sharpe, alpha, max_drawdown, volatility, return_1y, labels
+            )
+            SELECT m.code, ?, m.snapshot_id, m.name, m.score, r.position, m.latest_nav,
+                   m.sharpe, m.alpha, m.max_drawdown, m.volatility, m.return_1y, m.labels
+            FROM fund_metrics m
+            LEFT JOIN fund_metric_ranks r
+                ON r.snapshot_id = m.snapshot_id AND r.sort_key = 'score' AND r.code = m.code
+            WHERE m.snapshot_id = ?
+        """, (row[0], snapshot_id))
+    
+    def _backfill_metric_history(self, cursor) -> bool:
+        """迁移：按完成时间顺序为已有的成功快照写入指标历史"""
+        cursor.execute("SELECT id FROM snapshots WHERE status = 'success' ORDER BY completed_at")
+        for row in cursor.fetchall():
+            self._record_metric_history(cursor, row[0])
+        return False
+    
+    def get_metric_trajectory(self, code: str, limit: int = 30) -> List[Dict]:
+        """获取单只基金最近 N 个快照日期的评分/名次/关键指标（按日期升序）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("""
+                SELECT snapshot_date, snapshot_id, score, rank, latest_nav,
+                       sharpe, alpha, max_drawdown, volatility, return_1y
+                FROM fund_metric_history
+                WHERE code = ?
+                ORDER BY snapshot_date DESC
+                LIMIT ?
+            """, (code, limit))
+            return [dict(row) for row in reversed(cursor.fetchall())]
+    
+    def get_metric_history_top(self, dates: int = 15, max_rank: int = 100) -> List[Dict]:
+        """获取最近 N 个快照日期中评分名次前 max_rank 的基金（按日期倒序、名次升序）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("""
+                SELECT code, snapshot_date, snapshot_id, name, score, rank, latest_nav, labels
+                FROM fund_metric_history
+                WHERE snapshot_date IN (
+                    SELECT DISTINCT snapshot_date FROM fund_metric_history
+                    ORDER BY snapshot_date DESC LIMIT ?
+                ) AND rank <= ?
+                ORDER BY snapshot_date DESC, rank
+            """, (dates, max_rank))
+            return wrap_rows(cursor, json_fields=('labels',))
+    
+    def get_rank_changes(self, from_date: str, to_date: str, limit: int = None) -> Dict[str, Any]:
+        """
+        全市场两个日期之间的评分名次变化
+        日期取不晚于给定值的最近快照日期；新进入的基金 from_rank 为空
+        
+        Returns:
+            {'from_date', 'to_date', 'changes': [...]}，按名次上升幅度降序
+        """
+        with self.get_read_cursor() as cursor:
+            cursor.execute(f"""
+                WITH d AS (
+                    SELECT
+                        (SELECT MAX(snapshot_date) FROM fund_metric_history WHERE snapshot_date <= ?) AS from_date,
+                        (SELECT MAX(snapshot_date) FROM fund_metric_history WHERE snapshot_date <= ?) AS to_date
+                )
+                SELECT d.from_date, d.to_date, b.code, b.name,
+                       a.rank AS from_rank, b.rank AS to_rank, a.rank - b.rank AS rank_change,
+                       a.score AS from_score, b.score AS to_score
+                FROM d
+                JOIN fund_metric_history b ON b.snapshot_date = d.to_date
+                LEFT JOIN fund_metric_history a ON a.code = b.code AND a.snapshot_date = d.from_date
+                ORDER BY rank_change IS NULL, rank_change DESC, b.rank
+                {'LIMIT ?' if limit else ''}
+            """, (from_date, to_date, limit) if limit else (from_date, to_date))
+            rows = cursor.fetchall()
+        
+        if not rows:
+            return {'from_date': None, 'to_date': None, 'changes': []}
+        return {
+            'from_date': rows[0]['from_date'],
+            'to_date': rows[0]['to_date'],
+            'changes': [{k: row[k] for k in row.keys() if k not in ('from_date', 'to_date')} for row in rows]
         }
+    
+    def get_ranking(self, snapshot_id: int, sort_by: str = 'score', limit: int = 20,
+                    theme: str = None, after: int = 0) -> List[Dict]:
+        """
+        多维榜单查询（按物化名次区间读取）
         
-        if sort_by not in valid_sort_fields:
+        Args:
+            after: 游标，返回名次大于该值的记录；每条结果带 rank_position 供下一页使用
+        """
+        if sort_by not in self.RANKING_SORT_FIELDS:
             sort_by = 'score'
-            
-        # 某些指标是越小越好（如回撤、波动率）
-        order = "ASC" if sort_by in ['max_drawdown', 'volatility', 'beta'] else "DESC"
         
-        with self.get_cursor() as cursor:
-            query = f"SELECT * FROM fund_metrics WHERE snapshot_id = ?"
-            params = [snapshot_id]
+        with self.get_read_cursor() as cursor:
+            query = f"""
+                SELECT {_metric_columns('m')}, r.position AS rank_position
+                FROM fund_metric_ranks r
+                JOIN fund_metrics m ON m.snapshot_id = r.snapshot_id AND m.code = r.code
+                WHERE r.snapshot_id = ? AND r.sort_key = ? AND r.position > ?
+            """
+            params = [snapshot_id, sort_by, after or 0]
             
             if theme and theme != 'all':
-                query += " AND themes LIKE ?"
-                params.append(f'%{theme}%')
+                op, value = self._theme_condition(cursor, snapshot_id, theme)
+                query += f" AND r.code IN (SELECT code FROM fund_metric_themes WHERE snapshot_id = ? AND theme {op} ?)"
+                params.extend([snapshot_id, value])
                 
-            query += f" ORDER BY {sort_by} {order} LIMIT ?"
+            query += " ORDER BY r.position LIMIT ?"
             params.append(limit)
             
             cursor.execute(query, params)
             
-            results = []
-            for row in cursor.fetchall():
-                item = dict(row)
-                for field in ['labels', 'reasons', 'themes']:
-                    if item.get(field):
-                        try:
-                            item[field] = json.loads(item[field])
-                        except:
-                            item[field] = []
-                results.append(item)
-            return results
+            return wrap_rows(cursor)
     
     def get_qualified_funds(self, snapshot_id: int) -> List[Dict]:
         """获取快照中所有入选基金 (含基本信息)"""
         try:
-            with self.get_cursor() as cursor:
+            with self.get_read_cursor() as cursor:
                 # 显式选择字段避免 m.themes 和 f.themes 冲突
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT 
-                        m.*, 
+                        {_metric_columns('m')}, 
                         f.fund_type, 
                         f.themes as themes_json,
                         f.name as fund_name
@@ -733,24 +1195,8 @@ class Database:
                     JOIN funds f ON m.code = f.code
                     WHERE m.snapshot_id = ?
                 """, (snapshot_id,))
-                columns = [column[0] for column in cursor.description]
-                results = []
-                for row in cursor.fetchall():
-                    item = dict(zip(columns, row))
-                    # 解析指标中的 themes (JSON)
-                    if item.get('themes'):
-                        try:
-                            item['themes'] = json.loads(item['themes'])
-                        except:
-                            item['themes'] = []
-                    # 同时也提供 themes_json 兼容 snapshot.py:790
-                    if item.get('themes_json'):
-                        try:
-                            item['themes_json'] = item['themes_json'] # 保持原样或解析
-                        except:
-                            pass
-                    results.append(item)
-                return results
+                # 仅解析指标中的 themes；themes_json 保持原样供 snapshot.py 兼容使用
+                return wrap_rows(cursor, json_fields=('themes',))
         except Exception as e:
             logger.error(f"Failed to get qualified funds: {e}")
             return []
@@ -765,21 +1211,14 @@ class Database:
             return []
         try:
             placeholders = ','.join(['?'] * len(codes))
-            with self.get_cursor() as cursor:
+            with self.get_read_cursor() as cursor:
                 cursor.execute(f"""
-                    SELECT f.code, f.name, f.fund_type, f.themes, m.*
+                    SELECT f.fund_type, {_metric_columns('m')}
                     FROM fund_metrics m
                     JOIN funds f ON m.code = f.code
                     WHERE m.snapshot_id = ? AND f.code IN ({placeholders})
                 """, (snapshot_id, *codes))
-                columns = [column[0] for column in cursor.description]
-                results = []
-                for row in cursor.fetchall():
-                    item = dict(zip(columns, row))
-                    if item.get('themes'):
-                        item['themes'] = json.loads(item['themes'])
-                    results.append(item)
-                return results
+                return wrap_rows(cursor, json_fields=('themes',))
         except Exception as e:
             logger.error(f"Failed to get funds by codes: {e}")
             return []
@@ -787,17 +1226,37 @@ class Database:
     # ==================== AI 缓存操作 ====================
     
     def get_ai_cache(self, cache_key: str) -> Optional[str]:
-        """获取 AI 缓存"""
-        with self.get_cursor() as cursor:
+        """获取 AI 缓存（先查进程内 L1，未命中再查表；“无缓存”结果也会短暂记忆）"""
+        hit = self._ai_l1.get(cache_key)
+        if hit is not None:
+            return None if hit is _CACHE_MISS else hit
+        
+        now = datetime.now()
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
-                SELECT content FROM ai_cache 
-                WHERE cache_key = ? AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
-            """, (cache_key,))
+                SELECT content, expires_at FROM ai_cache 
+                WHERE cache_key = ? AND (expires_at IS NULL OR expires_at > ?)
+            """, (cache_key, now.isoformat()))
             row = cursor.fetchone()
-            return row[0] if row else None
+        
+        if not row:
+            self._ai_l1.set(cache_key, _CACHE_MISS, expire=self._ai_negative_ttl)
+            return None
+        
+        # L1 有效期不超过条目剩余有效期
+        ttl = self._ai_l1.default_expire
+        if row['expires_at']:
+            try:
+                remaining = (datetime.fromisoformat(row['expires_at']) - now).total_seconds()
+                ttl = max(1, min(ttl, int(remaining)))
+            except ValueError:
+                pass
+        if row['content'] is not None:
+            self._ai_l1.set(cache_key, row['content'], expire=ttl)
+        return row['content']
     
     def set_ai_cache(self, cache_key: str, content: str, model: str = None, ttl_hours: int = 24):
-        """设置 AI 缓存"""
+        """设置 AI 缓存（同时写入 L1）"""
         expires_at = (datetime.now() + timedelta(hours=ttl_hours)).isoformat()
         
         with self.get_cursor() as cursor:
@@ -810,15 +1269,44 @@ class Database:
                     expires_at = excluded.expires_at,
                     created_at = CURRENT_TIMESTAMP
             """, (cache_key, content, model, expires_at))
+        
+        if content is None:
+            self._ai_l1.delete(cache_key)
+        else:
+            self._ai_l1.set(cache_key, content, expire=min(self._ai_l1.default_expire, int(ttl_hours * 3600)))
     
-    def clear_expired_cache(self) -> int:
-        """清理过期缓存，返回清理数量"""
+    def clear_expired_cache(self, max_rows: int = None) -> int:
+        """
+        清理过期缓存，并在超过行数上限时淘汰最旧条目，返回清理数量
+        
+        Args:
+            max_rows: 行数上限，默认取配置 AI_CACHE_MAX_ROWS
+        """
+        max_rows = self._ai_max_rows if max_rows is None else max_rows
         with self.get_cursor() as cursor:
             cursor.execute("""
                 DELETE FROM ai_cache 
-                WHERE expires_at IS NOT NULL AND expires_at < CURRENT_TIMESTAMP
-            """)
-            return cursor.rowcount
+                WHERE expires_at IS NOT NULL AND expires_at < ?
+            """, (datetime.now().isoformat(),))
+            removed = cursor.rowcount
+            if max_rows:
+                cursor.execute("""
+                    DELETE FROM ai_cache WHERE id IN (
+                        SELECT id FROM ai_cache
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                """, (max_rows,))
+                removed += cursor.rowcount
+            return removed
+    
+    def clear_ai_cache(self) -> int:
+        """清空全部 AI 缓存（含进程内 L1），返回清理数量"""
+        with self.get_cursor() as cursor:
+            cursor.execute("DELETE FROM ai_cache")
+            removed = cursor.rowcount
+        self._ai_l1.clear()
+        return removed
     
     # ==================== 日志操作 ====================
     
@@ -848,9 +1336,90 @@ class Database:
                 WHERE id = ?
             """, (status, funds_processed, funds_qualified, message, log_id))
     
+    # ==================== 后台任务 ====================
+    
+    def create_job(self, job_id: str, kind: str, pool: str, priority: int, params: str = None,
+                   owner_pid: int = None):
+        """登记排队中的后台任务（owner_pid 为执行该任务的进程）"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO jobs (id, kind, pool, priority, status, params, owner_pid)
+                VALUES (?, ?, ?, ?, 'queued', ?, ?)
+            """, (job_id, kind, pool, priority, params, owner_pid))
+    
+    def start_job(self, job_id: str):
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (job_id,))
+    
+    def finish_job(self, job_id: str, status: str, result: str = None, error: str = None):
+        """任务结束（status: success / failed），result 为 JSON 文本"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (status, result, error, job_id))
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """获取任务状态（result / params 已解析）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            job = dict(row)
+            for key in ('params', 'result'):
+                if job[key]:
+                    job[key] = json.loads(job[key])
+            return job
+    
+    def get_jobs(self, status: str = None, limit: int = 20) -> List[Dict]:
+        """最近的任务列表（不含结果）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT id, kind, pool, priority, status, error, created_at, started_at, finished_at
+                FROM jobs {'WHERE status = ?' if status else ''}
+                ORDER BY created_at DESC LIMIT ?
+            """, (status, limit) if status else (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_unfinished_job_owners(self) -> List[Optional[int]]:
+        """未完成任务的归属进程（旧数据可能为 None）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("SELECT DISTINCT owner_pid FROM jobs WHERE status IN ('queued', 'running')")
+            return [row[0] for row in cursor.fetchall()]
+    
+    def fail_interrupted_jobs(self, dead_owners: List[Optional[int]], retention_days: int = 7) -> int:
+        """
+        归属进程已退出的未完成任务标记为失败，并清理过期的已完成任务
+        
+        多进程部署时每个进程启动都会调用，只处理 dead_owners 中的进程，不影响其他存活进程的任务
+        """
+        with self.get_cursor() as cursor:
+            interrupted = 0
+            pids = [pid for pid in dead_owners if pid is not None]
+            conditions = []
+            if pids:
+                conditions.append(f"owner_pid IN ({','.join(['?'] * len(pids))})")
+            if None in dead_owners:
+                conditions.append("owner_pid IS NULL")
+            if conditions:
+                cursor.execute(f"""
+                    UPDATE jobs SET status = 'failed', error = '服务重启，任务中断', finished_at = CURRENT_TIMESTAMP
+                    WHERE status IN ('queued', 'running') AND ({' OR '.join(conditions)})
+                """, pids)
+                interrupted = cursor.rowcount
+            cursor.execute("""
+                DELETE FROM jobs
+                WHERE finished_at IS NOT NULL AND finished_at < datetime('now', ?)
+            """, (f'-{int(retention_days)} days',))
+            return interrupted
+    
     def get_recent_logs(self, limit: int = 20) -> List[Dict]:
         """获取最近的更新日志"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM update_logs 
                 ORDER BY started_at DESC 
@@ -887,7 +1456,7 @@ class Database:
     
     def get_watchlist(self, user_id: str = 'default') -> List[Dict]:
         """获取用户的自选列表"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT fund_code, fund_name, notes, added_at 
                 FROM watchlist 
@@ -898,7 +1467,7 @@ class Database:
     
     def is_in_watchlist(self, fund_code: str, user_id: str = 'default') -> bool:
         """检查基金是否在自选中"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT 1 FROM watchlist WHERE fund_code = ? AND user_id = ?
             """, (fund_code, user_id))
@@ -906,46 +1475,190 @@ class Database:
     
     # ==================== 净值历史缓存 ====================
     
+    @staticmethod
+    def _nav_rows_to_columns(nav_data: List[Dict]):
+        """[{'date','nav','acc_nav'}] -> 按日期升序去重的 (dates, navs, acc_navs)，同日期以后者为准"""
+        dates, navs, accs = [], [], []
+        for item in nav_data:
+            date = item.get('date')
+            if not date:
+                continue
+            dates.append(str(date)[:10])
+            navs.append(item.get('nav'))
+            accs.append(item.get('acc_nav'))
+        if not dates:
+            return None
+        try:
+            date_arr = np.array(dates, dtype='datetime64[D]')
+        except ValueError:
+            return None
+        nav_arr = np.array([np.nan if v is None else v for v in navs], dtype=np.float64)
+        acc_arr = np.array([np.nan if v is None else v for v in accs], dtype=np.float64)
+        # 逆序取 unique 得到每个日期最后一次出现的位置
+        _, last = np.unique(date_arr[::-1], return_index=True)
+        idx = len(date_arr) - 1 - last
+        return date_arr[idx], nav_arr[idx], acc_arr[idx]
+    
+    def _write_nav_store(self, cursor, fund_code: str, dates, navs, acc_navs):
+        """写入（覆盖）一只基金的列式净值块"""
+        valid_navs = navs[~np.isnan(navs)]
+        cursor.execute("""
+            INSERT INTO nav_store (fund_code, start_date, end_date, points, latest_nav, data, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(fund_code) DO UPDATE SET
+                start_date = excluded.start_date,
+                end_date = excluded.end_date,
+                points = excluded.points,
+                latest_nav = excluded.latest_nav,
+                data = excluded.data,
+                updated_at = CURRENT_TIMESTAMP
+        """, (
+            fund_code,
+            str(dates[0]) if len(dates) else None,
+            str(dates[-1]) if len(dates) else None,
+            len(dates),
+            float(valid_navs[-1]) if len(valid_navs) else None,
+            sqlite3.Binary(encode_nav_columns(dates, navs, acc_navs))
+        ))
+    
     def save_nav_history(self, fund_code: str, nav_data: List[Dict]) -> int:
-        """批量保存净值历史，返回保存数量"""
-        if not nav_data:
+        """
+        批量合并净值历史，返回新增数量
+        写入早于已缓存最早日期或晚于最新日期的数据（首次只缓存了部分历史的基金，之后拿到更长的
+        历史时会向前补齐），与已有列式块合并排序后在一个事务内一次写入；已缓存区间内的日期保持不变
+        """
+        columns = self._nav_rows_to_columns(nav_data or [])
+        if columns is None:
             return 0
+        dates, navs, accs = columns
         
-        saved = 0
         with self.get_cursor() as cursor:
-            for item in nav_data:
-                try:
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO nav_history (fund_code, nav_date, nav, acc_nav)
-                        VALUES (?, ?, ?, ?)
-                    """, (fund_code, item.get('date'), item.get('nav'), item.get('acc_nav')))
-                    saved += 1
-                except Exception:
-                    pass
-        return saved
+            cursor.execute("SELECT start_date, end_date FROM nav_store WHERE fund_code = ?", (fund_code,))
+            row = cursor.fetchone()
+            cached = bool(row and row['end_date'])
+            if cached:
+                outside = (dates > np.datetime64(row['end_date'], 'D')) | \
+                          (dates < np.datetime64(row['start_date'], 'D'))
+                if not outside.any():
+                    return 0
+                dates, navs, accs = dates[outside], navs[outside], accs[outside]
+            added = len(dates)
+            
+            if cached:
+                cursor.execute("SELECT data FROM nav_store WHERE fund_code = ?", (fund_code,))
+                old_dates, old_navs, old_accs = decode_nav_columns(cursor.fetchone()[0])
+                dates = np.concatenate([old_dates, dates])
+                navs = np.concatenate([old_navs, navs])
+                accs = np.concatenate([old_accs, accs])
+                order = np.argsort(dates, kind='stable')
+                dates, navs, accs = dates[order], navs[order], accs[order]
+            self._write_nav_store(cursor, fund_code, dates, navs, accs)
+        return added
+    
+    def enqueue_nav_history(self, fund_code: str, nav_data: List[Dict]):
+        """将净值写入交给后台写线程执行，立即返回 Future"""
+        def _done(future):
+            if future.exception():
+                logger.warning(f"后台保存净值失败 ({fund_code}): {future.exception()}")
+        
+        future = self._bg_writer.submit(self.save_nav_history, fund_code, nav_data)
+        future.add_done_callback(_done)
+        return future
+    
+    def get_nav_arrays(self, fund_code: str):
+        """
+        获取基金全部净值的列式数组（一次查询 + 一次解压）
+        
+        Returns:
+            (dates datetime64[D], navs, acc_navs)，按日期升序；无数据返回 None
+        """
+        with self.get_read_cursor() as cursor:
+            cursor.execute("SELECT data FROM nav_store WHERE fund_code = ?", (fund_code,))
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return decode_nav_columns(row[0])
+    
+    def get_nav_arrays_batch(self, fund_codes: List[str]) -> Dict[str, tuple]:
+        """一次 IN 查询批量获取多只基金的净值列式数组，返回 {code: (dates, navs, acc_navs)}"""
+        codes = list(dict.fromkeys(fund_codes))
+        if not codes:
+            return {}
+        placeholders = ','.join(['?'] * len(codes))
+        with self.get_read_cursor() as cursor:
+            cursor.execute(
+                f"SELECT fund_code, data FROM nav_store WHERE fund_code IN ({placeholders})", codes
+            )
+            rows = cursor.fetchall()
+        return {code: decode_nav_columns(blob) for code, blob in rows}
     
     def get_nav_history(self, fund_code: str, days: int = 60, limit: int = None) -> List[Dict]:
-        """获取净值历史"""
+        """获取净值历史（按日期倒序）"""
         actual_limit = limit if limit is not None else days
-        with self.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT nav_date, nav, acc_nav
-                FROM nav_history
-                WHERE fund_code = ?
-                ORDER BY nav_date DESC
-                LIMIT ?
-            """, (fund_code, actual_limit))
-            rows = cursor.fetchall()
-            return [{'date': r['nav_date'], 'nav': r['nav'], 'acc_nav': r['acc_nav']} for r in rows]
+        arrays = self.get_nav_arrays(fund_code)
+        if arrays is None or actual_limit <= 0:
+            return []
+        dates, navs, accs = (a[::-1][:actual_limit] for a in arrays)
+        return [
+            {
+                'date': str(d),
+                'nav': None if np.isnan(n) else float(n),
+                'acc_nav': None if np.isnan(a) else float(a)
+            }
+            for d, n, a in zip(dates, navs, accs)
+        ]
+    
+    def get_nav_range(self, fund_code: str, start=None, end=None, as_numpy: bool = False):
+        """
+        按日期区间获取净值（含边界，按日期升序）
+        按主键定位该基金的列式块，解压后二分查找切片，任意区间都不会多取或截断
+        
+        Args:
+            start / end: 'YYYY-MM-DD' / 'YYYYMMDD' / datetime，缺省为不限
+            as_numpy: True 时返回 (dates, navs, acc_navs) 数组，无数据返回 None
+        """
+        arrays = self.get_nav_arrays(fund_code)
+        if arrays is None:
+            return None if as_numpy else []
+        dates = arrays[0]
+        lo, hi = 0, len(dates)
+        if start is not None:
+            lo = int(np.searchsorted(dates, as_day(start), side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(dates, as_day(end), side='right'))
+        dates, navs, accs = (a[lo:hi] for a in arrays)
+        if as_numpy:
+            return dates, navs, accs
+        return [
+            {
+                'date': str(d),
+                'nav': None if np.isnan(n) else float(n),
+                'acc_nav': None if np.isnan(a) else float(a)
+            }
+            for d, n, a in zip(dates, navs, accs)
+        ]
+    
+    def get_nav_tails(self, fund_codes: List[str], n: int = 2) -> Dict[str, List[Dict]]:
+        """一次查询批量获取多只基金最近 n 条净值（每只按日期倒序，格式同 get_nav_history）"""
+        result = {}
+        for code, arrays in self.get_nav_arrays_batch(fund_codes).items():
+            dates, navs, accs = (a[::-1][:n] for a in arrays)
+            result[code] = [
+                {
+                    'date': str(d),
+                    'nav': None if np.isnan(v) else float(v),
+                    'acc_nav': None if np.isnan(a) else float(a)
+                }
+                for d, v, a in zip(dates, navs, accs)
+            ]
+        return result
     
     def get_nav_cache_date(self, fund_code: str) -> Optional[str]:
         """获取净值缓存的最新日期"""
-        with self.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT MAX(nav_date) as latest FROM nav_history WHERE fund_code = ?
-            """, (fund_code,))
+        with self.get_read_cursor() as cursor:
+            cursor.execute("SELECT end_date FROM nav_store WHERE fund_code = ?", (fund_code,))
             row = cursor.fetchone()
-            return row['latest'] if row else None
+            return row['end_date'] if row else None
     
     # ==================== 持仓模拟操作 ====================
     
@@ -966,7 +1679,7 @@ class Database:
     
     def get_portfolio(self, user_id: str = 'default', status: str = 'holding') -> List[Dict]:
         """获取持仓列表"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM portfolio 
                 WHERE user_id = ? AND status = ?
@@ -990,7 +1703,7 @@ class Database:
     
     def get_portfolio_summary(self, user_id: str = 'default') -> Dict:
         """获取持仓汇总"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT 
                     COUNT(*) as total_positions,
@@ -1029,28 +1742,20 @@ class Database:
     
     def get_recommendation_history(self, days: int = 30, category: str = None) -> List[Dict]:
         """获取历史推荐记录"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             if category:
                 cursor.execute("""
-                    SELECT rh.*, nh.nav as current_nav
+                    SELECT rh.*, ns.latest_nav as current_nav
                     FROM recommendation_history rh
-                    LEFT JOIN (
-                        SELECT fund_code, nav, nav_date,
-                               ROW_NUMBER() OVER (PARTITION BY fund_code ORDER BY nav_date DESC) as rn
-                        FROM nav_history
-                    ) nh ON rh.fund_code = nh.fund_code AND nh.rn = 1
+                    LEFT JOIN nav_store ns ON rh.fund_code = ns.fund_code
                     WHERE rh.category = ? AND rh.recommend_date >= date('now', ?)
                     ORDER BY rh.recommend_date DESC, rh.score DESC
                 """, (category, f'-{days} days'))
             else:
                 cursor.execute("""
-                    SELECT rh.*, nh.nav as current_nav
+                    SELECT rh.*, ns.latest_nav as current_nav
                     FROM recommendation_history rh
-                    LEFT JOIN (
-                        SELECT fund_code, nav, nav_date,
-                               ROW_NUMBER() OVER (PARTITION BY fund_code ORDER BY nav_date DESC) as rn
-                        FROM nav_history
-                    ) nh ON rh.fund_code = nh.fund_code AND nh.rn = 1
+                    LEFT JOIN nav_store ns ON rh.fund_code = ns.fund_code
                     WHERE rh.recommend_date >= date('now', ?)
                     ORDER BY rh.recommend_date DESC, rh.score DESC
                 """, (f'-{days} days',))
@@ -1070,7 +1775,7 @@ class Database:
     
     def get_all_snapshots(self, limit: int = 30) -> List[Dict]:
         """获取所有快照列表"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM snapshots 
                 WHERE status = 'success'
@@ -1089,25 +1794,15 @@ class Database:
             '1y': 'return_1y'
         }.get(period, 'return_1w')
         
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute(f"""
-                SELECT * FROM fund_metrics 
+                SELECT {_metric_columns()} FROM fund_metrics 
                 WHERE snapshot_id = ? AND {period_field} IS NOT NULL
                 ORDER BY {period_field} DESC
                 LIMIT ?
             """, (snapshot_id, limit))
             
-            results = []
-            for row in cursor.fetchall():
-                item = dict(row)
-                for field in ['labels', 'reasons', 'themes']:
-                    if item.get(field):
-                        try:
-                            item[field] = json.loads(item[field])
-                        except:
-                            item[field] = []
-                results.append(item)
-            return results
+            return wrap_rows(cursor)
 
     # ==================== Phase 7: 新增业务模块 ====================
     
@@ -1117,24 +1812,33 @@ class Database:
         with self.get_cursor() as cursor:
             # 先清除当天旧数据
             cursor.execute("DELETE FROM daily_actions WHERE action_date = ?", (action_date,))
-            for a in actions:
-                cursor.execute("""
-                    INSERT INTO daily_actions (action_date, fund_code, fund_name, action_type, reason, amount)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (action_date, a['code'], a['name'], a['action'], a['reason'], a.get('amount')))
+            cursor.executemany("""
+                INSERT INTO daily_actions (action_date, fund_code, fund_name, action_type, reason, amount)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(action_date, a['code'], a['name'], a['action'], a['reason'], a.get('amount')) for a in actions])
                 
     def get_daily_actions(self, action_date: str) -> List[Dict]:
         """获取当日操作建议"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM daily_actions WHERE action_date = ?
             """, (action_date,))
             return [dict(row) for row in cursor.fetchall()]
 
+    def get_daily_actions_range(self, start_date: str, end_date: str) -> List[Dict]:
+        """按日期区间获取操作建议（走 action_date 唯一索引的一次范围查询）"""
+        with self.get_read_cursor() as cursor:
+            cursor.execute("""
+                SELECT * FROM daily_actions
+                WHERE action_date BETWEEN ? AND ?
+                ORDER BY action_date DESC
+            """, (start_date, end_date))
+            return [dict(row) for row in cursor.fetchall()]
+
     # 2. 用户偏好 (User Profile)
     def get_user_profile(self, user_id: str = 'default') -> Dict:
         """获取用户偏好，若不存在则返回默认值"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("SELECT * FROM user_profile WHERE user_id = ?", (user_id,))
             row = cursor.fetchone()
             if row: return dict(row)
@@ -1162,7 +1866,7 @@ class Database:
              """, (type, title, content, fund_code))
              
     def get_unread_notifications(self) -> List[Dict]:
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("SELECT * FROM notifications WHERE is_read = 0 ORDER BY created_at DESC")
             return [dict(row) for row in cursor.fetchall()]
             
@@ -1172,7 +1876,7 @@ class Database:
             
     # 4. 持仓获取模块 (用于一键汇总和盈亏计算)
     def get_holding_portfolio(self, user_id: str = 'default') -> List[Dict]:
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT p.*, f.name 
                 FROM portfolio p
@@ -1203,7 +1907,7 @@ class Database:
         query = "SELECT * FROM dca_plans WHERE user_id = ?"
         if only_active:
             query += " AND is_active = 1"
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute(query, (user_id,))
             return [dict(row) for row in cursor.fetchall()]
 
@@ -1231,7 +1935,7 @@ class Database:
 
     def get_dca_records(self, plan_id: int = None, limit: int = 50) -> List[Dict]:
         """获取定投执行历史"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             if plan_id:
                 cursor.execute("SELECT * FROM dca_records WHERE plan_id = ? ORDER BY execute_date DESC LIMIT ?", (plan_id, limit))
             else:
@@ -1252,7 +1956,7 @@ class Database:
     
     def get_unread_ai_messages(self) -> List[Dict]:
         """获取未读 AI 主动消息"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("SELECT * FROM ai_chat_messages WHERE is_read = 0 ORDER BY created_at DESC LIMIT 20")
             results = []
             for row in cursor.fetchall():
@@ -1282,7 +1986,7 @@ class Database:
     
     def get_behavior_tags(self, user_id: str = 'default', days: int = 90) -> List[Dict]:
         """获取用户行为标签"""
-        with self.get_cursor() as cursor:
+        with self.get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT tag, COUNT(*) as count, event_type
                 FROM behavior_tags 
@@ -1303,3 +2007,45 @@ def get_db() -> Database:
     if _db_instance is None:
         _db_instance = Database()
     return _db_instance
+
+
+class AsyncDatabase:
+    """
+    异步数据库门面
+    在专用线程池中执行 Database 的同步方法并返回 awaitable，避免在事件循环上阻塞：
+        adb = get_async_db()
+        rows = await adb.get_ranking(snapshot_id, limit=50)
+    """
+    
+    def __init__(self, db: Database, max_workers: int):
+        self.sync = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+    
+    async def run(self, func, *args, **kwargs):
+        """在数据库线程池中执行任意同步调用（适合把多次查询合并为一次调度）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+        
+        async def _call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        
+        _call.__name__ = name
+        _call.__doc__ = attr.__doc__
+        return _call
+
+
+_async_db_instance: Optional[AsyncDatabase] = None
+
+def get_async_db() -> AsyncDatabase:
+    """获取异步数据库门面（线程数与只读连接池一致）"""
+    global _async_db_instance
+    if _async_db_instance is None:
+        _async_db_instance = AsyncDatabase(get_db(), max_workers=max(1, get_settings().DB_READ_POOL_SIZE))
+    return _async_db_instance
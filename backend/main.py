@@ -15,7 +15,7 @@ from logging.handlers import RotatingFileHandler
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
 
 import sys
 # 确保项目根目录在 sys.path 中，以支持绝对导入和直接运行
@@ -31,10 +31,14 @@ try:
     from backend.config import get_settings, ensure_data_dir
     from backend.database import get_db
     from backend.scheduler import init_scheduler
+    from backend.utils.metrics import REGISTRY, MetricsMiddleware
+    from backend.utils.sampling_profiler import ProfilerMiddleware
 except ImportError:
     from config import get_settings, ensure_data_dir
     from database import get_db
     from scheduler import init_scheduler
+    from utils.metrics import REGISTRY, MetricsMiddleware
+    from utils.sampling_profiler import ProfilerMiddleware
 
 # 配置日志
 logging.basicConfig(
@@ -211,6 +215,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 采样剖析的按路由模式（未开启剖析时直接放行）
+app.add_middleware(ProfilerMiddleware)
+
+# 请求指标（最外层，计入完整处理耗时）
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 try:
     from backend.api import query, admin
@@ -240,6 +251,14 @@ logger.info(f"📁 已挂载存储目录: {storage_dir}")
 
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse('metrics disabled\n', status_code=404)
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.get("/app", response_class=HTMLResponse)
 async def serve_frontend():
     """提供前端页面"""
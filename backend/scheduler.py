@@ -64,6 +64,27 @@ async def daily_risk_check_job():
         logger.error(f"Risk check job failed: {e}")
 
 
+def benchmark_refresh_job():
+    """每日基准指数增量刷新任务 (收盘后追加当日行情)"""
+    try:
+        from .services.data_fetcher import get_data_fetcher
+        added = get_data_fetcher().refresh_benchmark_history()
+        logger.info(f"Benchmark refresh completed: {added}")
+    except Exception as e:
+        logger.error(f"Benchmark refresh job failed: {e}")
+
+
+def ai_cache_sweep_job():
+    """AI 缓存定期清理任务 (删除过期条目并执行行数上限)"""
+    try:
+        from .database import get_db
+        removed = get_db().clear_expired_cache()
+        if removed > 0:
+            logger.info(f"AI cache sweep completed: {removed} entries removed.")
+    except Exception as e:
+        logger.error(f"AI cache sweep job failed: {e}")
+
+
 def init_scheduler():
     """初始化调度器"""
     # 使用间隔触发器 (每小时检查一次)
@@ -95,8 +116,26 @@ def init_scheduler():
         replace_existing=True
     )
     
+    # 添加每日基准指数增量刷新 (每天 15:45)
+    scheduler.add_job(
+        benchmark_refresh_job,
+        CronTrigger(hour=15, minute=45),
+        id="benchmark_refresh_job",
+        name="每日基准指数刷新",
+        replace_existing=True
+    )
+    
+    # 添加 AI 缓存定期清理 (每6小时)
+    scheduler.add_job(
+        ai_cache_sweep_job,
+        IntervalTrigger(hours=6),
+        id="ai_cache_sweep_job",
+        name="AI缓存清理",
+        replace_existing=True
+    )
+    
     scheduler.start()
-    logger.info("调度器已启动: 每60分钟检测一次自动同步条件，15:35 执行定投核查，15:40 执行风险核查")
+    logger.info("调度器已启动: 每60分钟检测一次自动同步条件，15:35 执行定投核查，15:40 执行风险核查，15:45 刷新基准指数，每6小时清理AI缓存")
 
 
 async def nightly_sync_check():
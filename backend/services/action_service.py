@@ -1,4 +1,5 @@
 # backend/services/action_service.py
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
@@ -31,7 +32,11 @@ class ActionService:
         """
         获取每日操作清单
         根据最新快照评分结合实时/近期偏离度给出具体操作方案。
+        查库与写入 daily_actions 都是同步操作，放到线程中执行，不阻塞事件循环。
         """
+        return await asyncio.to_thread(self._build_daily_actions, limit)
+
+    def _build_daily_actions(self, limit: int) -> Dict[str, Any]:
         snapshots = self.db.get_successful_snapshots(limit=2)
         if not snapshots:
             return {"status": "no_data", "message": "暂无快照数据"}
@@ -39,12 +44,14 @@ class ActionService:
         snapshot = snapshots[0]
         prev_snapshot = snapshots[1] if len(snapshots) > 1 else None
         
-        # 获取上次推荐过的基金（去重最近7天）
-        recent_actions = []
-        for i in range(7):
-            date_str = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            recent_actions.extend([a['fund_code'] for a in self.db.get_daily_actions(date_str)])
-        recent_recommended = set(recent_actions)
+        # 获取上次推荐过的基金（去重最近7天，一次区间查询）
+        today = datetime.now()
+        recent_recommended = {
+            a['fund_code'] for a in self.db.get_daily_actions_range(
+                (today - timedelta(days=6)).strftime('%Y-%m-%d'),
+                today.strftime('%Y-%m-%d')
+            )
+        }
 
         # 获取上一个快照的前50名（用于判断“新进入”）
         prev_top_50 = set()
@@ -62,12 +69,9 @@ class ActionService:
         scan_list = top_funds[:]
         top_codes = {f['code'] for f in top_funds}
         
-        for h_code in holding_codes:
-            if h_code not in top_codes:
-                # 获取该持仓基金的最新指标
-                m = self.db.get_fund_metrics(snapshot['id'], h_code)
-                if m:
-                    scan_list.append(m)
+        # 批量获取不在 TOP 50 中的持仓基金的最新指标
+        missing_codes = [code for code in holding_codes if code not in top_codes]
+        scan_list.extend(self.db.get_fund_metrics_batch(snapshot['id'], missing_codes).values())
         
         actions = []
         for fund in scan_list:
@@ -182,10 +186,12 @@ class ActionService:
         if not snapshot:
             return 0
             
+        metrics_map = self.db.get_fund_metrics_batch(snapshot['id'], [pos['fund_code'] for pos in holdings])
+        
         alert_count = 0
         for pos in holdings:
             code = pos['fund_code']
-            metrics = self.db.get_fund_metrics(snapshot['id'], code)
+            metrics = metrics_map.get(code)
             if not metrics:
                 continue
                 
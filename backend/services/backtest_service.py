@@ -11,10 +11,12 @@ from datetime import datetime
 try:
     from services.data_fetcher import get_data_fetcher
     from services.calculator import get_calculator
+    from services.nav_panel import get_nav_panel
     from database import get_db
 except ImportError:
     from backend.services.data_fetcher import get_data_fetcher
     from backend.services.calculator import get_calculator
+    from backend.services.nav_panel import get_nav_panel
     from backend.database import get_db
 
 logger = logging.getLogger(__name__)
@@ -49,8 +51,16 @@ class BacktestService:
             codes = [p['code'] for p in portfolio]
             weights = {p['code']: p['weight'] / 100.0 for p in portfolio}
             
-            # 2. 并发获取所有基金净值
-            fund_data_map = self.fetcher.get_fund_nav_concurrent(codes)
+            # 2. 优先从共享净值面板读取（须覆盖回测区间且足够新），其余的再并发在线获取
+            panel = get_nav_panel()
+            fund_data_map = {}
+            for code in codes:
+                df = panel.get_nav_frame(code) if panel.covers(code, start_date, end_date) else None
+                if df is not None:
+                    fund_data_map[code] = df
+            missing = [c for c in codes if c not in fund_data_map]
+            if missing:
+                fund_data_map.update(self.fetcher.get_fund_nav_concurrent(missing))
             
             if not fund_data_map:
                 return {"success": False, "error": "未能获取到任何基金数据"}
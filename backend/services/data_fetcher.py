@@ -6,7 +6,9 @@
 import time
 import logging
 import re
+import hashlib
 # import akshare as ak <-- deleted
+import numpy as np
 import pandas as pd
 import requests
 import datetime
@@ -14,8 +16,36 @@ import threading
 from typing import Optional, List, Dict, Any
 from functools import wraps
 
+try:
+    from config import get_settings
+except ImportError:
+    from backend.config import get_settings
+# 指标注册表须进程内唯一，与 main.py 一致优先按 backend 包导入
+try:
+    from backend.utils.metrics import CACHE_REQUESTS, RATE_LIMIT_WAIT, upstream_call
+except ImportError:
+    from utils.metrics import CACHE_REQUESTS, RATE_LIMIT_WAIT, upstream_call
+
 logger = logging.getLogger(__name__)
 
+# 基准指数首次回填 / 向前回补时，单个数据源至少返回的交易日数
+BENCHMARK_MIN_ROWS = 60
+
+
+def nav_df_to_records(nav_df: pd.DataFrame) -> List[Dict]:
+    """
+    净值 DataFrame -> [{'date','nav','acc_nav'}]（供 save_nav_history 使用）
+    没有 acc_nav 列时累计净值记为 None：分红基金的累计净值与单位净值不同，不能用单位净值代替
+    """
+    navs = pd.to_numeric(nav_df['nav'], errors='coerce')
+    accs = pd.to_numeric(nav_df['acc_nav'], errors='coerce') if 'acc_nav' in nav_df.columns \
+        else pd.Series(np.nan, index=nav_df.index)
+    dates = pd.to_datetime(nav_df['date']).dt.strftime('%Y-%m-%d')
+    return [
+        {'date': d, 'nav': None if pd.isna(n) else n, 'acc_nav': None if pd.isna(a) else a}
+        for d, n, a in zip(dates.tolist(), navs.tolist(), accs.tolist())
+    ]
+
 
 class RateLimiter:
     """请求限速器 - 线程安全版"""
@@ -25,11 +55,48 @@ class RateLimiter:
         self.lock = threading.Lock()
     
     def wait(self):
+        started = time.perf_counter()
         with self.lock:
             elapsed = time.time() - self.last_request_time
             if elapsed < self.min_interval:
                 time.sleep(self.min_interval - elapsed)
             self.last_request_time = time.time()
+        RATE_LIMIT_WAIT.observe(time.perf_counter() - started)
+
+
+class _InstrumentedAkshare:
+    """akshare 模块代理：按函数名记录调用耗时与失败次数"""
+
+    def __init__(self, module):
+        self._module = module
+        self._wrapped = {}
+
+    def __getattr__(self, name: str):
+        wrapped = self._wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def call(*args, **kwargs):
+            with upstream_call(f'akshare.{name}'):
+                return attr(*args, **kwargs)
+
+        self._wrapped[name] = call
+        return call
+
+
+_akshare_proxy: Optional[_InstrumentedAkshare] = None
+
+def _akshare() -> _InstrumentedAkshare:
+    """延迟导入 akshare（导入较慢）并包装为带指标的代理"""
+    global _akshare_proxy
+    if _akshare_proxy is None:
+        import akshare
+        _akshare_proxy = _InstrumentedAkshare(akshare)
+    return _akshare_proxy
 
 
 def with_retry(max_retries: int = 5, delay: float = 3, backoff: float = 2.0):
@@ -126,92 +193,145 @@ class DataFetcher:
         '商品类': ['黄金ETF', '豆粕ETF', '原油', '大宗商品'],
         'REITs': ['REITs', '不动产信托', '产业园']
     }
+
+    # 类型宽松匹配正则（如 "混合型-偏股" 命中 "混合型"）
+    _TARGET_TYPE_PATTERN = re.compile('|'.join(re.escape(t) for t in sorted(TARGET_FUND_TYPES)))
+    
+    # 名称排除正则：关键字 + 非主份额后缀（前面不是数字，排除像 '300' 这种）+ ETF 联接 C/E 类
+    _EXCLUDE_NAME_PATTERN = re.compile(
+        '|'.join(re.escape(kw) for kw in EXCLUDE_KEYWORDS)
+        + r'|(?<!\d)[BCDEHR]$|联接[CE]'
+    )
     
     def __init__(self):
         self.rate_limiter = RateLimiter(min_interval=0.6)
         self._fund_list_cache = None
         self._fund_list_cache_time = None
-        self._benchmark_cache = {}  # {symbol_start_date: df}
+        self._benchmark_cache = {}  # {symbol: (dates datetime64[D] 数组, closes 数组)}
+        self._benchmark_refreshed = {}  # {symbol: 最近一次成功增量刷新的日期}
+        self._benchmark_backfilled = {}  # {symbol: 已成功回补到的最早起始日期}
+        self._benchmark_failed = {}  # {(symbol, 'refresh' | 'backfill'): 最近一次拉取失败的 monotonic 时间}
+        self._benchmark_lock = threading.Lock()  # 仅保护上面几个字典，不跨上游调用持有
+        self._benchmark_symbol_locks = {}  # {symbol: RLock}，同一指数的拉取串行，不同指数互不阻塞
         self._cache_ttl = 3600
         self._debug_count = 0
         self.last_valuation_time = 0
         self.valuation_cache = {}
         self.VALUATION_CACHE_SECONDS = 60
+        self._valuation_lock = threading.Lock()
     
     @with_retry(max_retries=5, delay=3)
     def get_all_fund_info(self) -> pd.DataFrame:
         """获取所有基金基础信息"""
         self.rate_limiter.wait()
         logger.info("获取全市场基金基础信息...")
-        import akshare as ak
+        ak = _akshare()
         df = ak.fund_name_em()
         logger.info(f"获取到 {len(df)} 只基金的基础信息")
         return df
     
-    def filter_candidate_funds(self, progress_callback=None, skip_filter: bool = False) -> List[Dict]:
-        """快速筛选候选基金"""
-        if self._fund_list_cache and self._fund_list_cache_time and not skip_filter:
-            if (datetime.datetime.now() - self._fund_list_cache_time).seconds < self._cache_ttl:
-                logger.info(f"使用缓存的基金列表，共 {len(self._fund_list_cache)} 只")
-                return self._fund_list_cache
+    def filter_candidate_funds(self, progress_callback=None, skip_filter: bool = False,
+                               force_refresh: bool = False) -> List[Dict]:
+        """
+        快速筛选候选基金
+
+        筛选全部基于列运算（类型集合匹配 + 一条预编译排除正则），
+        结果连同基金列表哈希持久化到 SQLite，基金池未变化时直接复用上次结果。
+        """
+        mode = 'full' if skip_filter else 'filtered'
+        if self._fund_list_cache and self._fund_list_cache_time and not force_refresh:
+            cached_mode, cached_list = self._fund_list_cache
+            if cached_mode == mode and \
+                    (datetime.datetime.now() - self._fund_list_cache_time).seconds < self._cache_ttl:
+                logger.info(f"使用缓存的基金列表，共 {len(cached_list)} 只")
+                return cached_list
         
         if progress_callback:
             progress_callback("filtering", 0, 1, "正在获取全市场基金列表...")
         
         all_funds_df = self.get_all_fund_info()
         total_count = len(all_funds_df)
+        source_hash = self._hash_fund_universe(all_funds_df)
+        
+        db = self._get_db()
+        if db is not None and not force_refresh:
+            try:
+                persisted = db.get_candidate_funds(mode, source_hash)
+            except Exception as e:
+                logger.warning(f"读取持久化候选列表失败: {e}")
+                persisted = None
+            if persisted:
+                logger.info(f"基金池未变化 (hash={source_hash[:12]})，复用持久化候选列表 {len(persisted)} 只")
+                self._fund_list_cache = (mode, persisted)
+                self._fund_list_cache_time = datetime.datetime.now()
+                if progress_callback:
+                    progress_callback("filtering", 1, 1, f"基金池未变化，复用 {len(persisted)} 只候选基金")
+                return persisted
         
         if progress_callback:
             progress_callback("filtering", 0, 1, f"全市场共 {total_count} 只基金，正在筛选...")
         
-        candidates = []
-        # Nightly sync (skip_filter=True) keeps all target types without name filtering
+        codes = all_funds_df['基金代码'].astype(str).str.zfill(6)
+        names = all_funds_df['基金简称'].fillna('').astype(str)
+        types = all_funds_df['基金类型'].fillna('').astype(str)
+        
         # Loose match for fund types (e.g. "混合型-偏股" matches "混合型")
-        def is_target_type(t):
-            t_str = str(t)
-            return any(target in t_str for target in self.TARGET_FUND_TYPES)
+        mask = types.str.contains(self._TARGET_TYPE_PATTERN, regex=True).to_numpy(dtype=bool, copy=True)
+        logger.info(f"类型筛选后: {int(mask.sum())} 只 (Loose match)")
         
-        type_filtered = all_funds_df[all_funds_df['基金类型'].apply(is_target_type)]
-        logger.info(f"类型筛选后: {len(type_filtered)} 只 (Loose match)")
+        # Nightly sync (skip_filter=True) keeps all target types without name filtering
+        if not skip_filter:
+            # 排除关键字 / B、C、D、E、H、R 等非主份额 / ETF 联接 C、E 类，合并为一条正则
+            mask &= ~names.str.contains(self._EXCLUDE_NAME_PATTERN, regex=True).to_numpy()
         
-        for _, row in type_filtered.iterrows():
-            code = str(row['基金代码']).zfill(6)
-            name = row['基金简称']
-            fund_type = row['基金类型']
-            
-            if not skip_filter:
-                # 排除指定的关键字
-                if any(kw in name for kw in self.EXCLUDE_KEYWORDS):
-                    continue
-                
-                # 正则判定基金份额 (A/C/B等)
-                # 通常我们优先关注 A 类或无后缀类，排除 C, B, D, E, H, R 等
-                # 规则：如果简称以 B, C, D, E, H, R 结尾，且前面不是数字（排除像 '300' 这种）
-                if re.search(r'(?<!\d)[BCDEHR]$', name):
-                    continue
-                
-                # 排除 ETF 联接基金的 C 类 (重复)
-                if '联接C' in name or '联接E' in name:
-                    continue
-            
-            themes = self.identify_themes(name)
-            candidates.append({
+        candidates = [
+            {
                 'code': code,
                 'name': name,
                 'fund_type': fund_type,
-                'themes': themes
-            })
+                'themes': self.identify_themes(name)
+            }
+            for code, name, fund_type in zip(codes[mask], names[mask], types[mask])
+        ]
         
         logger.info(f"名称筛选后: {len(candidates)} 只候选基金")
         
-        self._fund_list_cache = candidates
+        self._fund_list_cache = (mode, candidates)
         self._fund_list_cache_time = datetime.datetime.now()
         
+        if db is not None:
+            try:
+                db.save_candidate_funds(mode, source_hash, candidates)
+            except Exception as e:
+                logger.warning(f"持久化候选列表失败: {e}")
+        
         if progress_callback:
             progress_callback("filtering", 1, 1, f"筛选完成，共 {len(candidates)} 只候选基金")
         
         return candidates
     
+    def _hash_fund_universe(self, all_funds_df: pd.DataFrame) -> str:
+        """计算基金列表（代码/简称/类型）与筛选规则的哈希，用于判断基金池是否变化"""
+        cols = all_funds_df[['基金代码', '基金简称', '基金类型']].astype(str)
+        row_hashes = pd.util.hash_pandas_object(cols, index=False).to_numpy()
+        digest = hashlib.sha1(row_hashes.tobytes())
+        digest.update(self._EXCLUDE_NAME_PATTERN.pattern.encode('utf-8'))
+        digest.update(self._TARGET_TYPE_PATTERN.pattern.encode('utf-8'))
+        digest.update(repr(sorted(self.THEME_KEYWORDS.items())).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _get_db(self):
+        """延迟获取数据库实例（避免循环导入）"""
+        try:
+            try:
+                from database import get_db
+            except ImportError:
+                from backend.database import get_db
+            return get_db()
+        except Exception as e:
+            logger.debug(f"数据库不可用，跳过候选列表持久化: {e}")
+            return None
+    
     def identify_themes(self, fund_name: str) -> List[str]:
         """识别基金主题"""
         themes = []
@@ -226,7 +346,7 @@ class DataFetcher:
         code = str(code).zfill(6)
         
         try:
-            import akshare as ak
+            ak = _akshare()
             df = ak.fund_open_fund_info_em(
                 symbol=code, 
                 indicator="单位净值走势",
@@ -306,52 +426,219 @@ class DataFetcher:
 
     def get_benchmark_data(self, symbol: str = '000300', start_date: str = None) -> Optional[pd.DataFrame]:
         """
-        获取基准指数数据 - 多接口轮询
-        按稳定性排序尝试多个数据源
+        获取基准指数数据
+        从常驻内存的指数日线数组（由 index_history 表加载）按起始日期切片返回，
+        本地数据缺失或当日尚未刷新时才增量拉取上游
         """
-        # 兼容性处理：如果是399开头，强制sz
-        if symbol.startswith('399'):
-            ex_symbol = f"sz{symbol}"
-        else:
-            ex_symbol = self._get_ex_symbol(symbol)
-            
         if start_date is None:
             start_date = (datetime.datetime.now() - datetime.timedelta(days=730)).strftime('%Y%m%d')
         
-        # Check cache
-        cache_key = f"{symbol}_{start_date}"
-        if cache_key in self._benchmark_cache:
-            # logger.info(f"使用缓存的基准数据: {symbol}")
-            return self._benchmark_cache[cache_key]
-
-        logger.info(f"获取基准数据: {symbol}, 起始日期: {start_date}")
+        start = np.datetime64(pd.to_datetime(start_date).date(), 'D')
+        dates, closes = self._load_benchmark_series(symbol, start)
+        if len(dates) == 0:
+            logger.error(f"所有基准数据接口都失败了 ({symbol})")
+            return None
         
-        # 接口1: stock_zh_index_daily (最稳定)
-        df = self._get_benchmark_via_index_daily(symbol, ex_symbol, start_date)
-        if df is not None and len(df) >= 60:
-            self._benchmark_cache[cache_key] = df
-            return df
+        idx = int(np.searchsorted(dates, start, side='left'))
+        if idx >= len(dates):
+            return None
         
-        # 接口2: index_zh_a_hist
-        df = self._get_benchmark_via_hist(symbol, start_date)
-        if df is not None and len(df) >= 60:
-            self._benchmark_cache[cache_key] = df
-            return df
+        df = pd.DataFrame({
+            'date': pd.to_datetime(dates[idx:]),
+            'close': closes[idx:]
+        })
+        df['benchmark_return'] = df['close'].pct_change()
+        return df
+    
+    def _benchmark_symbol_lock(self, symbol: str) -> threading.RLock:
+        with self._benchmark_lock:
+            lock = self._benchmark_symbol_locks.get(symbol)
+            if lock is None:
+                lock = self._benchmark_symbol_locks[symbol] = threading.RLock()
+            return lock
+    
+    def _get_benchmark_series(self, symbol: str):
+        """内存中的指数日线数组，首次访问从数据库加载"""
+        with self._benchmark_lock:
+            series = self._benchmark_cache.get(symbol)
+        if series is None:
+            series = self._read_benchmark_store(symbol)
+            with self._benchmark_lock:
+                series = self._benchmark_cache.setdefault(symbol, series)
+        return series
+    
+    def _benchmark_backing_off(self, symbol: str, kind: str) -> bool:
+        """最近一次拉取失败仍在退避窗口内（上游故障期间请求路径不再反复轮询全部数据源）"""
+        failed_at = self._benchmark_failed.get((symbol, kind))
+        return failed_at is not None and \
+            time.monotonic() - failed_at < get_settings().BENCHMARK_RETRY_SECONDS
+    
+    def _benchmark_stale(self, symbol: str) -> bool:
+        """当日尚未成功刷新，本地最新交易日早于今天，且不在失败退避窗口内"""
+        today = datetime.date.today()
+        dates = self._get_benchmark_series(symbol)[0]
+        return self._benchmark_refreshed.get(symbol) != today and \
+            (len(dates) == 0 or dates[-1] < np.datetime64(today, 'D')) and \
+            not self._benchmark_backing_off(symbol, 'refresh')
+    
+    def _needs_backfill(self, symbol: str, start) -> bool:
+        """起始日期早于本地最早交易日，此前未成功回补到该日期，且不在失败退避窗口内"""
+        dates = self._get_benchmark_series(symbol)[0]
+        if len(dates) == 0 or start >= dates[0]:
+            return False
+        backfilled = self._benchmark_backfilled.get(symbol)
+        return (backfilled is None or start < backfilled) and \
+            not self._benchmark_backing_off(symbol, 'backfill')
+    
+    def _load_benchmark_series(self, symbol: str, start=None):
+        """
+        获取指数日线数组：当日未成功刷新过则增量刷新一次，
+        起始日期早于本地数据时向前回补（上游调用只持有该指数的锁）
+        """
+        if self._benchmark_stale(symbol):
+            with self._benchmark_symbol_lock(symbol):
+                # 等锁期间可能已被其他线程刷新
+                if self._benchmark_stale(symbol):
+                    self.refresh_benchmark_history([symbol])
         
-        # 接口3: 新浪接口
-        df = self._get_benchmark_via_sina(symbol, ex_symbol)
-        if df is not None and len(df) >= 60:
-            self._benchmark_cache[cache_key] = df
-            return df
+        if start is not None and self._needs_backfill(symbol, start):
+            with self._benchmark_symbol_lock(symbol):
+                if self._needs_backfill(symbol, start):
+                    fetch_start = pd.Timestamp(start).strftime('%Y%m%d')
+                    logger.info(f"回补基准数据: {symbol}, 起始日期: {fetch_start}")
+                    df = self._fetch_benchmark_remote(symbol, fetch_start, min_rows=BENCHMARK_MIN_ROWS)
+                    if df is not None:
+                        self._merge_benchmark(symbol, df)
+                        self._benchmark_backfilled[symbol] = start
+                        self._benchmark_failed.pop((symbol, 'backfill'), None)
+                    else:
+                        self._benchmark_failed[(symbol, 'backfill')] = time.monotonic()
+                        logger.warning(f"回补基准数据失败 ({symbol})，"
+                                       f"{get_settings().BENCHMARK_RETRY_SECONDS} 秒后重试")
+        
+        return self._get_benchmark_series(symbol)
+    
+    def _merge_benchmark(self, symbol: str, df: pd.DataFrame) -> int:
+        """把上游日线并入内存数组（本地已有的交易日保持不变）并持久化，返回新增条数"""
+        new_dates = df['date'].to_numpy().astype('datetime64[D]')
+        new_closes = pd.to_numeric(df['close'], errors='coerce').to_numpy(dtype=float)
+        keep = ~np.isnan(new_closes)
+        new_dates, new_closes = new_dates[keep], new_closes[keep]
+        order = np.argsort(new_dates, kind='stable')
+        new_dates, new_closes = new_dates[order], new_closes[order]
+        # 同一交易日可能因数据源重复，仅保留首条
+        new_dates, first = np.unique(new_dates, return_index=True)
+        new_closes = new_closes[first]
+        
+        with self._benchmark_lock:
+            dates, closes = self._benchmark_cache[symbol]
+            fresh = ~np.isin(new_dates, dates)
+            new_dates, new_closes = new_dates[fresh], new_closes[fresh]
+            if len(new_dates):
+                dates = np.concatenate([dates, new_dates])
+                closes = np.concatenate([closes, new_closes])
+                order = np.argsort(dates, kind='stable')
+                self._benchmark_cache[symbol] = (dates[order], closes[order])
+        
+        db = self._get_db()
+        if len(new_dates) and db is not None:
+            try:
+                db.append_index_history(symbol, [
+                    (str(d), float(c)) for d, c in zip(new_dates, new_closes)
+                ])
+            except Exception as e:
+                logger.warning(f"持久化基准指数失败 ({symbol}): {e}")
+        return len(new_dates)
+    
+    def _read_benchmark_store(self, symbol: str):
+        """从 index_history 表读取指数日线为 NumPy 数组"""
+        db = self._get_db()
+        rows = []
+        if db is not None:
+            try:
+                rows = db.get_index_history(symbol)
+            except Exception as e:
+                logger.warning(f"读取基准指数历史失败 ({symbol}): {e}")
+        if not rows:
+            return np.array([], dtype='datetime64[D]'), np.array([], dtype=float)
+        dates = np.array([r[0] for r in rows], dtype='datetime64[D]')
+        closes = np.array([r[1] for r in rows], dtype=float)
+        return dates, closes
+    
+    def refresh_benchmark_history(self, symbols: List[str] = None) -> Dict[str, int]:
+        """
+        增量刷新基准指数日线：只拉取本地最新交易日之后的数据并批量追加
+        
+        上游调用期间只持有该指数的锁，合并时才短暂持有全局锁；
+        拉取失败不标记为已刷新，并记录失败时间，请求路径在 BENCHMARK_RETRY_SECONDS 内不再重试。
+        
+        Returns:
+            {symbol: 新增条数}
+        """
+        settings = get_settings()
+        symbols = symbols or settings.BENCHMARK_INDICES
+        result = {}
         
-        logger.error(f"所有基准数据接口都失败了 ({symbol})")
+        for symbol in symbols:
+            with self._benchmark_symbol_lock(symbol):
+                dates = self._get_benchmark_series(symbol)[0]
+                if len(dates) > 0:
+                    # 增量拉取须覆盖本地最新交易日，保证与已有数据衔接
+                    fetch_start = pd.Timestamp(dates[-1]).strftime('%Y%m%d')
+                    checks = {'anchor': dates[-1]}
+                else:
+                    fetch_start = (datetime.datetime.now() - datetime.timedelta(
+                        days=settings.BENCHMARK_HISTORY_DAYS)).strftime('%Y%m%d')
+                    checks = {'min_rows': BENCHMARK_MIN_ROWS}
+                
+                logger.info(f"刷新基准数据: {symbol}, 起始日期: {fetch_start}")
+                df = self._fetch_benchmark_remote(symbol, fetch_start, **checks)
+                if df is None:
+                    self._benchmark_failed[(symbol, 'refresh')] = time.monotonic()
+                    logger.warning(f"刷新基准数据失败 ({symbol})，{settings.BENCHMARK_RETRY_SECONDS} 秒后重试")
+                    result[symbol] = 0
+                    continue
+                
+                result[symbol] = self._merge_benchmark(symbol, df)
+                self._benchmark_refreshed[symbol] = datetime.date.today()
+                self._benchmark_failed.pop((symbol, 'refresh'), None)
+        
+        return result
+    
+    def _fetch_benchmark_remote(self, symbol: str, start_date: str, min_rows: int = 1,
+                                anchor=None) -> Optional[pd.DataFrame]:
+        """
+        按稳定性顺序轮询多个上游数据源，返回第一份通过校验的数据，全部失败返回 None
+
+        Args:
+            min_rows: 至少的条数（首次回填 / 向前回补时防止把截断的数据写入 index_history）
+            anchor: 增量刷新时本地最新交易日，返回数据须覆盖该日（否则与本地数据之间有缺口）
+        """
+        # 兼容性处理：如果是399开头，强制sz
+        if symbol.startswith('399'):
+            ex_symbol = f"sz{symbol}"
+        else:
+            ex_symbol = self._get_ex_symbol(symbol)
+        
+        sources = (
+            lambda: self._get_benchmark_via_index_daily(symbol, ex_symbol, start_date),  # 接口1: 最稳定
+            lambda: self._get_benchmark_via_hist(symbol, start_date),                    # 接口2
+            lambda: self._get_benchmark_via_sina(symbol, ex_symbol)                      # 接口3: 新浪
+        )
+        for source in sources:
+            df = source()
+            if df is None or len(df) < min_rows:
+                continue
+            if anchor is not None and df['date'].min() > pd.Timestamp(anchor):
+                continue
+            return df
         return None
     
     def _get_benchmark_via_index_daily(self, symbol: str, ex_symbol: str, start_date: str) -> Optional[pd.DataFrame]:
         """通过 stock_zh_index_daily 获取基准数据（最稳定）"""
         self.rate_limiter.wait()
         try:
-            import akshare as ak
+            ak = _akshare()
             df = ak.stock_zh_index_daily(symbol=ex_symbol)
             if df is not None and len(df) > 0:
                 df = df.reset_index()
@@ -370,7 +657,7 @@ class DataFetcher:
         """通过 index_zh_a_hist 获取基准数据"""
         self.rate_limiter.wait()
         try:
-            import akshare as ak
+            ak = _akshare()
             df = ak.index_zh_a_hist(symbol=symbol, period="daily", start_date=start_date)
             if df is not None and len(df) > 0:
                 df = df.rename(columns={'日期': 'date', '收盘': 'close'})
@@ -395,7 +682,8 @@ class DataFetcher:
                 'datalen': '500'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            with upstream_call('sina.kline'):
+                response = requests.get(url, params=params, timeout=10)
             if response.status_code == 200:
                 # 解析 JSONP 响应
                 text = response.text
@@ -554,7 +842,7 @@ class DataFetcher:
         """
         try:
             # 尝试通过akshare获取实时行情
-            import akshare as ak
+            ak = _akshare()
             df = ak.stock_zh_index_spot_sina()
             if df is not None and len(df) > 0:
                 # 查找对应指数
@@ -574,7 +862,8 @@ class DataFetcher:
         try:
             url = f"https://hq.sinajs.cn/list=sh{symbol}"
             headers = {'Referer': 'https://finance.sina.com.cn'}
-            response = requests.get(url, headers=headers, timeout=5)
+            with upstream_call('sina.quote'):
+                response = requests.get(url, headers=headers, timeout=5)
             if response.status_code == 200:
                 text = response.text
                 # 解析新浪行情格式
@@ -615,7 +904,7 @@ class DataFetcher:
             try:
                 # 使用akshare获取最新净值
                 self.rate_limiter.wait()
-                import akshare as ak
+                ak = _akshare()
                 df = ak.fund_open_fund_info_em(
                     symbol=code,
                     indicator="单位净值走势",
@@ -685,7 +974,7 @@ class DataFetcher:
         try:
             self.rate_limiter.wait()
             # 获取全市场股票实时行情
-            import akshare as ak
+            ak = _akshare()
             df = ak.stock_zh_a_spot_em()
             
             if df is None or len(df) == 0:
@@ -734,7 +1023,7 @@ class DataFetcher:
             self.rate_limiter.wait()
             
             # 使用 akshare 获取基金排行数据
-            import akshare as ak
+            ak = _akshare()
             df = ak.fund_open_fund_rank_em(symbol=fund_type)
             
             if df is None or len(df) == 0:
@@ -792,7 +1081,7 @@ class DataFetcher:
             
             # 使用 akshare 获取选定基金持仓
             # 注意: 该接口返回的是最近一期的季度持仓
-            import akshare as ak
+            ak = _akshare()
             df = ak.fund_portfolio_hold_em(symbol=code)
             
             if df is None or df.empty:
@@ -821,7 +1110,7 @@ class DataFetcher:
 
     def get_fund_manager_info(self, code: str) -> Dict[str, Any]:
         """获取基金经理信息 (真实数据版)"""
-        import akshare as ak
+        ak = _akshare()
         try:
             code = str(code).zfill(6)
             df = ak.fund_manager_em(symbol=code)
@@ -842,7 +1131,7 @@ class DataFetcher:
 
     def get_fund_ranks(self, code: str) -> List[Dict[str, Any]]:
         """获取基金同类排名 (真实数据版)"""
-        import akshare as ak
+        ak = _akshare()
         try:
             code = str(code).zfill(6)
             # 使用开考开放式基金排行获取同类排名
@@ -881,6 +1170,9 @@ class DataFetcher:
         res = self.get_realtime_valuation_batch([code])
         return res.get(str(code).zfill(6))
 
+    def _valuation_expired(self) -> bool:
+        return not self.valuation_cache or (time.time() - self.last_valuation_time > self.VALUATION_CACHE_SECONDS)
+
     def get_realtime_valuation_batch(self, codes: List[str]) -> Dict[str, Dict]:
         """
         批量获取基金实时估值
@@ -891,59 +1183,64 @@ class DataFetcher:
         Returns:
             {code: {estimation_nav, estimation_growth, nav, nav_date, time}}
         """
-        now = time.time()
-        # 缓存检查
-        if not self.valuation_cache or (now - self.last_valuation_time > self.VALUATION_CACHE_SECONDS):
-            try:
-                import akshare as ak
-                df = ak.fund_value_estimation_em()
-                if df is not None and not df.empty:
-                    # Dynamic column mapping
-                    # Clean column names
-                    cols = [str(c).strip() for c in df.columns.tolist()]
-                    df.columns = cols  # Update dataframe columns
+        # 缓存检查（加锁单飞：并发请求在过期时只触发一次全市场刷新）
+        if not self._valuation_expired():
+            CACHE_REQUESTS.inc(cache='valuation', result='hit')
+        else:
+            CACHE_REQUESTS.inc(cache='valuation', result='miss')
+            with self._valuation_lock:
+                if self._valuation_expired():
+                    now = time.time()
+                    try:
+                        ak = _akshare()
+                        df = ak.fund_value_estimation_em()
+                        if df is not None and not df.empty:
+                            # Dynamic column mapping
+                            # Clean column names
+                            cols = [str(c).strip() for c in df.columns.tolist()]
+                            df.columns = cols  # Update dataframe columns
                     
-                    logger.info(f"Realtime valuation columns: {cols}")
+                            logger.info(f"Realtime valuation columns: {cols}")
                     
-                    code_col = next((c for c in cols if '代码' in c), '基金代码')
-                    name_col = next((c for c in cols if '基金' in c and ('名称' in c or '简称' in c)), '基金简称')
-                    # Flexible matching for value and growth
-                    val_col = next((c for c in cols if '估算' in c and '值' in c), None)
-                    growth_col = next((c for c in cols if '估算' in c and ('增长率' in c or '涨幅' in c)), None)
-                    nav_col = next((c for c in cols if '单位净值' in c), None)
-                    time_col = next((c for c in cols if '时间' in c or '日期' in c), '时间')
-
-                    def safe_float(val):
-                        if val is None or val == '---': return 0.0
-                        try:
-                            return float(str(val).replace('%', ''))
-                        except:
-                            return 0.0
-
-                    new_cache = {}
-                    for _, row in df.iterrows():
-                        code = str(row[code_col]).zfill(6)
-                        try:
-                            # Use '时间' as date if '日期' is missing
-                            nav_date = str(row.get('日期', row.get(time_col, '')))[:10]
-                            update_time = str(row.get(time_col, ''))
+                            code_col = next((c for c in cols if '代码' in c), '基金代码')
+                            name_col = next((c for c in cols if '基金' in c and ('名称' in c or '简称' in c)), '基金简称')
+                            # Flexible matching for value and growth
+                            val_col = next((c for c in cols if '估算' in c and '值' in c), None)
+                            growth_col = next((c for c in cols if '估算' in c and ('增长率' in c or '涨幅' in c)), None)
+                            nav_col = next((c for c in cols if '单位净值' in c), None)
+                            time_col = next((c for c in cols if '时间' in c or '日期' in c), '时间')
+
+                            def safe_float(val):
+                                if val is None or val == '---': return 0.0
+                                try:
+                                    return float(str(val).replace('%', ''))
+                                except:
+                                    return 0.0
+
+                            new_cache = {}
+                            for _, row in df.iterrows():
+                                code = str(row[code_col]).zfill(6)
+                                try:
+                                    # Use '时间' as date if '日期' is missing
+                                    nav_date = str(row.get('日期', row.get(time_col, '')))[:10]
+                                    update_time = str(row.get(time_col, ''))
                             
-                            new_cache[code] = {
-                                'code': code,
-                                'name': str(row[name_col]),
-                                'estimation_nav': safe_float(row.get(val_col)),
-                                'estimation_growth': safe_float(row.get(growth_col)),
-                                'nav': safe_float(row.get(nav_col)),
-                                'nav_date': nav_date,
-                                'time': update_time
-                            }
-                        except Exception as e:
-                            continue
-                    self.valuation_cache = new_cache
-                    self.last_valuation_time = now
-                    logger.info(f"更新实时估值缓存成功: {len(new_cache)} 条")
-            except Exception as e:
-                logger.error(f"获取实时估值失败: {e}")
+                                    new_cache[code] = {
+                                        'code': code,
+                                        'name': str(row[name_col]),
+                                        'estimation_nav': safe_float(row.get(val_col)),
+                                        'estimation_growth': safe_float(row.get(growth_col)),
+                                        'nav': safe_float(row.get(nav_col)),
+                                        'nav_date': nav_date,
+                                        'time': update_time
+                                    }
+                                except Exception as e:
+                                    continue
+                            self.valuation_cache = new_cache
+                            self.last_valuation_time = now
+                            logger.info(f"更新实时估值缓存成功: {len(new_cache)} 条")
+                    except Exception as e:
+                        logger.error(f"获取实时估值失败: {e}")
         
         results = {}
         for code in codes:
@@ -84,7 +84,7 @@ class DcaService:
                 
                 # 如果还是没有，从数据库历史记录中获取最新一个
                 if nav == 0.0:
-                    history = self.db.get_nav_history(fund_code, limit=1)
+                    history = self.db.get_nav_tails([fund_code], n=1).get(fund_code)
                     if history:
                         nav = float(history[0].get('nav', 0.0))
                 
@@ -0,0 +1,154 @@
+# backend/services/fund_batch_service.py
+"""
+基金批量详情 - 一次请求取回多只基金的多个维度（facet）
+
+对比、自选等视图原先按基金逐个请求 /analyze、/fund、/fees、/health、/style，
+每个请求各自查库、各自访问上游。这里改为：
+    - 本地数据（基础信息、快照指标、净值）每个维度一次 IN 查询
+    - 健康度直接由批量取回的指标计算，风格分析复用批量取回的净值
+    - 上游数据（实时估值一次批量调用，费率 / 基金经理按基金）与风格计算放入同一个有界线程池并行执行，
+      按基金的上游调用先经过 DataFetcher 的共享限速器
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+import pandas as pd
+
+try:
+    from database import get_db
+    from config import get_settings
+    from services.data_fetcher import get_data_fetcher
+    from services.fee_service import get_fee_service
+    from services.health_service import get_health_service
+    from services.style_service import get_style_service
+except ImportError:
+    from backend.database import get_db
+    from backend.config import get_settings
+    from backend.services.data_fetcher import get_data_fetcher
+    from backend.services.fee_service import get_fee_service
+    from backend.services.health_service import get_health_service
+    from backend.services.style_service import get_style_service
+
+logger = logging.getLogger(__name__)
+
+# 仅读本地数据库的维度
+LOCAL_FACETS = ('fund', 'metrics', 'nav', 'health')
+# 需要访问上游或较重计算的维度（并行执行）
+REMOTE_FACETS = ('valuation', 'style', 'fees', 'manager')
+FACETS = LOCAL_FACETS + REMOTE_FACETS
+
+
+class FundBatchService:
+    """基金批量详情服务"""
+
+    def __init__(self):
+        self.db = get_db()
+        self.fetcher = get_data_fetcher()
+        self.settings = get_settings()
+
+    def get_batch(self, codes: List[str], facets: List[str], nav_points: int = 30) -> Dict:
+        """
+        批量获取基金详情
+
+        Args:
+            codes: 基金代码（已去重、补零）
+            facets: 需要的维度，取值见 FACETS
+            nav_points: nav 维度返回的最近净值条数
+
+        Returns:
+            {'snapshot_date', 'facets', 'funds': [{code, <facet>: ...}], 'not_found', 'errors'}
+        """
+        facets = [f for f in FACETS if f in facets]
+        funds = {code: {'code': code} for code in codes}
+        errors = []
+
+        # ---------- 本地批量查询 ----------
+        # 快照指标总是取回：not_found 需要据此判断仅存在于快照中的基金
+        snapshot = self.db.get_latest_snapshot()
+        metrics_map = self.db.get_fund_metrics_batch(snapshot['id'], codes) if snapshot else {}
+        fund_map = self.db.get_funds_batch(codes)
+
+        if 'fund' in facets:
+            for code in codes:
+                funds[code]['fund'] = fund_map.get(code)
+        if 'metrics' in facets:
+            for code in codes:
+                funds[code]['metrics'] = metrics_map.get(code)
+        if 'nav' in facets:
+            tails = self.db.get_nav_tails(codes, n=nav_points)
+            for code in codes:
+                funds[code]['nav'] = tails.get(code, [])
+        if 'health' in facets:
+            health = get_health_service()
+            for code in codes:
+                metrics = metrics_map.get(code)
+                funds[code]['health'] = health.diagnose_fund(
+                    code, self._name(code, fund_map, metrics_map), metrics
+                ) if metrics else None
+
+        # ---------- 上游与计算并行 ----------
+        tasks = []  # (facet, code 或 None 表示批量, func, args)
+        if 'valuation' in facets:
+            tasks.append(('valuation', None, self.fetcher.get_realtime_valuation_batch, (codes,)))
+        if 'style' in facets:
+            nav_arrays = self.db.get_nav_arrays_batch(codes)
+            style = get_style_service()
+            for code in codes:
+                arrays = nav_arrays.get(code)
+                if arrays is None:
+                    funds[code]['style'] = {'error': '暂无净值数据'}
+                    continue
+                nav_df = pd.DataFrame({'date': pd.to_datetime(arrays[0]), 'nav': arrays[1]})
+                tasks.append(('style', code, style.analyze_style, (code, nav_df)))
+        if 'fees' in facets:
+            fee = get_fee_service()
+            tasks.extend(('fees', code, self._throttled, (fee.get_fund_fees, code)) for code in codes)
+        if 'manager' in facets:
+            tasks.extend(('manager', code, self._throttled, (self.fetcher.get_fund_manager_info, code))
+                         for code in codes)
+
+        if tasks:
+            workers = max(1, min(self.settings.MAX_CONCURRENT_WORKERS, len(tasks)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fund-batch') as pool:
+                futures = {pool.submit(func, *args): (facet, code) for facet, code, func, args in tasks}
+                for future in as_completed(futures):
+                    facet, code = futures[future]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        logger.warning(f"批量详情 {facet}{f'[{code}]' if code else ''} 失败: {e}")
+                        errors.append({'facet': facet, 'code': code, 'error': str(e)})
+                        value = None
+                    if code is not None:
+                        funds[code][facet] = value
+                    else:  # 批量结果按代码拆分
+                        for c in codes:
+                            funds[c][facet] = (value or {}).get(c)
+
+        return {
+            'snapshot_date': snapshot['snapshot_date'] if snapshot else None,
+            'facets': facets,
+            'funds': [funds[code] for code in codes],
+            'not_found': [code for code in codes if code not in fund_map and code not in metrics_map],
+            'errors': errors
+        }
+
+    def _throttled(self, func, code: str):
+        """按基金访问上游前先经过共享限速器，避免批量请求绕过全局限速"""
+        self.fetcher.rate_limiter.wait()
+        return func(code)
+
+    @staticmethod
+    def _name(code: str, fund_map: Dict, metrics_map: Dict) -> str:
+        fund = fund_map.get(code) or metrics_map.get(code) or {}
+        return fund.get('name', '')
+
+
+_fund_batch_service = None
+
+def get_fund_batch_service() -> FundBatchService:
+    global _fund_batch_service
+    if _fund_batch_service is None:
+        _fund_batch_service = FundBatchService()
+    return _fund_batch_service
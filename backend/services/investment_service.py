@@ -5,6 +5,7 @@ import logging
 from typing import Dict, Any, List, Optional
 
 from .data_fetcher import get_data_fetcher
+from .nav_panel import load_nav_frame
 
 logger = logging.getLogger(__name__)
 
@@ -203,8 +204,7 @@ class InvestmentService:
     async def get_smart_dca_suggestion(self, code: str) -> Dict[str, Any]:
         """封装方法：获取基金定投建议（供 API 直接调用）"""
         try:
-            fetcher = get_data_fetcher()
-            nav_df = fetcher.get_fund_nav(code)
+            nav_df = load_nav_frame(code, get_data_fetcher())
             return self.calculate_smart_dca(nav_df)
         except Exception as e:
             logger.error(f"Failed to get smart dca suggestion for {code}: {e}")
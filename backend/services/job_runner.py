@@ -0,0 +1,248 @@
+# backend/services/job_runner.py
+"""
+后台任务执行器 - 有界线程池 + 优先级队列，任务状态与结果持久化到 SQLite
+
+耗时的接口不再在请求内（事件循环上）同步执行：
+    - 异步模式：submit() 登记任务并立即返回 job_id，客户端通过 GET /api/v1/jobs/{job_id} 查询
+    - 同步模式：await run() 把工作交给任务池执行并等待结果（不落库），事件循环不被阻塞
+每个池的并发数固定、排队数有上限；同一池内按优先级（数值小者先）再按提交顺序执行。
+协程函数在工作线程内以独立事件循环运行。
+
+说明：任务大多是上游 I/O 与 numpy/pandas 计算（释放 GIL），且依赖共享的 Database/数据源单例，
+因此使用线程池而非进程池。
+"""
+import asyncio
+import inspect
+import itertools
+import logging
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from database import get_db
+    from config import get_settings
+    from utils.json_codec import dumps_json
+except ImportError:
+    from backend.database import get_db
+    from backend.config import get_settings
+    from backend.utils.json_codec import dumps_json
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0     # 用户正在等待的请求
+PRIORITY_NORMAL = 5   # 异步提交的任务
+PRIORITY_LOW = 9      # 管理类重任务
+
+
+class JobQueueFull(Exception):
+    """任务池排队已满"""
+
+
+def _process_alive(pid, own_pid: int) -> bool:
+    """
+    任务归属进程是否仍在运行（同机多 worker 部署）
+
+    本进程的任务执行器尚未创建，库中登记为本进程 pid 的任务只可能来自 pid 被复用前的旧进程。
+    """
+    if pid is None or pid == own_pid:
+        return False
+    if os.name == 'nt':  # Windows 上 os.kill 会直接结束进程，改用 OpenProcess 探测
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # 进程存在但属于其他用户
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class _Job:
+    __slots__ = ('id', 'kind', 'func', 'args', 'kwargs', 'persist', 'future')
+
+    def __init__(self, kind: str, func: Callable, args: tuple, kwargs: dict, persist: bool):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.persist = persist
+        self.future: Future = Future()
+
+
+class _Pool:
+    """固定并发数的工作线程 + 优先级队列（线程在首次提交时启动）"""
+
+    def __init__(self, name: str, workers: int, queue_limit: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.queue: queue.PriorityQueue = queue.PriorityQueue()
+        self.running = 0
+        self.reserved = 0  # 已通过排队上限检查、尚未入队的提交
+        self._threads: List[threading.Thread] = []
+
+    def ensure_started(self, target):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=target, args=(self,), name=f'job-{self.name}-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+
+class JobRunner:
+    """后台任务执行器"""
+
+    def __init__(self, pools: Dict[str, int], queue_limit: int = 100, retention_days: int = 7):
+        self.db = get_db()
+        self._pools = {name: _Pool(name, workers, queue_limit) for name, workers in pools.items()}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self.pid = os.getpid()
+        dead = [pid for pid in self.db.get_unfinished_job_owners() if not _process_alive(pid, self.pid)]
+        interrupted = self.db.fail_interrupted_jobs(dead, retention_days)
+        if interrupted:
+            logger.warning(f"{interrupted} 个未完成的后台任务因服务重启被标记为失败")
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable,
+        args: tuple = (),
+        kwargs: Optional[Dict] = None,
+        pool: str = 'default',
+        priority: int = PRIORITY_NORMAL,
+        persist: bool = True,
+        params: Optional[Dict] = None
+    ) -> Tuple[str, Future]:
+        """
+        提交任务，返回 (job_id, Future)
+
+        Args:
+            persist: 是否把状态与结果写入 jobs 表（异步模式需要，同步等待的请求不必落库）
+            params: 记录到任务表中的参数（仅用于展示）
+        """
+        target = self._pools[pool]
+        with self._lock:
+            # 排队数 + 已占位未入队的提交一起计入上限，并发提交不会超出
+            if target.queue.qsize() + target.reserved >= target.queue_limit:
+                raise JobQueueFull(f'任务池 {pool} 排队已满（{target.queue_limit}），请稍后重试')
+            target.reserved += 1
+            target.ensure_started(self._work)
+
+        job = _Job(kind, func, args, kwargs or {}, persist)
+        try:
+            if persist:
+                self.db.create_job(job.id, kind, pool, priority,
+                                   dumps_json(params).decode('utf-8') if params is not None else None,
+                                   owner_pid=self.pid)
+        except Exception:
+            with self._lock:
+                target.reserved -= 1
+            raise
+        with self._lock:
+            target.reserved -= 1
+            target.queue.put((priority, next(self._seq), job))
+        return job.id, job.future
+
+    async def run(self, kind: str, func: Callable, args: tuple = (), kwargs: Optional[Dict] = None,
+                  pool: str = 'default', priority: int = PRIORITY_HIGH) -> Any:
+        """在任务池中执行并等待结果（不落库）"""
+        _, future = self.submit(kind, func, args, kwargs, pool=pool, priority=priority, persist=False)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            name: {'workers': p.workers, 'running': p.running, 'queued': p.queue.qsize(), 'queue_limit': p.queue_limit}
+            for name, p in self._pools.items()
+        }
+
+    def _work(self, pool: _Pool):
+        while True:
+            _, _, job = pool.queue.get()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                pool.running += 1
+            try:
+                self._execute(job)
+            except BaseException as e:  # 兜底：池内工作线程不能因任何异常退出
+                logger.error(f"后台任务 {job.kind}[{job.id}] 执行器异常: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    pool.running -= 1
+
+    def _execute(self, job: _Job):
+        """执行任务；无论成败都会完成 job.future，状态落库失败只记录日志"""
+        try:
+            if job.persist:
+                self._persist(job, self.db.start_job, job.id)
+            try:
+                result = job.func(*job.args, **job.kwargs)
+                if inspect.iscoroutine(result):
+                    result = asyncio.run(result)
+            except BaseException as e:
+                logger.error(f"后台任务 {job.kind}[{job.id}] 失败: {e}", exc_info=True)
+                if job.persist:
+                    self._persist(job, self.db.finish_job, job.id, 'failed', error=str(e))
+                job.future.set_exception(e)
+                return
+
+            if job.persist:
+                try:
+                    # 业务层以 success=False / status='error' 表示的失败同样记为 failed
+                    failed = isinstance(result, dict) and (result.get('success') is False or result.get('status') == 'error')
+                    payload = dumps_json(result).decode('utf-8')
+                    error = str(result.get('error') or result.get('message')) if failed else None
+                except Exception as e:
+                    logger.error(f"保存任务 {job.kind}[{job.id}] 结果失败: {e}")
+                    self._persist(job, self.db.finish_job, job.id, 'failed', error=f'结果保存失败: {e}')
+                else:
+                    self._persist(job, self.db.finish_job, job.id, 'failed' if failed else 'success',
+                                  result=payload, error=error)
+            job.future.set_result(result)
+        finally:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError(f'后台任务 {job.kind}[{job.id}] 异常中断'))
+
+    @staticmethod
+    def _persist(job: _Job, method: Callable, *args, **kwargs):
+        """任务状态落库（尽力而为：如数据库暂时锁定，不影响任务执行与结果返回）"""
+        try:
+            method(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"记录任务 {job.kind}[{job.id}] 状态失败（{method.__name__}）: {e}")
+
+
+_job_runner: Optional[JobRunner] = None
+_job_runner_lock = threading.Lock()
+
+def get_job_runner() -> JobRunner:
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                settings = get_settings()
+                _job_runner = JobRunner(
+                    pools={
+                        'default': settings.JOB_WORKERS_DEFAULT,
+                        'heavy': settings.JOB_WORKERS_HEAVY,
+                        'snapshot': 1  # 快照任务串行执行
+                    },
+                    queue_limit=settings.JOB_QUEUE_LIMIT,
+                    retention_days=settings.JOB_RETENTION_DAYS
+                )
+    return _job_runner
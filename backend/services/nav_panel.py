@@ -0,0 +1,272 @@
+# backend/services/nav_panel.py
+"""
+净值面板 - 内存映射的 日期 × 基金 净值矩阵
+
+快照任务将全部候选基金的单位净值与累计净值写入 nav_panel.<代次>.npy
+（float64，形状 日期 × 基金 × 2，列优先存储，每只基金的每个字段一列连续），
+并生成 nav_panel.json 索引（代次、矩阵文件名与形状、基金代码、日期、各列有效区间）。
+各 worker 进程以只读方式 mmap 同一文件，净值内存由操作系统页缓存在进程间共享。
+
+矩阵文件按代次命名、写完后不再修改，索引最后原子替换作为提交点：读取方总是先读索引，
+再打开索引指向的矩阵，不会拿到新索引配旧矩阵（或反之）。上一代文件保留一代，供正在切换的读取方使用。
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from config import get_settings
+    from utils.helpers import as_day
+except ImportError:
+    from backend.config import get_settings
+    from backend.utils.helpers import as_day
+
+logger = logging.getLogger(__name__)
+
+# 矩阵第三维的字段
+FIELDS = {'nav': 0, 'acc_nav': 1}
+# 面板起点晚于请求起点不超过该天数仍视为覆盖（与净值接口一致）
+START_TOLERANCE_DAYS = 7
+
+
+class NavPanel:
+    """净值面板读写"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix('.json')
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._dates: Optional[np.ndarray] = None
+        self._columns: Dict[str, int] = {}
+        self._first: Optional[np.ndarray] = None
+        self._last: Optional[np.ndarray] = None
+        self._loaded_mtime: Optional[float] = None
+        self._generation: Optional[str] = None
+        self.meta: Dict = {}
+
+    # ==================== 写入 ====================
+
+    def build(self, nav_data_map: Dict[str, pd.DataFrame], snapshot_id: int = None) -> int:
+        """
+        由 {code: DataFrame(date, nav[, acc_nav])} 生成新一代面板文件，返回写入的基金数量
+        缺少 acc_nav 列时累计净值记为 NaN（与 nav_df_to_records 一致）
+        """
+        series = {}
+        for code, df in nav_data_map.items():
+            if df is None or df.empty:
+                continue
+            dates = df['date'].to_numpy().astype('datetime64[D]')
+            navs = pd.to_numeric(df['nav'], errors='coerce').to_numpy(dtype=np.float64)
+            accs = pd.to_numeric(df['acc_nav'], errors='coerce').to_numpy(dtype=np.float64) \
+                if 'acc_nav' in df.columns else np.full(len(navs), np.nan)
+            series[code] = (dates, navs, accs)
+        if not series:
+            return 0
+
+        all_dates = np.unique(np.concatenate([s[0] for s in series.values()]))
+        codes = sorted(series)
+        shape = (len(all_dates), len(codes), len(FIELDS))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        generation = pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')
+        matrix_path = self._matrix_path(generation)
+        tmp_matrix = matrix_path.with_name(matrix_path.stem + '.tmp.npy')
+        tmp_index = self.index_path.with_name(self.index_path.stem + '.tmp.json')
+
+        matrix = np.lib.format.open_memmap(
+            tmp_matrix, mode='w+', dtype=np.float64, shape=shape, fortran_order=True
+        )
+        first = np.zeros(len(codes), dtype=np.int64)
+        last = np.zeros(len(codes), dtype=np.int64)
+        for j, code in enumerate(codes):
+            dates, navs, accs = series[code]
+            positions = np.searchsorted(all_dates, dates)
+            column = np.full(len(all_dates), np.nan)
+            column[positions] = navs
+            matrix[:, j, FIELDS['nav']] = column
+            valid = np.flatnonzero(~np.isnan(column))
+            if len(valid):
+                first[j], last[j] = valid[0], valid[-1] + 1
+            column = np.full(len(all_dates), np.nan)
+            column[positions] = accs
+            matrix[:, j, FIELDS['acc_nav']] = column
+        matrix.flush()
+        del matrix
+        os.replace(tmp_matrix, matrix_path)
+
+        index = {
+            'generation': generation,
+            'matrix': matrix_path.name,
+            'shape': list(shape),
+            'snapshot_id': snapshot_id,
+            'built_at': pd.Timestamp.now().isoformat(),
+            'start_ordinal': int(all_dates[0].astype(np.int64)),
+            'dates': [int(d) for d in (all_dates.astype(np.int64) - all_dates[0].astype(np.int64))],
+            'codes': codes,
+            'first': first.tolist(),
+            'last': last.tolist()
+        }
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+
+        previous = self._read_index()
+        # 提交点：索引替换后读取方才会切换到新矩阵
+        os.replace(tmp_index, self.index_path)
+        self._remove_stale({matrix_path.name, (previous or {}).get('matrix')})
+        logger.info(f"净值面板已生成: {len(all_dates)} 个交易日 × {len(codes)} 只基金 (代次 {generation})")
+        return len(codes)
+
+    def _matrix_path(self, generation: str) -> Path:
+        return self.path.with_name(f'{self.path.stem}.{generation}.npy')
+
+    def _read_index(self) -> Optional[Dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _remove_stale(self, keep: set):
+        """删除当前与上一代之外的矩阵文件（以及旧版不带代次的 nav_panel.npy）"""
+        for path in [self.path, *self.path.parent.glob(f'{self.path.stem}.*.npy')]:
+            if path.name in keep or not path.exists():
+                continue
+            try:
+                path.unlink()
+            except OSError as e:  # Windows 下仍被映射的文件无法删除，留待下一次
+                logger.debug(f"删除旧净值面板失败 {path.name}: {e}")
+
+    # ==================== 读取 ====================
+
+    def _ensure_loaded(self) -> bool:
+        """按索引文件修改时间懒加载/热更新映射，矩阵形状与索引不符时保留当前映射"""
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if self._loaded_mtime == mtime:
+            return True
+
+        with self._lock:
+            if self._loaded_mtime == mtime:
+                return True
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get('generation') != self._generation:
+                    if 'matrix' not in index:
+                        raise ValueError('索引缺少代次信息（旧版面板），等待下次快照重建')
+                    matrix = np.load(self.path.with_name(index['matrix']), mmap_mode='r')
+                    if list(matrix.shape) != index['shape'] or len(index['codes']) != matrix.shape[1]:
+                        raise ValueError(f"矩阵形状 {matrix.shape} 与索引 {index['shape']} 不符")
+                    offsets = np.asarray(index['dates'], dtype=np.int64) + index['start_ordinal']
+                    self._dates = offsets.astype('datetime64[D]')
+                    self._columns = {code: j for j, code in enumerate(index['codes'])}
+                    self._first = np.asarray(index['first'], dtype=np.int64)
+                    self._last = np.asarray(index['last'], dtype=np.int64)
+                    self._matrix = matrix
+                    self._generation = index['generation']
+                    self.meta = {k: index.get(k) for k in ('generation', 'snapshot_id', 'built_at')}
+                self._loaded_mtime = mtime
+                return True
+            except Exception as e:
+                logger.warning(f"加载净值面板失败: {e}")
+                return self._matrix is not None
+
+    def has(self, code: str) -> bool:
+        return self._ensure_loaded() and code in self._columns
+
+    def get_series(self, code: str, start=None, end=None,
+                   field: str = 'nav') -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        获取单只基金的 (dates, values) 视图（零拷贝切片，可能含 NaN）
+
+        Args:
+            start / end: 可选的日期边界（含），接受 'YYYY-MM-DD' / 'YYYYMMDD' / datetime
+            field: 'nav' 单位净值 / 'acc_nav' 累计净值
+        """
+        if not self._ensure_loaded():
+            return None
+        matrix, j, k = self._matrix, self._columns.get(code), FIELDS[field]
+        if j is None:
+            return None
+        lo, hi = int(self._first[j]), int(self._last[j])
+        if start is not None:
+            lo = max(lo, int(np.searchsorted(self._dates, as_day(start), side='left')))
+        if end is not None:
+            hi = min(hi, int(np.searchsorted(self._dates, as_day(end), side='right')))
+        if lo >= hi:
+            return self._dates[:0], matrix[:0, j, k]
+        return self._dates[lo:hi], matrix[lo:hi, j, k]
+
+    def covers(self, code: str, start=None, end=None, max_lag_days: int = 1) -> bool:
+        """
+        面板中该基金的净值是否覆盖请求区间且足够新；不满足时调用方应回退到本地库 / 在线数据
+
+        Args:
+            start / end: 请求区间（含），缺省为不限
+            max_lag_days: 允许最新净值落后于今天的工作日数（当日净值通常晚间才公布）
+        """
+        series = self.get_series(code)
+        if series is None:
+            return False
+        dates, navs = series
+        valid = np.flatnonzero(~np.isnan(navs))
+        if not len(valid):
+            return False
+        if start is not None and dates[valid[0]] > as_day(start) + START_TOLERANCE_DAYS:
+            return False
+        expected = np.busday_offset(np.datetime64(datetime.date.today(), 'D'), -max_lag_days, roll='backward')
+        if end is not None:
+            expected = min(expected, as_day(end))
+        return dates[valid[-1]] >= expected
+
+    def get_nav_frame(self, code: str, start=None, end=None) -> Optional[pd.DataFrame]:
+        """以 DataFrame(date, nav) 形式返回，去除缺失值，供 pandas 计算路径使用"""
+        series = self.get_series(code, start, end)
+        if series is None:
+            return None
+        dates, navs = series
+        mask = ~np.isnan(navs)
+        if not mask.any():
+            return None
+        return pd.DataFrame({
+            'date': pd.to_datetime(dates[mask]),
+            'nav': navs[mask]
+        })
+
+
+def load_nav_frame(code: str, fetcher=None, start=None, end=None) -> Optional[pd.DataFrame]:
+    """
+    优先从净值面板读取 DataFrame(date, nav)（不做区间切片）；
+    面板未覆盖 [start, end] 或数据不够新时回退到在线拉取
+    """
+    panel = get_nav_panel()
+    if panel.covers(code, start, end):
+        df = panel.get_nav_frame(code)
+        if df is not None:
+            return df
+    if fetcher is None:
+        try:
+            from services.data_fetcher import get_data_fetcher
+        except ImportError:
+            from backend.services.data_fetcher import get_data_fetcher
+        fetcher = get_data_fetcher()
+    return fetcher.get_fund_nav(code)
+
+
+_nav_panel = None
+
+def get_nav_panel() -> NavPanel:
+    global _nav_panel
+    if _nav_panel is None:
+        _nav_panel = NavPanel(get_settings().NAV_PANEL_PATH)
+    return _nav_panel
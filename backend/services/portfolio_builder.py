@@ -51,16 +51,16 @@ class PortfolioBuilderService:
         portfolio = []
         total_assigned = 0
         
+        # 按物化名次读取评分前 500 的基金，各分类共用同一份榜单
+        funds = self.db.get_ranking(snapshot_id=snapshot['id'], limit=500)
+        
         for category, ratio in target_allocation.items():
             assigned_amount = amount * ratio
             
             # 兼容多种类别名称映射
             themes_cond = category.split('/')
             
-            # 使用 SQL 逻辑在当前快照中搜索
-            # 为了简化，直接拉取该快照的所有评分，在内存过滤最快的那个
-            funds = self.db.get_ranking(snapshot_id=snapshot['id'], limit=500)
-            
+            # 在榜单中按顺序过滤出该分类得分最高的基金
             selected_fund = None
             for fund in funds:
                 themes_str = fund.get('themes', [])
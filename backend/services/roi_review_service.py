@@ -1,4 +1,5 @@
 # backend/services/roi_review_service.py
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
@@ -27,9 +28,9 @@ class ROIReviewService:
             { "date": { "category": [funds] } }
         """
         try:
-            # 1. 获取最近成功的快照
-            snapshots = self.db.get_successful_snapshots(limit=limit)
-            if not snapshots:
+            # 1. 一次查询取出最近快照日期的评分前 100 名（跨快照指标历史）
+            history = await asyncio.to_thread(self.db.get_metric_history_top, dates=limit, max_rank=100)
+            if not history:
                 return {"success": True, "data": {}}
             
             # 2. 准备分类映射
@@ -39,49 +40,37 @@ class ROIReviewService:
             result_data = {}
             all_codes = set()
             
-            # 预处理：收集所有涉及的基金并按快照组织
+            # 预处理：按快照日期组织
             snapshot_funds_map = {}
-            for snp in snapshots:
-                funds = self.db.get_recommendations(snapshot_id=snp['id'], limit=100)
-                snapshot_funds_map[snp['id']] = funds
-                for f in funds:
-                    all_codes.add(f['code'])
+            for f in history:
+                snapshot_funds_map.setdefault(f['snapshot_date'], []).append(f)
+                all_codes.add(f['code'])
             
-            # 批量获取估值补丁 (如果有实时数据更好)
-            current_valuations = self.fetcher.get_realtime_valuation_batch(list(all_codes))
+            # 当前净值：一次批量读取本地最新净值，本地没有的再用实时估值补齐（查库与上游调用都放到线程中）
+            tails = await asyncio.to_thread(self.db.get_nav_tails, list(all_codes), 1)
+            current_navs = {code: rows[0]['nav'] for code, rows in tails.items() if rows and rows[0]['nav']}
+            missing = [code for code in all_codes if code not in current_navs]
+            if missing:
+                try:
+                    valuations = await asyncio.to_thread(self.fetcher.get_realtime_valuation_batch, missing)
+                    for code in missing:
+                        val = valuations.get(code) or {}
+                        nav = val.get('nav') or val.get('estimation_nav')
+                        if nav:
+                            current_navs[code] = float(nav)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch realtime valuations for ROI review: {e}")
             
-            for snp in snapshots:
-                date_key = snp['snapshot_date']
+            for date_key, funds in snapshot_funds_map.items():
                 day_data = {cat: [] for cat in categories}
                 
-                funds = snapshot_funds_map.get(snp['id'], [])
                 for fund in funds:
                     labels = fund.get('labels', [])
                     
                     # 计算 ROI
                     old_nav = fund.get('latest_nav', 0)
                     code = fund['code']
-                    
-                    # 获取当前净值 (优先使用数据库历史，再使用实时估值)
-                    curr_nav = 0.0
-                    try:
-                        # 1. 尝试从数据库获取最新记录
-                        recent_navs = self.db.get_nav_history(code, limit=1)
-                        if recent_navs:
-                            curr_nav = float(recent_navs[0].get('nav', 0.0))
-                        
-                        # 2. 如果数据库没有，从批量估值缓存中拿
-                        if curr_nav == 0.0:
-                            val = current_valuations.get(code, {})
-                            curr_nav = float(val.get('nav', val.get('estimation_nav', 0.0)))
-                            
-                        # 3. 兜底：如果还是 0，尝试单个实时拉取
-                        if curr_nav == 0.0:
-                            val = self.fetcher.get_realtime_valuation(code)
-                            if val:
-                                curr_nav = float(val.get('nav', val.get('estimation_nav', 0.0)))
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch current NAV for ROI review of {code}: {e}")
+                    curr_nav = current_navs.get(code, 0.0)
                     
                     roi = 0
                     if curr_nav > 0 and old_nav > 0:
@@ -0,0 +1,212 @@
+# backend/services/search_index.py
+"""
+基金搜索索引 - 基金列表刷新时一次性构建，查询时不再做拼音转换
+
+每只基金预先计算拼音首字母与全拼，并对 名称/代码、首字母、全拼 分别建立
+1-gram + 2-gram 倒排索引（倒排表为升序的 int32 数组）。查询时取各 gram 倒排表交集得到候选，
+再逐个校验子串；拼音查询按 rank_pinyin_match 的同一规则分层：
+    5 全等 > 4 首字母前缀 > 3 全拼前缀 > 2 首字母包含 > 1 全拼包含
+同层内保持基金列表原有顺序，与原先“逐行评分后稳定排序”的结果一致。
+"""
+import bisect
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from utils.pinyin import get_pinyin_initials, get_full_pinyin
+except ImportError:
+    try:
+        from backend.utils.pinyin import get_pinyin_initials, get_full_pinyin
+    except ImportError:  # 未安装 pypinyin 时只提供名称/代码检索
+        get_pinyin_initials = get_full_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def _grams(text: str) -> set:
+    """文本的全部 1-gram 与 2-gram"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _build_postings(texts: List[str]) -> Dict[str, np.ndarray]:
+    postings: Dict[str, list] = {}
+    for i, text in enumerate(texts):
+        for gram in _grams(text):
+            postings.setdefault(gram, []).append(i)
+    return {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+
+def _candidates(postings: Dict[str, np.ndarray], query: str) -> np.ndarray:
+    """查询串各 gram 倒排表的交集（升序），作为子串匹配的候选"""
+    grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+    lists = []
+    for gram in set(grams):
+        ids = postings.get(gram)
+        if ids is None:
+            return _EMPTY
+        lists.append(ids)
+    lists.sort(key=len)
+    result = lists[0]
+    for ids in lists[1:]:
+        result = np.intersect1d(result, ids, assume_unique=True)
+        if not len(result):
+            break
+    return result
+
+
+class _Index:
+    """一次构建的不可变索引（构建完成后整体替换，查询无需加锁）"""
+
+    def __init__(self, records: List[Tuple[str, str, str]], pinyin: List[Tuple[str, str]]):
+        self.codes = [r[0] for r in records]
+        self.names = [r[1] for r in records]
+        self.types = [r[2] for r in records]
+        self.by_code = {code: i for i, code in enumerate(self.codes)}
+
+        self.text_keys = [f"{name.lower()}\x00{code}" for code, name, _ in records]
+        self.text_postings = _build_postings(self.text_keys)
+
+        self.has_pinyin = bool(pinyin)
+        if self.has_pinyin:
+            self.initials = [p[0] for p in pinyin]
+            self.full = [p[1] for p in pinyin]
+            self.initials_postings = _build_postings(self.initials)
+            self.full_postings = _build_postings(self.full)
+            self.initials_sorted = sorted((s, i) for i, s in enumerate(self.initials))
+            self.full_sorted = sorted((s, i) for i, s in enumerate(self.full))
+            self.exact: Dict[str, List[int]] = {}
+            for i in range(len(records)):
+                for key in {self.initials[i], self.full[i]}:
+                    self.exact.setdefault(key, []).append(i)
+
+    @staticmethod
+    def _prefix_ids(sorted_pairs: List[Tuple[str, int]], query: str) -> List[int]:
+        lo = bisect.bisect_left(sorted_pairs, (query, -1))
+        hi = bisect.bisect_left(sorted_pairs, (query + '\uffff', -1))
+        return sorted(i for _, i in sorted_pairs[lo:hi])
+
+    def pinyin_tiers(self, q: str) -> Iterator[int]:
+        """按匹配层级依次产出基金下标（层内按原顺序，可能重复，由调用方去重）"""
+        yield from self.exact.get(q, ())
+        yield from self._prefix_ids(self.initials_sorted, q)
+        yield from self._prefix_ids(self.full_sorted, q)
+        for i in _candidates(self.initials_postings, q).tolist():
+            if q in self.initials[i]:
+                yield i
+        for i in _candidates(self.full_postings, q).tolist():
+            if q in self.full[i]:
+                yield i
+
+    def text_matches(self, q: str) -> Iterator[int]:
+        for i in _candidates(self.text_postings, q).tolist():
+            if q in self.text_keys[i]:
+                yield i
+
+    def item(self, i: int) -> Dict:
+        return {'code': self.codes[i], 'name': self.names[i], 'fund_type': self.types[i]}
+
+
+class FundSearchIndex:
+    """全市场基金搜索索引"""
+
+    def __init__(self):
+        self._index: Optional[_Index] = None
+        self._source_id: Optional[int] = None
+        self._pinyin_memo: Dict[str, Tuple[str, str]] = {}
+        self._build_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    @property
+    def has_pinyin(self) -> bool:
+        return self._index is not None and self._index.has_pinyin
+
+    def is_built_from(self, source) -> bool:
+        return self._index is not None and self._source_id == id(source)
+
+    def build_from_df(self, df) -> int:
+        """由 fund_name_em 的 DataFrame（基金代码/基金简称/基金类型）构建索引，返回基金数量"""
+        with self._build_lock:
+            if self.is_built_from(df):
+                return len(self._index.codes)
+            records = list(zip(
+                df['基金代码'].astype(str).str.zfill(6).tolist(),
+                df['基金简称'].fillna('').astype(str).tolist(),
+                df['基金类型'].fillna('').astype(str).tolist()
+            ))
+            self._index = self._build(records)
+            self._source_id = id(df)
+            return len(records)
+
+    def _build(self, records: List[Tuple[str, str, str]]) -> _Index:
+        pinyin = []
+        if get_pinyin_initials is not None:
+            # 名称 -> 拼音的结果跨次构建复用，刷新时只转换新出现的名称
+            memo = {}
+            for _, name, _ in records:
+                converted = memo.get(name) or self._pinyin_memo.get(name)
+                if converted is None:
+                    key = name.strip()
+                    converted = (get_pinyin_initials(key), get_full_pinyin(key))
+                memo[name] = converted
+                pinyin.append(converted)
+            self._pinyin_memo = memo
+        index = _Index(records, pinyin)
+        logger.info(f"基金搜索索引已构建: {len(records)} 只基金")
+        return index
+
+    def get(self, code: str) -> Optional[Dict]:
+        index = self._index
+        if index is None:
+            return None
+        i = index.by_code.get(code)
+        return index.item(i) if i is not None else None
+
+    def search_pinyin(self, query: str, limit: int, exclude: set = None) -> List[Dict]:
+        """拼音查询（与 rank_pinyin_match 同样的排序规则）"""
+        index = self._index
+        q = query.lower().strip()
+        if index is None or not index.has_pinyin or not q:
+            return []
+        return self._collect(index, index.pinyin_tiers(q), limit, exclude)
+
+    def search_text(self, query: str, limit: int, exclude: set = None) -> List[Dict]:
+        """名称/代码子串查询（保持基金列表原有顺序）"""
+        index = self._index
+        q = query.lower().strip()
+        if index is None or not q:
+            return []
+        return self._collect(index, index.text_matches(q), limit, exclude)
+
+    @staticmethod
+    def _collect(index: _Index, ids: Iterator[int], limit: int, exclude: set = None) -> List[Dict]:
+        seen = set()
+        results = []
+        for i in ids:
+            if i in seen:
+                continue
+            seen.add(i)
+            if exclude and index.codes[i] in exclude:
+                continue
+            results.append(index.item(i))
+            if len(results) >= limit:
+                break
+        return results
+
+
+_fund_search_index = None
+
+def get_fund_search_index() -> FundSearchIndex:
+    global _fund_search_index
+    if _fund_search_index is None:
+        _fund_search_index = FundSearchIndex()
+    return _fund_search_index
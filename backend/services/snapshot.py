@@ -5,6 +5,7 @@
 """
 
 import logging
+import time
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
@@ -12,18 +13,27 @@ from typing import Optional, List, Dict, Any, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
-    from database import get_db
+    from database import get_db, get_async_db
     from config import get_settings
-    from services.data_fetcher import get_data_fetcher
+    from services.data_fetcher import get_data_fetcher, nav_df_to_records
     from services.calculator import get_calculator
+    from services.nav_panel import get_nav_panel
+    from utils.broadcast import Broadcaster
+    from utils.metrics import SNAPSHOT_RUNS, SNAPSHOT_RUN_SECONDS, SNAPSHOT_STAGE_SECONDS
 except ImportError:
-    from backend.database import get_db
+    from backend.database import get_db, get_async_db
     from backend.config import get_settings
-    from backend.services.data_fetcher import get_data_fetcher
+    from backend.services.data_fetcher import get_data_fetcher, nav_df_to_records
     from backend.services.calculator import get_calculator
+    from backend.services.nav_panel import get_nav_panel
+    from backend.utils.broadcast import Broadcaster
+    from backend.utils.metrics import SNAPSHOT_RUNS, SNAPSHOT_RUN_SECONDS, SNAPSHOT_STAGE_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# 进度推送的最小间隔（秒），阶段切换与结束时立即推送
+_PROGRESS_PUBLISH_INTERVAL = 0.5
+
 
 class SnapshotService:
     """快照服务"""
@@ -54,6 +64,13 @@ class SnapshotService:
         }
         self._is_updating = False
         self._benchmark_data: Optional[pd.DataFrame] = None
+        
+        # 进度推送：阶段起点用于计算吞吐与 ETA
+        self.progress_events = Broadcaster()
+        self._run_started = None
+        self._stage = None  # (step, 开始时间, 开始时的计数)
+        self._last_published = 0.0
+        self._unpublished = None  # 被节流、尚未推送的本阶段最后一次进度
     
     def is_updating(self) -> bool:
         return self._is_updating
@@ -62,15 +79,52 @@ class SnapshotService:
         return self._progress.copy()
     
     def _set_progress(self, step: str, current: int, total: int, message: str):
+        now = time.time()
+        stage_changed = self._stage is None or self._stage[0] != step
+        if stage_changed:
+            if self._stage is not None:
+                SNAPSHOT_STAGE_SECONDS.set(now - self._stage[1], stage=self._stage[0])
+            self._stage = (step, now, current)
+        
+        # 阶段内吞吐（只/秒）与剩余时间估计
+        _, stage_started, stage_start_count = self._stage
+        stage_elapsed = now - stage_started
+        rate = (current - stage_start_count) / stage_elapsed if stage_elapsed > 0 and total > 1 else 0.0
+        eta = (total - current) / rate if rate > 0 and total > current else None
+        
+        finished = step in ('completed', 'failed')
+        if finished and stage_changed:
+            SNAPSHOT_RUNS.inc(status=step)
+            if self._run_started:
+                SNAPSHOT_RUN_SECONDS.set(now - self._run_started)
         self._progress = {
-            'status': 'running' if self._is_updating else 'idle',
+            'status': step if finished else ('running' if self._is_updating else 'idle'),
             'step': step,
             'current': current,
             'total': total,
             'message': message,
-            'percentage': round(current / total * 100, 1) if total > 0 else 0
+            'percentage': round(current / total * 100, 1) if total > 0 else 0,
+            'funds_per_second': round(rate, 2),
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'stage_elapsed_seconds': round(stage_elapsed, 1),
+            'elapsed_seconds': round(now - self._run_started, 1) if self._run_started else 0,
+            'updated_at': datetime.fromtimestamp(now).isoformat(timespec='seconds')
         }
         logger.info(f"[{step}] {current}/{total} - {message}")
+        
+        if stage_changed or finished:
+            # 先补发上一阶段被节流掉的最后一次进度，再推送阶段切换/终态；两者都不可被覆盖
+            if self._unpublished is not None:
+                self.progress_events.publish(self._unpublished, sticky=True)
+                self._unpublished = None
+            self._last_published = now
+            self.progress_events.publish(self._progress, sticky=True)
+        elif now - self._last_published >= _PROGRESS_PUBLISH_INTERVAL:
+            self._last_published = now
+            self._unpublished = None
+            self.progress_events.publish(self._progress)
+        else:
+            self._unpublished = self._progress
     
     def _progress_callback(self, step: str, current: int, total: int, message: str):
         """进度回调函数"""
@@ -86,6 +140,9 @@ class SnapshotService:
         
         self._is_updating = True
         start_time = datetime.now()
+        self._run_started = time.time()
+        self._stage = None
+        self._unpublished = None
         log_id = None
         
         try:
@@ -206,6 +263,13 @@ class SnapshotService:
                     metrics=fund
                 )
             
+            # 生成共享净值面板（失败不影响快照）
+            try:
+                self._set_progress('nav_panel', 0, 1, '正在生成净值面板...')
+                get_nav_panel().build(nav_data_map, snapshot_id=snapshot_id)
+            except Exception as e:
+                logger.warning(f"生成净值面板失败: {e}")
+            
             # 完成快照
             self.db.complete_snapshot(
                 snapshot_id=snapshot_id,
@@ -303,7 +367,8 @@ class SnapshotService:
     
     async def get_recommendations(self, theme: str = None, category: str = None) -> Dict[str, Any]:
         """获取推荐列表 (异步支持 AI 宏观总结)"""
-        snapshot = self.db.get_latest_snapshot()
+        adb = get_async_db()
+        snapshot = await adb.get_latest_snapshot()
         
         if not snapshot:
             return {
@@ -312,7 +377,7 @@ class SnapshotService:
                 'recommendations': {}
             }
         
-        funds = self.db.get_recommendations(
+        funds = await adb.get_recommendations(
             snapshot_id=snapshot['id'],
             theme=theme,
             limit=100
@@ -562,14 +627,9 @@ class SnapshotService:
             # 数据不足，尝试在线获取
             nav_df = self.fetcher.get_fund_nav(code)
             if nav_df is not None and len(nav_df) > 0:
-                # 保存到缓存
-                nav_data = []
-                for _, row in nav_df.iterrows():
-                    nav_data.append({
-                        'date': row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else str(row['date']),
-                        'nav': float(row['nav']) if row['nav'] else None
-                    })
-                self.db.save_nav_history(code, nav_data)
+                # 后台写入缓存，不阻塞分析流程
+                nav_data = nav_df_to_records(nav_df.sort_values('date'))
+                self.db.enqueue_nav_history(code, nav_data)
                 
                 # 返回最近N天
                 recent = nav_data[-days:] if len(nav_data) > days else nav_data
@@ -597,8 +657,9 @@ class SnapshotService:
             logger.warning(f"准备图表数据失败: {e}")
             return []
 
-    def get_ranking_list(self, sort_by: str = 'score', limit: int = 20, theme: str = None) -> Dict[str, Any]:
-        """获取多维排行列表"""
+    def get_ranking_list(self, sort_by: str = 'score', limit: int = 20, theme: str = None,
+                         cursor: int = 0) -> Dict[str, Any]:
+        """获取多维排行列表（按名次游标分页）"""
         snapshot = self.db.get_latest_snapshot()
         if not snapshot:
             return {'status': 'error', 'message': '请更新快照数据'}
@@ -607,7 +668,8 @@ class SnapshotService:
             snapshot_id=snapshot['id'],
             sort_by=sort_by,
             limit=limit,
-            theme=theme
+            theme=theme,
+            after=cursor
         )
         
         # 补充额外信息，对接前端字段
@@ -622,7 +684,8 @@ class SnapshotService:
             'data': funds,
             'count': len(funds),
             'snapshot_date': snapshot['snapshot_date'],
-            'sort_by': sort_by
+            'sort_by': sort_by,
+            'next_cursor': funds[-1]['rank_position'] if len(funds) == limit else None
         }
 
     def calculate_holding_similarity(self, code1: str, code2: str) -> Dict[str, Any]:
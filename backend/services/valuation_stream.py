@@ -0,0 +1,167 @@
+# backend/services/valuation_stream.py
+"""
+实时估值推送 - 单个后台刷新任务向所有订阅者推送估值变化
+
+每个订阅（一个浏览器标签页的 SSE 连接）登记自己关注的基金代码；
+后台任务每个周期对全部订阅代码的并集调用一次 get_realtime_valuation_batch，
+与上次推送的值比较后，只把发生变化的条目分发给关注它们的订阅者。
+N 个标签页 = 每周期 1 次上游刷新，而不是 N 次轮询。
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+# 优先以 backend.* 导入：main.py 同时把 backend/ 加入 sys.path，若先导入 services.data_fetcher
+# 会得到另一份模块副本（独立的估值缓存与限速器），推送与各接口就不再共用同一次上游刷新
+try:
+    from backend.config import get_settings
+    from backend.services.data_fetcher import get_data_fetcher
+except ImportError:
+    from config import get_settings
+    from services.data_fetcher import get_data_fetcher
+
+logger = logging.getLogger(__name__)
+
+# 单个订阅积压的消息上限，超过后丢弃积压改发一次全量
+_QUEUE_SIZE = 16
+
+
+def _valuation_item(val: Dict) -> Dict:
+    """推送给前端的估值字段"""
+    return {
+        'code': val.get('code'),
+        'estimation_nav': val.get('estimation_nav'),
+        'estimation_growth': val.get('estimation_growth'),
+        'nav': val.get('nav'),
+        'nav_date': val.get('nav_date'),
+        'update_time': val.get('time')
+    }
+
+
+class ValuationSubscription:
+    """一个订阅者：关注的代码 + 待发送的消息队列（元素为 (event, items)）"""
+
+    def __init__(self, codes: Iterable[str]):
+        self.codes = frozenset(codes)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+        self.primed = False  # 是否已收到首个全量快照
+
+
+class ValuationHub:
+    """估值推送中心（仅在事件循环线程内使用）"""
+
+    def __init__(self, interval: int = 30):
+        self.interval = interval
+        self._subscribers: set = set()
+        self._latest: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.refresh_count = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, codes: Iterable[str]) -> ValuationSubscription:
+        sub = ValuationSubscription(codes)
+        self._subscribers.add(sub)
+        if sub.codes and sub.codes <= self._latest.keys():
+            # 已有全部代码的最新值，立即下发全量
+            self._prime(sub)
+        self._ensure_running()
+        if not sub.primed:
+            self._wakeup.set()  # 有新代码需要取值，不必等到下个周期
+        return sub
+
+    def unsubscribe(self, sub: ValuationSubscription):
+        self._subscribers.discard(sub)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            'subscribers': len(self._subscribers),
+            'codes': len(self._latest),
+            'refresh_count': self.refresh_count,
+            'interval': self.interval
+        }
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _send(self, sub: ValuationSubscription, event: str, items: List[Dict]):
+        try:
+            sub.queue.put_nowait((event, items))
+        except asyncio.QueueFull:
+            # 消费过慢：丢弃积压，改发一次全量
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(('snapshot', self._snapshot_of(sub)))
+
+    def _snapshot_of(self, sub: ValuationSubscription) -> List[Dict]:
+        return [self._latest[code] for code in sorted(sub.codes) if code in self._latest]
+
+    def _prime(self, sub: ValuationSubscription):
+        sub.primed = True
+        self._send(sub, 'snapshot', self._snapshot_of(sub))
+
+    async def _refresh(self):
+        """
+        对全部订阅代码的并集取一次估值
+
+        Returns:
+            (发生变化的条目, 本次成功取值的代码集合；失败时为空集)
+        """
+        codes = set()
+        for sub in self._subscribers:
+            codes |= sub.codes
+        if not codes:
+            return {}, frozenset()
+        try:
+            valuations = await asyncio.to_thread(get_data_fetcher().get_realtime_valuation_batch, sorted(codes))
+            self.refresh_count += 1
+        except Exception as e:
+            logger.warning(f"实时估值刷新失败: {e}")
+            return {}, frozenset()
+
+        changed = {}
+        for code, val in valuations.items():
+            item = _valuation_item(val)
+            if self._latest.get(code) != item:
+                changed[code] = item
+        # 只保留仍被订阅的代码
+        self._latest = {code: self._latest[code] for code in codes if code in self._latest}
+        self._latest.update(changed)
+        return changed, frozenset(codes)
+
+    async def _run(self):
+        while self._subscribers:
+            # 先清除再刷新：刷新期间到来的订阅设置的唤醒不会被丢掉
+            self._wakeup.clear()
+            changed, fetched = await self._refresh()
+            for sub in list(self._subscribers):
+                if not sub.primed:
+                    # 刷新期间才订阅的代码尚未取值，留到下一轮（其唤醒已让下一轮立即开始）
+                    if sub.codes <= fetched:
+                        self._prime(sub)
+                elif changed:
+                    deltas = [changed[code] for code in sub.codes if code in changed]
+                    if deltas:
+                        self._send(sub, 'delta', deltas)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+_valuation_hub: Optional[ValuationHub] = None
+
+def get_valuation_hub() -> ValuationHub:
+    global _valuation_hub
+    if _valuation_hub is None:
+        _valuation_hub = ValuationHub(interval=get_settings().VALUATION_STREAM_INTERVAL)
+    return _valuation_hub
@@ -0,0 +1,16 @@
+# backend/tests/conftest.py
+"""
+测试公共配置：把仓库根目录加入 sys.path（统一以 backend.* 导入），
+并把数据库与净值面板指向临时目录，避免读写真实数据。
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_TMP_DIR = tempfile.mkdtemp(prefix='fund_advisor_test_')
+os.environ['DATABASE_PATH'] = os.path.join(_TMP_DIR, 'test.db')
+os.environ['NAV_PANEL_PATH'] = os.path.join(_TMP_DIR, 'nav_panel.npy')
@@ -0,0 +1,116 @@
+# backend/tests/test_admission.py
+"""准入控制：排队满 / 等待超时返回 429 + Retry-After"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import backend.utils.admission as admission_module
+from backend.api.responses import admission, too_busy_response
+from backend.utils.admission import AdmissionController, AdmissionLimiter, AdmissionRejected
+
+
+def test_limiter_rejects_when_queue_is_full():
+    async def run():
+        limiter = AdmissionLimiter('test', concurrency=1, queue_depth=1, max_wait=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert limiter.active == 1 and limiter.waiting == 1
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return limiter, rejected.value
+
+    limiter, error = asyncio.run(run())
+    assert 1 <= error.retry_after <= 60
+    assert error.limiter == 'test'
+    assert limiter.stats()['rejected'] == 1
+    assert limiter.stats()['admitted'] == 2
+    assert limiter.active == 0 and limiter.waiting == 0
+
+
+def test_limiter_rejects_after_max_wait():
+    async def run():
+        limiter = AdmissionLimiter('slow', concurrency=1, queue_depth=5, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            async with limiter.slot():
+                pass
+        waiting = limiter.waiting
+        release.set()
+        await holder
+        return waiting
+
+    assert asyncio.run(run()) == 0
+
+
+def test_route_limit_applies_before_lane():
+    async def run():
+        controller = AdmissionController(lanes={'snapshot': (4, 4)}, routes={'backtest': (1, 0)})
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit('snapshot', 'backtest'):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit('snapshot', 'backtest'):
+                pass
+        # 同通道的其他路由不受影响
+        async with controller.admit('snapshot'):
+            pass
+        release.set()
+        await holder
+        return rejected.value.limiter
+
+    assert asyncio.run(run()) == 'route:backtest'
+
+
+def test_too_busy_response_sets_retry_after():
+    response = too_busy_response('busy', retry_after=7)
+    assert response.status_code == 429
+    assert response.headers['retry-after'] == '7'
+
+
+def test_admission_decorator_returns_429(monkeypatch):
+    controller = AdmissionController(lanes={'upstream': (1, 0)}, routes={})
+    monkeypatch.setattr(admission_module, '_admission_controller', controller)
+
+    app = FastAPI()
+
+    @app.get("/busy")
+    @admission('upstream')
+    async def busy():
+        return {'success': True}
+
+    client = TestClient(app)
+    assert client.get('/busy').status_code == 200
+
+    # 槽位被占用且不允许排队时直接拒绝
+    controller.lanes['upstream']._semaphore = asyncio.Semaphore(0)
+    response = client.get('/busy')
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) >= 1
+    body = response.json()
+    assert body['success'] is False and body['retry_after'] == int(response.headers['retry-after'])
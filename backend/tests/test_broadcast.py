@@ -0,0 +1,52 @@
+# backend/tests/test_broadcast.py
+"""状态广播：普通更新 latest-wins，sticky 消息不被覆盖"""
+import asyncio
+
+from backend.utils.broadcast import Broadcaster
+
+
+async def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_latest_update_wins():
+    async def run():
+        hub = Broadcaster()
+        queue = hub.subscribe()
+        for i in range(5):
+            hub.publish(i)
+        await asyncio.sleep(0)
+        return await _drain(queue)
+
+    assert asyncio.run(run()) == [4]
+
+
+def test_sticky_events_survive_later_updates():
+    async def run():
+        hub = Broadcaster()
+        queue = hub.subscribe()
+        hub.publish('a1')
+        hub.publish('a-last', sticky=True)
+        hub.publish('stage-b', sticky=True)
+        hub.publish('b1')
+        hub.publish('b2')
+        hub.publish('completed', sticky=True)
+        await asyncio.sleep(0)
+        return await _drain(queue)
+
+    assert asyncio.run(run()) == ['a1', 'a-last', 'stage-b', 'b2', 'completed']
+
+
+def test_unsubscribe_stops_delivery():
+    async def run():
+        hub = Broadcaster()
+        queue = hub.subscribe()
+        hub.unsubscribe(queue)
+        hub.publish('x', sticky=True)
+        await asyncio.sleep(0)
+        return hub.subscriber_count, await _drain(queue)
+
+    assert asyncio.run(run()) == (0, [])
@@ -0,0 +1,63 @@
+# backend/tests/test_fund_batch.py
+"""基金批量详情：not_found 判定与按维度的错误收集"""
+import pytest
+
+pytest.importorskip("akshare")
+
+from backend.database import get_db
+from backend.services.fund_batch_service import FundBatchService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    db = get_db()
+    db.upsert_fund('T50001', '本地基金')
+    snapshot_id = db.create_snapshot('2024-05-01')
+    db.save_fund_metrics(snapshot_id, 'T50002', {'name': '仅快照基金', 'score': 80.0})
+    db.complete_snapshot(snapshot_id, qualified_funds=1)
+
+    svc = FundBatchService()
+    monkeypatch.setattr(svc.fetcher.rate_limiter, 'wait', lambda: None)
+    return svc
+
+
+def test_not_found_uses_funds_table_and_snapshot(service):
+    result = service.get_batch(['T50001', 'T50002', 'T50999'], ['fund'])
+
+    assert result['not_found'] == ['T50999']
+    assert result['facets'] == ['fund']
+    funds = {f['code']: f for f in result['funds']}
+    assert funds['T50001']['fund']['name'] == '本地基金'
+    assert funds['T50999']['fund'] is None
+    # 未请求 metrics 维度时不返回，但 not_found 仍参考快照
+    assert 'metrics' not in funds['T50002']
+
+
+def test_per_facet_errors_do_not_fail_the_batch(service, monkeypatch):
+    def manager_info(code):
+        if code == 'T50002':
+            raise RuntimeError('upstream down')
+        return {'name': f'经理-{code}'}
+
+    def valuation_batch(codes):
+        raise TimeoutError('valuation timeout')
+
+    monkeypatch.setattr(service.fetcher, 'get_fund_manager_info', manager_info)
+    monkeypatch.setattr(service.fetcher, 'get_realtime_valuation_batch', valuation_batch)
+
+    result = service.get_batch(['T50001', 'T50002'], ['manager', 'valuation', 'metrics'])
+
+    funds = {f['code']: f for f in result['funds']}
+    assert funds['T50001']['manager'] == {'name': '经理-T50001'}
+    assert funds['T50002']['manager'] is None
+    assert funds['T50001']['valuation'] is None and funds['T50002']['valuation'] is None
+    assert funds['T50002']['metrics']['score'] == 80.0
+
+    errors = {(e['facet'], e['code']): e['error'] for e in result['errors']}
+    assert errors == {('manager', 'T50002'): 'upstream down', ('valuation', None): 'valuation timeout'}
+
+
+def test_style_without_nav_reports_missing_data(service):
+    result = service.get_batch(['T50001'], ['style'])
+    assert result['funds'][0]['style'] == {'error': '暂无净值数据'}
+    assert result['errors'] == []
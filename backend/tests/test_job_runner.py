@@ -0,0 +1,103 @@
+# backend/tests/test_job_runner.py
+"""后台任务执行器：失败处理、排队上限、重启后回收中断任务"""
+import subprocess
+import sys
+import threading
+import uuid
+
+import pytest
+
+from backend.database import get_db
+from backend.services.job_runner import JobRunner, JobQueueFull
+
+
+def _runner(workers: int = 1, queue_limit: int = 10) -> JobRunner:
+    return JobRunner(pools={'default': workers}, queue_limit=queue_limit)
+
+
+def test_failed_job_resolves_future_and_worker_survives():
+    runner = _runner()
+
+    def boom():
+        raise ValueError('boom')
+
+    job_id, future = runner.submit('boom', boom)
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+    assert get_db().get_job(job_id)['status'] == 'failed'
+
+    job_id, future = runner.submit('ok', lambda: {'success': True})
+    assert future.result(timeout=5) == {'success': True}
+    assert get_db().get_job(job_id)['status'] == 'success'
+
+
+def test_persistence_error_does_not_kill_worker(monkeypatch):
+    runner = _runner()
+    db = runner.db
+    original = db.start_job
+    calls = []
+
+    def locked_once(job_id):
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise RuntimeError('database is locked')
+        return original(job_id)
+
+    monkeypatch.setattr(db, 'start_job', locked_once)
+    _, first = runner.submit('first', lambda: 1)
+    _, second = runner.submit('second', lambda: 2)
+    assert first.result(timeout=5) == 1
+    assert second.result(timeout=5) == 2
+
+
+def test_base_exception_in_job_is_contained():
+    runner = _runner()
+
+    def exit_job():
+        raise SystemExit(3)
+
+    _, future = runner.submit('exit', exit_job, persist=False)
+    with pytest.raises(SystemExit):
+        future.result(timeout=5)
+    _, future = runner.submit('after', lambda: 'alive', persist=False)
+    assert future.result(timeout=5) == 'alive'
+
+
+def test_queue_limit():
+    runner = _runner(workers=1, queue_limit=2)
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    _, running = runner.submit('block', blocker, persist=False)
+    assert started.wait(5)
+    queued = [runner.submit('wait', lambda: None, persist=False)[1] for _ in range(2)]
+    with pytest.raises(JobQueueFull):
+        runner.submit('overflow', lambda: None, persist=False)
+
+    release.set()
+    for future in [running, *queued]:
+        future.result(timeout=5)
+
+
+def test_reaps_only_jobs_of_dead_owners():
+    db = get_db()
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    alive = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        jobs = {owner: uuid.uuid4().hex for owner in ('dead', 'alive', 'none')}
+        db.create_job(jobs['dead'], 'k', 'default', 5, owner_pid=proc.pid)
+        db.create_job(jobs['alive'], 'k', 'default', 5, owner_pid=alive.pid)
+        db.create_job(jobs['none'], 'k', 'default', 5)
+
+        _runner()
+        assert db.get_job(jobs['dead'])['status'] == 'failed'
+        assert db.get_job(jobs['none'])['status'] == 'failed'
+        assert db.get_job(jobs['alive'])['status'] == 'queued'
+    finally:
+        alive.kill()
+        alive.wait()
+        db.fail_interrupted_jobs([alive.pid])
@@ -0,0 +1,82 @@
+# backend/tests/test_nav_store.py
+"""净值列式编码与区间读取"""
+import numpy as np
+
+from backend.database import get_db
+from backend.utils.nav_codec import decode_nav_columns, encode_nav_columns
+
+
+def _rows(start: str, days: int, base: float = 1.0):
+    dates = np.busday_offset(np.datetime64(start, 'D'), np.arange(days), roll='forward')
+    return [
+        {'date': str(d), 'nav': round(base + i * 0.001, 4), 'acc_nav': round(base + 0.5 + i * 0.001, 4)}
+        for i, d in enumerate(dates)
+    ]
+
+
+def test_codec_round_trip_is_exact():
+    dates = np.array(['2020-01-02', '2020-01-03', '2020-01-06', '2021-06-30'], dtype='datetime64[D]')
+    navs = np.array([1.0, 1.0123, np.nan, 0.9876])
+    accs = np.array([1.5, np.nan, 1.5123, 1.4876])
+
+    out_dates, out_navs, out_accs = decode_nav_columns(encode_nav_columns(dates, navs, accs))
+
+    assert (out_dates == dates).all()
+    np.testing.assert_array_equal(out_navs, navs)
+    np.testing.assert_array_equal(out_accs, accs)
+
+
+def test_codec_empty_and_bad_magic():
+    empty = np.array([], dtype='datetime64[D]')
+    dates, navs, accs = decode_nav_columns(encode_nav_columns(empty, np.array([]), np.array([])))
+    assert len(dates) == len(navs) == len(accs) == 0
+
+    try:
+        decode_nav_columns(b'XXXX' + b'\x00' * 8)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('未知格式应抛出 ValueError')
+
+
+def test_get_nav_range_boundaries_are_inclusive():
+    db = get_db()
+    code = 'T31001'
+    rows = _rows('2024-01-01', 30)
+    db.save_nav_history(code, rows)
+
+    full = db.get_nav_range(code)
+    assert [r['date'] for r in full] == [r['date'] for r in rows]
+
+    first, last = rows[5]['date'], rows[14]['date']
+    window = db.get_nav_range(code, start=first, end=last)
+    assert window[0]['date'] == first and window[-1]['date'] == last
+    assert len(window) == 10
+
+    # 紧凑日期格式与不落在交易日上的边界
+    compact = db.get_nav_range(code, start=first.replace('-', ''), end=last.replace('-', ''))
+    assert compact == window
+    weekend = db.get_nav_range(code, start='2024-01-06', end='2024-01-07')
+    assert weekend == []
+
+    assert db.get_nav_range(code, start='2030-01-01') == []
+    assert db.get_nav_range(code, end='2023-12-31') == []
+    assert db.get_nav_range('T31999') == []
+    assert db.get_nav_range('T31999', as_numpy=True) is None
+
+    dates, navs, accs = db.get_nav_range(code, start=first, end=last, as_numpy=True)
+    assert len(dates) == len(navs) == len(accs) == 10
+
+
+def test_save_nav_history_merges_older_and_newer_rows():
+    db = get_db()
+    code = 'T31002'
+    rows = _rows('2024-01-01', 30)
+
+    assert db.save_nav_history(code, rows[10:20]) == 10
+    assert db.save_nav_history(code, rows) == 20
+    assert db.save_nav_history(code, rows) == 0
+
+    stored = db.get_nav_range(code)
+    assert [r['date'] for r in stored] == [r['date'] for r in rows]
+    assert db.get_nav_tails([code, 'T31999'], 1) == {code: [stored[-1]]}
@@ -0,0 +1,62 @@
+# backend/tests/test_ranking.py
+"""物化名次与游标分页"""
+from backend.database import get_db
+
+
+def _snapshot_with_scores(scores):
+    db = get_db()
+    snapshot_id = db.create_snapshot('2024-03-01', total_funds=len(scores))
+    for code, (score, theme) in scores.items():
+        db.save_fund_metrics(snapshot_id, code, {
+            'name': code, 'score': score, 'themes': [theme],
+            'volatility': None if score is None else 100 - score,
+        })
+    db.complete_snapshot(snapshot_id, qualified_funds=len(scores))
+    return snapshot_id
+
+
+def _page_through(snapshot_id, sort_by='score', limit=3, theme=None):
+    db = get_db()
+    pages, after = [], 0
+    while True:
+        page = db.get_ranking(snapshot_id, sort_by=sort_by, limit=limit, theme=theme, after=after)
+        if not page:
+            return pages
+        pages.append(page)
+        after = page[-1]['rank_position']
+
+
+def test_cursor_pages_are_contiguous_and_ordered():
+    scores = {f'T35{i:03d}': (float(i % 7), '科技' if i % 2 else '医药') for i in range(10)}
+    scores['T35900'] = (None, '科技')
+    snapshot_id = _snapshot_with_scores(scores)
+
+    pages = _page_through(snapshot_id)
+    flat = [row for page in pages for row in page]
+
+    assert [len(p) for p in pages] == [3, 3, 3, 2]
+    assert [row['rank_position'] for row in flat] == list(range(1, 12))
+    assert len({row['code'] for row in flat}) == 11
+    # 降序，同分按代码排序，空值排最后
+    keys = [(-row['score'], row['code']) for row in flat[:-1]]
+    assert keys == sorted(keys)
+    assert flat[-1]['code'] == 'T35900'
+
+
+def test_ascending_sort_key_and_theme_filter():
+    scores = {f'T35{i:03d}': (float(i), '科技' if i % 2 else '医药') for i in range(100, 108)}
+    snapshot_id = _snapshot_with_scores(scores)
+
+    by_volatility = [row['code'] for page in _page_through(snapshot_id, 'volatility') for row in page]
+    assert by_volatility == sorted(scores, key=lambda c: 100 - scores[c][0])
+
+    themed = [row for page in _page_through(snapshot_id, theme='科技', limit=2) for row in page]
+    assert {row['code'] for row in themed} == {c for c, (_, t) in scores.items() if t == '科技'}
+    positions = [row['rank_position'] for row in themed]
+    assert positions == sorted(positions)
+
+
+def test_unknown_sort_key_falls_back_to_score():
+    snapshot_id = _snapshot_with_scores({'T35200': (1.0, '科技'), 'T35201': (2.0, '科技')})
+    db = get_db()
+    assert [r['code'] for r in db.get_ranking(snapshot_id, sort_by='name; DROP')] == ['T35201', 'T35200']
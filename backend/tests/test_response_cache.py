@@ -0,0 +1,78 @@
+# backend/tests/test_response_cache.py
+"""快照派生接口的响应缓存：ETag / 304 与快照变化后失效"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.responses import snapshot_cached, success_response
+from backend.database import get_db
+
+calls = {'count': 0}
+
+app = FastAPI()
+
+
+@app.get("/cached")
+@snapshot_cached
+async def cached_endpoint(limit: int = 10):
+    calls['count'] += 1
+    return success_response(data={'limit': limit, 'call': calls['count']})
+
+
+@app.get("/failing")
+@snapshot_cached
+async def failing_endpoint():
+    calls['count'] += 1
+    return {'success': False, 'error': 'boom'}
+
+
+def _complete_snapshot():
+    db = get_db()
+    snapshot_id = db.create_snapshot('2024-04-01')
+    db.complete_snapshot(snapshot_id, qualified_funds=0)
+
+
+def test_etag_and_304_revalidation():
+    client = TestClient(app)
+    first = client.get('/cached', params={'limit': 5})
+    assert first.status_code == 200
+    etag = first.headers['etag']
+    assert first.headers['cache-control'].startswith('public')
+
+    again = client.get('/cached', params={'limit': 5})
+    assert again.headers['etag'] == etag
+    assert again.json() == first.json()
+
+    not_modified = client.get('/cached', params={'limit': 5}, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+
+    other = client.get('/cached', params={'limit': 6}, headers={'If-None-Match': etag})
+    assert other.status_code == 200
+    assert other.headers['etag'] != etag
+
+
+def test_snapshot_change_invalidates_cached_responses():
+    client = TestClient(app)
+    first = client.get('/cached')
+    etag = first.headers['etag']
+    before = calls['count']
+
+    assert client.get('/cached').json() == first.json()
+    assert calls['count'] == before
+
+    _complete_snapshot()
+
+    stale = client.get('/cached', headers={'If-None-Match': etag})
+    assert stale.status_code == 200
+    assert stale.headers['etag'] != etag
+    assert calls['count'] == before + 1
+
+
+def test_failed_results_are_not_cached():
+    client = TestClient(app)
+    before = calls['count']
+    for _ in range(2):
+        response = client.get('/failing')
+        assert response.status_code == 200
+        assert 'etag' not in response.headers
+    assert calls['count'] == before + 2
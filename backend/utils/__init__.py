@@ -5,8 +5,10 @@
 
 from .response import success_response, error_response, paginated_response, APIResponse
 from .pinyin import pinyin_match, rank_pinyin_match, get_pinyin_initials, get_full_pinyin
+from .helpers import as_day
 
 __all__ = [
     'success_response', 'error_response', 'paginated_response', 'APIResponse',
-    'pinyin_match', 'rank_pinyin_match', 'get_pinyin_initials', 'get_full_pinyin'
+    'pinyin_match', 'rank_pinyin_match', 'get_pinyin_initials', 'get_full_pinyin',
+    'as_day'
 ]
@@ -0,0 +1,129 @@
+# backend/utils/admission.py
+"""
+准入控制 - 按通道 / 路由限制并发与排队深度
+
+    - 通道（lane）：snapshot 通道承载基于快照的本地读取，upstream 通道承载需要访问上游数据源的请求，
+      两者的并发槽位互相独立，上游请求堆积时不会占满快照读取的处理能力
+    - 路由限额：个别昂贵接口（回测、定投模拟、板块在线回退）在通道之外再单独限流
+并发已满时请求排队等待；排队数超过上限或等待超时则拒绝，由 Web 层返回 429 + Retry-After。
+仅在事件循环内使用。
+"""
+import asyncio
+import math
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Dict
+
+
+class AdmissionRejected(Exception):
+    """准入被拒绝（携带建议的重试秒数）"""
+
+    def __init__(self, limiter: str, retry_after: int):
+        super().__init__(f'{limiter} 繁忙，请 {retry_after} 秒后重试')
+        self.limiter = limiter
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """并发信号量 + 排队深度上限"""
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int, max_wait: float = 15.0):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_depth = max(0, queue_depth)
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.admitted = 0
+        self._avg_hold = 1.0  # 单次占用时长的指数滑动平均（秒），用于估算 Retry-After
+
+    def retry_after(self) -> int:
+        """按当前排队与平均占用时长估算重试等待秒数（1~60）"""
+        estimate = self._avg_hold * (self.waiting + 1) / self.concurrency
+        return min(60, max(1, math.ceil(estimate)))
+
+    def _reject(self):
+        self.rejected += 1
+        raise AdmissionRejected(self.name, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_depth:
+                self._reject()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self._reject()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        self.admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.perf_counter() - started)
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            'concurrency': self.concurrency,
+            'queue_depth': self.queue_depth,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'avg_hold_seconds': round(self._avg_hold, 3)
+        }
+
+
+class AdmissionController:
+    """通道 + 路由两级准入"""
+
+    def __init__(self, lanes: Dict[str, tuple], routes: Dict[str, tuple], max_wait: float = 15.0):
+        self.lanes = {name: AdmissionLimiter(f'lane:{name}', c, q, max_wait) for name, (c, q) in lanes.items()}
+        self.routes = {name: AdmissionLimiter(f'route:{name}', c, q, max_wait) for name, (c, q) in routes.items()}
+
+    @asynccontextmanager
+    async def admit(self, lane: str, route: str = None):
+        """先占路由槽位（更窄）再占通道槽位"""
+        async with AsyncExitStack() as stack:
+            if route in self.routes:
+                await stack.enter_async_context(self.routes[route].slot())
+            await stack.enter_async_context(self.lanes[lane].slot())
+            yield
+
+    def stats(self) -> Dict:
+        return {
+            'lanes': {name: l.stats() for name, l in self.lanes.items()},
+            'routes': {name: l.stats() for name, l in self.routes.items()}
+        }
+
+
+_admission_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    global _admission_controller
+    if _admission_controller is None:
+        try:
+            from config import get_settings
+        except ImportError:
+            from backend.config import get_settings
+        settings = get_settings()
+        _admission_controller = AdmissionController(
+            lanes={
+                'snapshot': (settings.ADMISSION_SNAPSHOT_CONCURRENCY, settings.ADMISSION_SNAPSHOT_QUEUE),
+                'upstream': (settings.ADMISSION_UPSTREAM_CONCURRENCY, settings.ADMISSION_UPSTREAM_QUEUE)
+            },
+            routes={name: tuple(limit) for name, limit in settings.ADMISSION_ROUTE_LIMITS.items()},
+            max_wait=settings.ADMISSION_MAX_WAIT
+        )
+    return _admission_controller
@@ -0,0 +1,77 @@
+# backend/utils/broadcast.py
+"""
+状态广播 - 工作线程发布、事件循环内的订阅者接收
+
+用于进度这类“状态型”消息：普通更新在订阅者队列里只保留最新一条（latest wins），
+消费慢的连接不会积压，也不会拖慢发布方（发布只是 call_soon_threadsafe）。
+标记为 sticky 的消息（阶段切换、终态）不会被后续更新覆盖，按顺序逐条送达。
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Any, List, Tuple
+
+# 单个订阅者最多积压的 sticky 消息数；超出时丢弃最旧的，防止从不读取的连接无限增长
+_MAX_PENDING = 64
+
+
+class StateQueue(asyncio.Queue):
+    """
+    状态队列：队尾是普通更新时，新的普通更新直接替换它；
+    sticky 消息只追加，不会被替换。get() 返回消息本身。
+    """
+
+    def _init(self, maxsize):
+        self._queue = deque()
+
+    def _put(self, entry):
+        item, sticky = entry
+        if self._queue and not self._queue[-1][1] and not sticky:
+            self._queue[-1] = entry
+            return
+        if len(self._queue) >= _MAX_PENDING:
+            self._queue.popleft()
+        self._queue.append(entry)
+
+    def _get(self):
+        return self._queue.popleft()[0]
+
+
+def _offer(queue: StateQueue, item: Any, sticky: bool):
+    queue.put_nowait((item, sticky))
+
+
+class Broadcaster:
+    """线程安全的状态广播"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, StateQueue]] = []
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> StateQueue:
+        """在事件循环内调用，返回状态队列"""
+        queue = StateQueue()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: StateQueue):
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not queue]
+
+    def publish(self, item: Any, sticky: bool = False):
+        """可在任意线程调用；sticky=True 的消息保证送达，不被后续更新覆盖"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        dead = []
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, item, sticky)
+            except RuntimeError:  # 事件循环已关闭
+                dead.append(queue)
+        for queue in dead:
+            self.unsubscribe(queue)
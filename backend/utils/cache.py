@@ -2,50 +2,63 @@
 import json
 import logging
 import os
+import threading
 import time
 from typing import Any, Optional
 from collections import OrderedDict
 
+from .metrics import CACHE_REQUESTS
+
 logger = logging.getLogger(__name__)
 
 class CacheManager:
     """
-    统一缓存管理器：本地内存模式 (带 LRU 淘汰)
+    统一缓存管理器：本地内存模式 (带 LRU 淘汰，线程安全)
     """
-    def __init__(self, expire: int = 3600, max_items: int = 1000):
+    def __init__(self, expire: int = 3600, max_items: int = 1000, name: str = 'default'):
+        self.name = name  # 指标中的缓存名
         self.default_expire = expire
         self.max_items = max_items
         self.local_cache = OrderedDict() # 内存缓存，使用 OrderedDict 实现 LRU
+        self._lock = threading.Lock()
         
     def get(self, key: str) -> Optional[Any]:
         # 本地内存模式
-        if key in self.local_cache:
-            entry = self.local_cache[key]
-            # 移动到末尾表示最近使用
-            self.local_cache.move_to_end(key)
-            
-            if entry['expire'] > time.time():
-                return entry['val']
-            else:
-                del self.local_cache[key]
+        with self._lock:
+            if key in self.local_cache:
+                entry = self.local_cache[key]
+                # 移动到末尾表示最近使用
+                self.local_cache.move_to_end(key)
+                
+                if entry['expire'] > time.time():
+                    CACHE_REQUESTS.inc(cache=self.name, result='hit')
+                    return entry['val']
+                else:
+                    del self.local_cache[key]
+        CACHE_REQUESTS.inc(cache=self.name, result='miss')
         return None
 
     def set(self, key: str, value: Any, expire: int = None):
         exp = expire or self.default_expire
         
-        # 淘汰最旧的项
-        if key not in self.local_cache and len(self.local_cache) >= self.max_items:
-            self.local_cache.popitem(last=False)
-            
-        self.local_cache[key] = {
-            'val': value,
-            'expire': time.time() + exp
-        }
-        self.local_cache.move_to_end(key)
+        with self._lock:
+            # 淘汰最旧的项
+            if key not in self.local_cache and len(self.local_cache) >= self.max_items:
+                self.local_cache.popitem(last=False)
+                
+            self.local_cache[key] = {
+                'val': value,
+                'expire': time.time() + exp
+            }
+            self.local_cache.move_to_end(key)
 
     def delete(self, key: str):
-        if key in self.local_cache:
-            del self.local_cache[key]
+        with self._lock:
+            self.local_cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.local_cache.clear()
 
 _cache_manager: Optional[CacheManager] = None
 
@@ -0,0 +1,18 @@
+# backend/utils/helpers.py
+"""
+通用小工具
+"""
+from datetime import datetime
+
+import numpy as np
+
+
+def as_day(value) -> np.datetime64:
+    """'YYYY-MM-DD' / 'YYYYMMDD' / datetime / date -> datetime64[D]"""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = value.strip()[:10]
+        if len(value) == 8 and value.isdigit():
+            value = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return np.datetime64(value, 'D')
@@ -0,0 +1,45 @@
+# backend/utils/json_codec.py
+"""
+JSON 编码 - 接口响应与后台任务结果共用
+
+优先使用 orjson（原生支持 numpy 数组/标量与 datetime，NaN 输出为 null），
+未安装时退回标准库 json，行为与 FastAPI 的 JSONResponse 一致。
+"""
+import json
+from collections.abc import Mapping
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
+
+
+def json_default(obj):
+    """orjson / json 无法直接处理的类型"""
+    if hasattr(obj, 'model_dump'):  # pydantic 模型
+        return obj.model_dump()
+    if hasattr(obj, 'to_dict') and isinstance(obj, Mapping):  # MetricRow
+        return obj.to_dict()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=json_default, ensure_ascii=False, allow_nan=False,
+                      separators=(',', ':')).encode('utf-8')
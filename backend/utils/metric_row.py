@@ -0,0 +1,109 @@
+# backend/utils/metric_row.py
+"""
+基金指标行对象
+
+列表查询一次返回数百行，逐行 dict(row) 再 json.loads 三个 JSON 字段开销较大。
+MetricRow 只持有 sqlite 原始行与同一查询共享的列索引，JSON 字段在首次访问时才解析；
+对外表现为可变映射（支持 get / [] / 赋值 / dict(row)），可直接被 FastAPI / pydantic 序列化。
+"""
+import json
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, List, Sequence
+
+# 默认延迟解析的 JSON 字段
+METRIC_JSON_FIELDS = ('labels', 'reasons', 'themes')
+
+_DELETED = object()
+
+
+class RowSchema:
+    """同一查询结果共享的列信息（列名 -> 下标，重名列以最后一个为准，与 dict(zip()) 一致）"""
+    __slots__ = ('index', 'json_fields')
+
+    def __init__(self, columns: Sequence[str], json_fields: Iterable[str] = METRIC_JSON_FIELDS):
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(columns)}
+        self.json_fields = frozenset(json_fields)
+
+
+class MetricRow(MutableMapping):
+    """延迟解析 JSON 字段的紧凑行对象"""
+    __slots__ = ('_schema', '_values', '_overrides')
+
+    def __init__(self, schema: RowSchema, values: Sequence):
+        self._schema = schema
+        self._values = values
+        self._overrides = None
+
+    def __getitem__(self, key):
+        if self._overrides is not None and key in self._overrides:
+            value = self._overrides[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        value = self._values[self._schema.index[key]]
+        if key in self._schema.json_fields and value:
+            try:
+                value = json.loads(value)
+            except (TypeError, ValueError):
+                value = []
+            self._set_override(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._set_override(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._set_override(key, _DELETED)
+
+    def __contains__(self, key):
+        if self._overrides is not None and key in self._overrides:
+            return self._overrides[key] is not _DELETED
+        return key in self._schema.index
+
+    def __iter__(self):
+        overrides = self._overrides or {}
+        for key in self._schema.index:
+            if overrides.get(key) is not _DELETED:
+                yield key
+        for key, value in overrides.items():
+            if key not in self._schema.index and value is not _DELETED:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"MetricRow({self.to_dict()!r})"
+
+    def _set_override(self, key, value):
+        if self._overrides is None:
+            self._overrides = {}
+        self._overrides[key] = value
+
+    def copy(self) -> Dict:
+        return self.to_dict()
+
+    def to_dict(self) -> Dict:
+        """转换为普通 dict（解析全部 JSON 字段）"""
+        return {key: self[key] for key in self}
+
+
+def wrap_rows(cursor, json_fields: Iterable[str] = METRIC_JSON_FIELDS) -> List[MetricRow]:
+    """将游标结果包装为 MetricRow 列表（所有行共享一份列信息）"""
+    schema = RowSchema([col[0] for col in cursor.description], json_fields)
+    return [MetricRow(schema, row) for row in cursor.fetchall()]
+
+
+try:
+    from pydantic_core import SchemaSerializer, core_schema
+
+    # 让 pydantic 在 Any 字段中按普通 dict 序列化
+    MetricRow.__pydantic_serializer__ = SchemaSerializer(core_schema.any_schema(
+        serialization=core_schema.plain_serializer_function_ser_schema(
+            MetricRow.to_dict, return_schema=core_schema.dict_schema()
+        )
+    ))
+except ImportError:  # 非 Web 环境（脚本）下无需 pydantic
+    pass
@@ -0,0 +1,256 @@
+# backend/utils/metrics.py
+"""
+进程内指标注册表 - 计数器 / 仪表 / 直方图，按 Prometheus 文本格式导出
+
+记录只是加锁后的字典累加（直方图额外一次二分查找），不依赖 prometheus_client。
+只在抓取时才会遍历、格式化全部序列。
+
+注意：模块可能以 utils.metrics / backend.utils.metrics 两个名字各导入一份，
+注册表随模块对象存在，使用方应优先以 backend.utils.metrics 导入（与 main.py 一致）。
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence
+
+# 延迟直方图默认分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 响应体大小分桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def _labels(self, key: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self._labels(k))} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self._labels(k))} {_format_value(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    """分桶直方图（桶内存非累计计数，导出时再累加）"""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [各桶计数..., +Inf 桶计数, 总和]
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, series in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": _format_value(float(bound))})} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表（同名指标重复注册时返回已有实例）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式（0.0.4）"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# ---------- 请求 ----------
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', '按路由模板统计的请求数', ('method', 'route', 'status'))
+HTTP_LATENCY = REGISTRY.histogram('http_request_duration_seconds', '请求处理耗时（秒）', ('method', 'route'))
+HTTP_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', '正在处理的请求数')
+HTTP_RESPONSE_SIZE = REGISTRY.histogram('http_response_size_bytes', '响应体大小（字节）', ('route',),
+                                        buckets=SIZE_BUCKETS)
+
+# ---------- 上游数据源 ----------
+UPSTREAM_CALLS = REGISTRY.counter('upstream_calls_total', '上游数据接口调用次数', ('function', 'outcome'))
+UPSTREAM_LATENCY = REGISTRY.histogram('upstream_call_duration_seconds', '上游数据接口调用耗时（秒）', ('function',))
+RATE_LIMIT_WAIT = REGISTRY.histogram('upstream_rate_limit_wait_seconds', '请求前在限速器上等待的时间（秒）',
+                                     buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+# ---------- 缓存 ----------
+CACHE_REQUESTS = REGISTRY.counter('cache_requests_total', '缓存查询次数（result=hit/miss）', ('cache', 'result'))
+
+# ---------- 快照 ----------
+SNAPSHOT_STAGE_SECONDS = REGISTRY.gauge('snapshot_stage_last_duration_seconds', '最近一次快照各阶段耗时（秒）', ('stage',))
+SNAPSHOT_RUNS = REGISTRY.counter('snapshot_runs_total', '快照执行次数', ('status',))
+SNAPSHOT_RUN_SECONDS = REGISTRY.gauge('snapshot_last_run_duration_seconds', '最近一次快照总耗时（秒）')
+
+
+@contextmanager
+def upstream_call(function: str):
+    """记录一次上游调用的耗时与结果（异常照常抛出）"""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, function=function)
+        UPSTREAM_CALLS.inc(function=function, outcome=outcome)
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中间件：请求数、延迟、在途数与响应体大小
+
+    路由标签取路由匹配后写入 scope 的路由模板（如 /api/v1/fund/{code}），
+    未匹配的请求统一记为 <unmatched>，避免按原始路径产生无界的序列。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get('route')
+            template = getattr(route, 'path', None) or '<unmatched>'
+            method = scope.get('method', '')
+            HTTP_REQUESTS.inc(method=method, route=template, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=template)
+            HTTP_RESPONSE_SIZE.observe(size, route=template)
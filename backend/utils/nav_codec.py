@@ -0,0 +1,61 @@
+# backend/utils/nav_codec.py
+"""
+净值列式编码
+
+每只基金的全部净值编码为一个二进制块：
+    日期 (距 1970-01-01 的天数) -> int32 差分
+    单位净值 / 累计净值 (float64) -> 与前值按位异或后按字节分片
+三列拼接后整体 zlib 压缩，读取时一次解压即可还原为 NumPy 数组。
+"""
+import struct
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+_MAGIC = b'NAV1'
+_HEADER = struct.Struct('<4sI')
+
+
+def _xor_delta_planes(values: np.ndarray) -> bytes:
+    """float64 与前值按位异或，再按字节分片（高位字节大多为 0，利于压缩）"""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    delta = bits.copy()
+    delta[1:] ^= bits[:-1]
+    return delta.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _restore_xor_delta(buf: bytes, n: int) -> np.ndarray:
+    planes = np.frombuffer(buf, dtype=np.uint8).reshape(8, n)
+    delta = np.ascontiguousarray(planes.T).view(np.uint64).ravel()
+    return np.bitwise_xor.accumulate(delta).view(np.float64)
+
+
+def encode_nav_columns(dates: np.ndarray, navs: np.ndarray, acc_navs: np.ndarray) -> bytes:
+    """
+    编码净值列
+
+    Args:
+        dates: datetime64[D] 数组（升序、无重复）
+        navs: 单位净值（缺失为 NaN）
+        acc_navs: 累计净值（缺失为 NaN）
+    """
+    n = len(dates)
+    ordinals = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    date_delta = np.diff(ordinals, prepend=0).astype(np.int32)
+    payload = date_delta.tobytes() + _xor_delta_planes(navs) + _xor_delta_planes(acc_navs)
+    return _HEADER.pack(_MAGIC, n) + zlib.compress(payload, 6)
+
+
+def decode_nav_columns(blob: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """解码为 (dates datetime64[D], navs float64, acc_navs float64)"""
+    magic, n = _HEADER.unpack_from(blob)
+    if magic != _MAGIC:
+        raise ValueError("未知的净值编码格式")
+    payload = zlib.decompress(blob[_HEADER.size:])
+    date_bytes = n * 4
+    float_bytes = n * 8
+    ordinals = np.cumsum(np.frombuffer(payload[:date_bytes], dtype=np.int32), dtype=np.int64)
+    navs = _restore_xor_delta(payload[date_bytes:date_bytes + float_bytes], n)
+    acc_navs = _restore_xor_delta(payload[date_bytes + float_bytes:date_bytes + 2 * float_bytes], n)
+    return ordinals.astype('datetime64[D]'), navs, acc_navs
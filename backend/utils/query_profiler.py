@@ -0,0 +1,212 @@
+# backend/utils/query_profiler.py
+"""
+数据库查询剖析器（可选开启）
+
+开启后 Database 借出的游标会被包装：按调用方 Database 方法统计语句次数、延迟分位数与返回行数，
+超过阈值的语句连同 EXPLAIN QUERY PLAN 记入慢查询日志。
+SQLite 的语句在取数时才真正执行，因此单条语句的耗时 = execute + 各次 fetch 的累计耗时。
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每个方法保留的最近延迟样本数（用于分位数）
+_SAMPLE_SIZE = 1024
+# 慢查询日志保留条数
+_SLOW_LOG_SIZE = 100
+# 统计时跳过的框架内部函数
+_SKIP_FUNCS = {'get_cursor', 'get_read_cursor', '__enter__', '__exit__', '_call', 'run'}
+
+
+class _MethodStats:
+    __slots__ = ('count', 'rows', 'total_ms', 'max_ms', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=_SAMPLE_SIZE)
+
+    def add(self, elapsed_ms: float, rows: int):
+        self.count += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        return {
+            'count': self.count,
+            'rows': self.rows,
+            'avg_rows': round(self.rows / self.count, 1) if self.count else 0,
+            'total_ms': round(self.total_ms, 3),
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+            'max_ms': round(self.max_ms, 3)
+        }
+
+
+class ProfiledCursor:
+    """sqlite3.Cursor 包装：记录当前语句的耗时与行数，下一条语句或关闭时结算"""
+
+    def __init__(self, cursor, profiler: 'QueryProfiler'):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._pending = None  # [method, sql, params, elapsed_ms, rows]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[3] += (time.perf_counter() - start) * 1000
+
+    def execute(self, sql, params=()):
+        self._flush()
+        self._pending = [self._profiler.caller(), sql, params, 0.0, 0]
+        self._timed(self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._flush()
+        seq = list(seq_of_params)
+        self._pending = [self._profiler.caller(), sql, seq[0] if seq else None, 0.0, 0]
+        self._timed(self._cursor.executemany, sql, seq)
+        self._pending[4] = max(self._cursor.rowcount, 0)
+        return self
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None and self._pending is not None:
+            self._pending[4] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._cursor.fetchmany, *(() if size is None else (size,)))
+        if self._pending is not None:
+            self._pending[4] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[4] += len(rows)
+        return rows
+
+    def close(self):
+        self._flush()
+        self._cursor.close()
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        method, sql, params, elapsed_ms, rows = self._pending
+        self._pending = None
+        if rows == 0 and self._cursor.rowcount > 0:
+            rows = self._cursor.rowcount  # 写语句记影响行数
+        self._profiler.record(method, sql, params, elapsed_ms, rows, self._cursor.connection)
+
+
+class QueryProfiler:
+    """按 Database 方法聚合的查询统计"""
+
+    def __init__(self, enabled: bool = False, slow_ms: float = 200.0):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _MethodStats] = {}
+        self._slow_log = deque(maxlen=_SLOW_LOG_SIZE)
+        self._source_file: Optional[str] = None
+        self.started_at = time.time()
+
+    def bind(self, source_file: str):
+        """指定被统计方法所在的源文件（database.py）"""
+        self._source_file = os.path.normcase(os.path.abspath(source_file))
+
+    def wrap(self, cursor):
+        return ProfiledCursor(cursor, self) if self.enabled else cursor
+
+    def caller(self) -> str:
+        """向上查找第一个位于 database.py 中的业务方法名"""
+        frame = sys._getframe(2)
+        while frame is not None:
+            code = frame.f_code
+            if code.co_name not in _SKIP_FUNCS and \
+                    os.path.normcase(os.path.abspath(code.co_filename)) == self._source_file:
+                return code.co_name
+            frame = frame.f_back
+        return '<external>'
+
+    def record(self, method: str, sql: str, params, elapsed_ms: float, rows: int, conn=None):
+        with self._lock:
+            stats = self._stats.get(method)
+            if stats is None:
+                stats = self._stats[method] = _MethodStats()
+            stats.add(elapsed_ms, rows)
+
+        if elapsed_ms < self.slow_ms:
+            return
+        plan = self._explain(conn, sql, params)
+        statement = ' '.join(sql.split())
+        logger.warning(f"慢查询 {method} {elapsed_ms:.1f}ms rows={rows}: {statement[:300]} | plan: {' / '.join(plan)}")
+        with self._lock:
+            self._slow_log.append({
+                'method': method,
+                'elapsed_ms': round(elapsed_ms, 3),
+                'rows': rows,
+                'sql': statement,
+                'plan': plan,
+                'at': time.strftime('%Y-%m-%d %H:%M:%S')
+            })
+
+    @staticmethod
+    def _explain(conn, sql: str, params) -> List[str]:
+        if conn is None or params is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')):
+            return []
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            return [str(row[-1]) for row in rows]
+        except Exception as e:
+            return [f"EXPLAIN 失败: {e}"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前统计（按总耗时降序）与慢查询日志"""
+        with self._lock:
+            methods = {name: stats.summary() for name, stats in self._stats.items()}
+            slow = list(self._slow_log)
+        ordered = dict(sorted(methods.items(), key=lambda kv: kv[1]['total_ms'], reverse=True))
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'methods': ordered,
+            'slow_queries': slow[::-1]
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self.started_at = time.time()
@@ -0,0 +1,95 @@
+# backend/utils/response_cache.py
+"""
+快照派生接口的响应缓存
+
+推荐、排行、主题等接口的结果只取决于最新快照。首次请求时把序列化后的响应体
+按 (路径, 查询参数) 缓存，之后直接返回同一份字节。实例由 Database 持有（db.response_cache）。
+
+缓存是进程内的，而快照可能由另一个 worker 完成或删除：Web 层每个请求先读一次库中的快照版本
+（成功快照的最大 id 与数量，见 Database.get_snapshot_version），与缓存记录的版本不同即整体失效，
+ETag 中也带上版本。本进程完成/删除快照时仍会直接 invalidate()。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+from .metrics import CACHE_REQUESTS
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class SnapshotResponseCache:
+    """按快照版本整体失效的响应缓存（LRU，线程安全）"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Any, CachedResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None  # 缓存内容对应的快照版本，None 表示未知
+        # 每次失效递增；失效前开始计算的结果不再写入
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def sync(self, version: str) -> int:
+        """以库中读到的快照版本校验缓存：版本变化则整体失效。返回当前代数（供 put 使用）"""
+        with self._lock:
+            if version != self._version:
+                self._generation += 1
+                self._version = version
+                self._entries.clear()
+            return self._generation
+
+    def invalidate(self):
+        """快照变化：清空全部响应，版本置为未知"""
+        with self._lock:
+            self._generation += 1
+            self._version = None
+            self._entries.clear()
+
+    def get(self, key) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        CACHE_REQUESTS.inc(cache='response', result='miss' if entry is None else 'hit')
+        return entry
+
+    def put(self, key, body: bytes, generation: int, version: str) -> CachedResponse:
+        entry = CachedResponse(body, f'"{version}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'version': self._version,
+                'entries': len(self._entries),
+                'bytes': sum(len(e.body) for e in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较，支持列表与 *）"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
@@ -0,0 +1,195 @@
+# backend/utils/sampling_profiler.py
+"""
+按需采样剖析器 - 由管理接口开启，输出火焰图可用的折叠栈（collapsed stacks）
+
+后台线程按固定间隔读取 sys._current_frames()，把每个线程（事件循环主线程、任务池与执行器线程）
+的调用栈折叠为 "线程;外层帧;...;内层帧 次数" 的格式，可直接交给 flamegraph.pl / speedscope。
+不插桩、不设置 sys.setprofile，未开启时没有任何开销；开启时开销约等于采样频率 × 线程数 × 栈深。
+
+两种模式：
+    - 定时：在 N 秒内持续采样
+    - 按路由：N 秒窗口内，仅当有路径匹配前缀的请求正在处理时采样（由 ProfilerMiddleware 计数）
+"""
+import collections
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# 线程空闲等待时所在的叶子帧（默认不计入）
+_IDLE_LEAVES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('thread.py', '_worker'),  # concurrent.futures 执行器线程在 C 层队列上等待
+}
+# 线程名末尾的序号（同一线程池的线程合并为一组）
+_THREAD_SUFFIX = re.compile(r'(?:[-_]\d+)+$')
+
+
+def _short_path(filename: str) -> str:
+    """第三方库取 site-packages 之后的路径，项目代码取 backend/ 起的路径"""
+    index = filename.rfind('site-packages' + os.sep)
+    if index >= 0:
+        return filename[index + len('site-packages') + 1:]
+    index = filename.rfind(os.sep + 'backend' + os.sep)
+    if index >= 0:
+        return filename[index + 1:]
+    return os.path.basename(filename)
+
+
+class ProfileSession:
+    """一次采样会话"""
+
+    def __init__(self, seconds: float, interval: float, route: Optional[str], include_idle: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.seconds = seconds
+        self.interval = interval
+        self.route = route
+        self.include_idle = include_idle
+        self.status = 'running'
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.ticks = 0            # 实际采样的次数
+        self.matching = 0         # 按路由模式下正在处理的匹配请求数
+        self._stacks: collections.Counter = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add(self, stacks: List[str]):
+        with self._lock:
+            self.ticks += 1
+            self._stacks.update(stacks)
+
+    def collapsed(self) -> str:
+        """折叠栈文本（按次数降序）"""
+        with self._lock:
+            items = self._stacks.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in items)
+
+    def info(self) -> Dict:
+        with self._lock:
+            stacks = len(self._stacks)
+        return {
+            'id': self.id,
+            'status': self.status,
+            'route': self.route,
+            'seconds': self.seconds,
+            'interval_ms': round(self.interval * 1000, 1),
+            'include_idle': self.include_idle,
+            'ticks': self.ticks,
+            'unique_stacks': stacks,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class SamplingProfiler:
+    """采样剖析器（同一时间只运行一个会话，保留最近若干个会话的结果）"""
+
+    def __init__(self, max_sessions: int = 10):
+        self.max_sessions = max_sessions
+        self._sessions: 'collections.OrderedDict[str, ProfileSession]' = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.current: Optional[ProfileSession] = None
+        self._labels: Dict[object, str] = {}  # code 对象 -> 帧标签
+
+    def start(self, seconds: float, interval: float = 0.01, route: Optional[str] = None,
+              include_idle: bool = False) -> ProfileSession:
+        with self._lock:
+            if self.current is not None:
+                raise RuntimeError(f'剖析会话 {self.current.id} 正在运行')
+            session = ProfileSession(seconds, interval, route, include_idle)
+            self.current = session
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        threading.Thread(target=self._run, args=(session,), name='sampling-profiler', daemon=True).start()
+        return session
+
+    def stop(self, session_id: str) -> Optional[ProfileSession]:
+        session = self.get(session_id)
+        if session is not None:
+            session._stop.set()
+        return session
+
+    def get(self, session_id: str) -> Optional[ProfileSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def sessions(self) -> List[Dict]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [s.info() for s in reversed(sessions)]
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})'
+        return label
+
+    def _sample(self, session: ProfileSession, own_ident: int) -> List[str]:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            code = frame.f_code
+            if not session.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            thread = _THREAD_SUFFIX.sub('', names.get(ident, str(ident))) or str(ident)
+            frames.append(thread.replace(';', ':'))
+            frames.reverse()
+            stacks.append(';'.join(frames))
+        return stacks
+
+    def _run(self, session: ProfileSession):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + session.seconds
+        try:
+            while not session._stop.wait(session.interval) and time.monotonic() < deadline:
+                if session.route and session.matching <= 0:
+                    continue
+                session.add(self._sample(session, own_ident))
+        finally:
+            session.status = 'done'
+            session.finished_at = time.time()
+            with self._lock:
+                self.current = None
+
+
+_sampling_profiler: Optional[SamplingProfiler] = None
+
+def get_sampling_profiler() -> SamplingProfiler:
+    global _sampling_profiler
+    if _sampling_profiler is None:
+        _sampling_profiler = SamplingProfiler()
+    return _sampling_profiler
+
+
+class ProfilerMiddleware:
+    """按路由模式下统计正在处理的匹配请求（无会话时直接放行）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = get_sampling_profiler().current
+        if scope['type'] != 'http' or session is None or not session.route \
+                or not scope['path'].startswith(session.route):
+            await self.app(scope, receive, send)
+            return
+
+        session.matching += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.matching -= 1
@@ -982,8 +982,17 @@ createApp({
         }
 
         let watchlistTimer = null;
+        let watchlistStream = null;
         function startWatchlistTimer() {
             stopWatchlistTimer();
+            if (window.EventSource) {
+                // 服务端推送估值变化（所有标签页共用一次上游刷新）
+                watchlistStream = new EventSource(`${API_BASE}/valuations/stream`);
+                const apply = (e) => applyValuations(JSON.parse(e.data));
+                watchlistStream.addEventListener('snapshot', apply);
+                watchlistStream.addEventListener('delta', apply);
+                return;
+            }
             watchlistTimer = setInterval(() => {
                 if (mode.value === 'watchlist' && !watchlistLoading.value) {
                     fetchWatchlistSilent();
@@ -992,12 +1001,29 @@ createApp({
         }
 
         function stopWatchlistTimer() {
+            if (watchlistStream) {
+                watchlistStream.close();
+                watchlistStream = null;
+            }
             if (watchlistTimer) {
                 clearInterval(watchlistTimer);
                 watchlistTimer = null;
             }
         }
 
+        function applyValuations(items) {
+            for (const v of items) {
+                const item = watchlist.value.find(w => (w.code || w.fund_code) === v.code);
+                if (!item) continue;
+                Object.assign(item, {
+                    estimation_nav: v.estimation_nav,
+                    estimation_growth: v.estimation_growth,
+                    latest_nav: v.nav,
+                    update_time: v.update_time
+                });
+            }
+        }
+
         async function fetchWatchlistSilent() {
             try {
                 const res = await fetch(`${API_BASE}/watchlist/realtime`);